@@ -0,0 +1,278 @@
+"""
+Almacén analítico local embebido (DuckDB, un solo archivo)
+Los artefactos procesados se cargan con los mismos nombres de tabla y columna que en Supabase,
+de modo que verificaciones, KPIs y análisis ad-hoc corren localmente (offline / CI) con un
+motor columnar; la sincronización a Supabase queda como un paso separado (sync_from_store).
+"""
+import sys
+import time
+from pathlib import Path
+
+
+DEFAULT_DB_PATH = 'analytics.duckdb'
+
+# Mapeo de nombres de columnas (CSV → SQL), compartido con upload_to_supabase.py
+COLUMN_MAPPINGS = {
+    'retail_transactions': {
+        'Transaction ID': 'transaction_id',
+        'Date': 'date',
+        'Customer ID': 'customer_id',
+        'Gender': 'gender',
+        'Age': 'age',
+        'Product Category': 'product_category',
+        'Quantity': 'quantity',
+        'Price per Unit': 'price_per_unit',
+        'Total Amount': 'total_amount',
+        'Total_COGS': 'total_cogs',
+        'Gross_Profit': 'gross_profit',
+        'Gross_Margin_Pct': 'gross_margin_pct',
+        'Year': 'year',
+        'Month': 'month',
+        'Quarter': 'quarter',
+        'YearMonth': 'year_month'
+    },
+    'telco_customers': {
+        'customerID': 'customer_id',
+        'SeniorCitizen': 'senior_citizen',
+        'Tenure_Segment': 'tenure_segment',
+        'PhoneService': 'phone_service',
+        'MultipleLines': 'multiple_lines',
+        'InternetService': 'internet_service',
+        'OnlineSecurity': 'online_security',
+        'OnlineBackup': 'online_backup',
+        'DeviceProtection': 'device_protection',
+        'TechSupport': 'tech_support',
+        'StreamingTV': 'streaming_tv',
+        'StreamingMovies': 'streaming_movies',
+        'Contract': 'contract',
+        'PaperlessBilling': 'paperless_billing',
+        'PaymentMethod': 'payment_method',
+        'MonthlyCharges': 'monthly_charges',
+        'TotalCharges': 'total_charges',
+        'Churn': 'churn',
+        'Churn_Binary': 'churn_binary',
+        'ARPU_Segment': 'arpu_segment',
+        'Estimated_CLV': 'estimated_clv',
+        'Total_Services': 'total_services'
+    },
+    'digital_performance_data': {
+        'Date': 'date',
+        'Channel': 'channel',
+        'Spend': 'spend',
+        'Impressions': 'impressions',
+        'Clicks': 'clicks',
+        'Leads': 'leads',
+        'New_Customers': 'new_customers',
+        'Revenue': 'revenue',
+        'Churned_Customers': 'churned_customers',
+        'Active_Customers_Start_of_Day': 'active_customers_start_of_day'
+    }
+}
+
+# tabla -> CSV procesados (varios archivos se unen por nombre de columna)
+TABLE_SOURCES = {
+    'retail_transactions': ['processed_retail_transactions.csv'],
+    'retail_monthly_kpis': ['processed_retail_monthly_kpis.csv'],
+    'retail_rfm_segments': ['processed_retail_rfm_segments.csv'],
+    'retail_cohort_retention': ['processed_retail_cohort_retention.csv'],
+    'airlines_flights': ['processed_airlines_flights.csv'],
+    'airlines_route_kpis': ['processed_airlines_route_kpis.csv'],
+    'airlines_price_quantiles': ['processed_airlines_price_quantiles.csv'],
+    'airlines_price_histograms': ['processed_airlines_price_histograms.csv'],
+    'airlines_fare_curve_params': ['processed_airlines_fare_curve_params.csv'],
+    'airlines_fare_curves': ['processed_airlines_fare_curves.csv'],
+    'telco_customers': ['processed_telco_customers.csv'],
+    'telco_segment_kpis': ['processed_telco_segment_kpis.csv'],
+    'telco_churn_scenarios': ['processed_telco_churn_scenarios.csv'],
+    'fraud_transactions': ['processed_fraud_transactions.csv'],
+    'fraud_daily_kpis': ['processed_fraud_daily_kpis.csv'],
+    'fraud_merchant_kpis': ['processed_fraud_merchant_kpis.csv'],
+    'fraud_country_kpis': ['processed_fraud_country_kpis.csv'],
+    'fraud_hourly_patterns': ['processed_fraud_hourly_patterns.csv'],
+    'fraud_link_components': ['processed_fraud_link_components.csv'],
+    'fraud_dim_transactions': ['processed_fraud_dim_transactions.csv'],
+    'fraud_dim_customers': ['processed_fraud_dim_customers.csv'],
+    'fraud_dim_cards': ['processed_fraud_dim_cards.csv'],
+    'fraud_dim_merchants': ['processed_fraud_dim_merchants.csv'],
+    'fraud_dim_devices': ['processed_fraud_dim_devices.csv'],
+    'top_k_rankings': ['processed_retail_top_k.csv', 'processed_airlines_top_k.csv', 'processed_fraud_top_k.csv'],
+    'digital_performance_data': ['digital_performance_data.csv'],
+    'kpi_anomaly_alerts': ['processed_kpi_anomaly_alerts.csv'],
+}
+
+# Mismas fórmulas que mv_digital_performance_monthly_kpis (supabase_schemas.sql, sección 6b)
+DIGITAL_KPIS_VIEW_SQL = """
+CREATE OR REPLACE VIEW digital_performance_kpis AS
+WITH monthly AS (
+    SELECT
+        channel,
+        DATE_TRUNC('month', date)::DATE as period_start,
+        LAST_DAY(date)::DATE as period_end,
+        SUM(spend)::DOUBLE as total_spend,
+        SUM(impressions)::BIGINT as total_impressions,
+        SUM(clicks)::BIGINT as total_clicks,
+        SUM(leads)::BIGINT as total_leads,
+        SUM(new_customers)::BIGINT as total_new_customers,
+        SUM(revenue)::DOUBLE as total_revenue,
+        SUM(churned_customers)::BIGINT as total_churned_customers,
+        AVG(active_customers_start_of_day) as avg_active_customers
+    FROM digital_performance_data
+    GROUP BY channel, DATE_TRUNC('month', date), LAST_DAY(date)
+),
+rates AS (
+    SELECT
+        *,
+        total_spend / NULLIF(total_new_customers, 0) as cac,
+        total_revenue / NULLIF(avg_active_customers, 0) as arpu,
+        total_leads / NULLIF(total_clicks, 0) as conv_clicks_leads,
+        total_new_customers / NULLIF(total_leads, 0) as conv_leads_customers,
+        total_churned_customers / NULLIF(avg_active_customers, 0) as churn_rate
+    FROM monthly
+)
+SELECT
+    channel,
+    period_start,
+    period_end,
+    'monthly' as period_type,
+    ROUND(total_spend, 2) as total_spend,
+    total_impressions,
+    total_clicks,
+    total_leads,
+    total_new_customers,
+    ROUND(total_revenue, 2) as total_revenue,
+    total_churned_customers,
+    TRUNC(avg_active_customers)::INTEGER as avg_active_customers,
+    ROUND(NULLIF(cac, 0), 2) as cac,
+    ROUND(NULLIF(arpu, 0), 2) as arpu,
+    ROUND(NULLIF(conv_clicks_leads, 0), 4) as conversion_rate_clicks_to_leads,
+    ROUND(NULLIF(conv_leads_customers, 0), 4) as conversion_rate_leads_to_customers,
+    ROUND(NULLIF(churn_rate, 0), 4) as churn_rate,
+    ROUND(NULLIF(arpu, 0) / NULLIF(churn_rate, 0), 2) as ltv,
+    ROUND(NULLIF(arpu, 0) / NULLIF(churn_rate, 0) / NULLIF(cac, 0), 2) as ltv_cac_ratio
+FROM rates
+ORDER BY channel, period_start
+"""
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class AnalyticsStore:
+    def __init__(self, path=DEFAULT_DB_PATH, read_only=False):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("❌ El almacén local requiere duckdb: pip install duckdb pyarrow") from e
+
+        self.path = str(path)
+        self.con = duckdb.connect(self.path, read_only=read_only)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.con.close()
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+
+    def load_csv(self, table, csv_paths, column_mapping=None):
+        """Carga uno o más CSV con el lector nativo de DuckDB (sin pasar por pandas)"""
+        csv_paths = [str(path) for path in ([csv_paths] if isinstance(csv_paths, (str, Path)) else csv_paths)]
+        files = ', '.join("'" + path.replace("'", "''") + "'" for path in csv_paths)
+        source = f"read_csv_auto([{files}], union_by_name = true, header = true)"
+
+        columns = self.con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()
+        mapping = column_mapping or {}
+        select = ', '.join(f"{_quote(name)} AS {_quote(mapping.get(name, name))}" for name, *_ in columns)
+
+        self.con.execute(f"CREATE OR REPLACE TABLE {_quote(table)} AS SELECT {select} FROM {source}")
+        return self.row_count(table)
+
+    def load_dataframe(self, table, df):
+        """
+        Carga un DataFrame de pandas o una tabla Arrow. DuckDB escanea los buffers
+        in situ (columnas numéricas sin copia) al registrarlos como vista
+        """
+        self.con.register('_incoming', df)
+        try:
+            self.con.execute(f"CREATE OR REPLACE TABLE {_quote(table)} AS SELECT * FROM _incoming")
+        finally:
+            self.con.unregister('_incoming')
+        return self.row_count(table)
+
+    def load_processed(self, data_dir='.', tables=None):
+        """Carga los artefactos procesados disponibles; devuelve {tabla: filas}"""
+        print("\n" + "="*80)
+        print(f"🦆 CARGANDO ARTEFACTOS EN {self.path}")
+        print("="*80)
+
+        data_dir = Path(data_dir)
+        loaded = {}
+        for table in tables or TABLE_SOURCES:
+            paths = [data_dir / name for name in TABLE_SOURCES[table] if (data_dir / name).exists()]
+            if not paths:
+                print(f"   ⚠️  {table}: sin archivos procesados")
+                continue
+            start = time.perf_counter()
+            loaded[table] = self.load_csv(table, paths, COLUMN_MAPPINGS.get(table))
+            print(f"   ✅ {table}: {loaded[table]:,} registros ({time.perf_counter() - start:.2f}s)")
+
+        if 'digital_performance_data' in self.tables():
+            self.con.execute(DIGITAL_KPIS_VIEW_SQL)
+        return loaded
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def query(self, sql, params=None):
+        """Ejecuta SQL y devuelve un DataFrame de pandas"""
+        return self.con.execute(sql, params or []).df()
+
+    def query_arrow(self, sql, params=None):
+        """Ejecuta SQL y devuelve una tabla Arrow (sin conversión a pandas)"""
+        return self.con.execute(sql, params or []).fetch_arrow_table()
+
+    def table(self, name, columns=None, where=None, params=None):
+        cols = ', '.join(_quote(col) for col in columns) if columns else '*'
+        sql = f"SELECT {cols} FROM {_quote(name)}"
+        if where:
+            sql += f" WHERE {where}"
+        return self.query(sql, params)
+
+    def tables(self):
+        return [name for (name,) in self.con.execute("SELECT table_name FROM information_schema.tables").fetchall()]
+
+    def row_count(self, table):
+        return self.con.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()[0]
+
+    def row_counts(self):
+        return {table: self.row_count(table) for table in self.tables()}
+
+    def digital_kpis(self):
+        """KPIs mensuales por canal calculados localmente (equivalente a digital_performance_kpis)"""
+        return self.query("SELECT * FROM digital_performance_kpis")
+
+
+if __name__ == "__main__":
+    # python analytics_store.py load [db]        -> carga los CSV procesados del directorio actual
+    # python analytics_store.py query "SQL" [db] -> ejecuta una consulta
+    # python analytics_store.py counts [db]      -> filas por tabla
+    command = sys.argv[1] if len(sys.argv) > 1 else 'load'
+
+    if command == 'query':
+        with AnalyticsStore(sys.argv[3] if len(sys.argv) > 3 else DEFAULT_DB_PATH, read_only=True) as store:
+            print(store.query(sys.argv[2]).to_string())
+    elif command == 'counts':
+        with AnalyticsStore(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB_PATH, read_only=True) as store:
+            for table, count in store.row_counts().items():
+                print(f"   {table}: {count:,} registros")
+    else:
+        with AnalyticsStore(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB_PATH) as store:
+            store.load_processed()
@@ -1,84 +1,104 @@
 """
 Análisis del dataset de fraude para diseñar modelos de datos
+Perfilado en streaming (un solo pase por chunks) en lugar de cargar el CSV completo
 """
 import pandas as pd
-import json
 import ast
 
-print("📥 Cargando datos de fraude...")
-df = pd.read_csv('synthetic_fraud_data.csv')
+from dataset_profiler import DATASETS, StreamingProfiler
+
+FRAUD_SPEC = next(spec for spec in DATASETS if spec['csv_path'] == 'synthetic_fraud_data.csv')
+
+
+def print_top(info, limit=10):
+    print(pd.Series(info['top_values'], dtype='int64').head(limit).to_string())
+
+
+def print_contingency(table):
+    frame = pd.DataFrame(table).T.astype({'total': 'int64', 'positive': 'int64'})
+    frame['legit_pct'] = (100 - frame['rate_pct']).round(2)
+    print(frame[['total', 'positive', 'legit_pct', 'rate_pct']]
+          .rename(columns={'positive': 'fraud', 'rate_pct': 'fraud_pct'}).to_string())
+
+
+def share(info, label, rows):
+    count = int(info['top_values'].get(label, 0))
+    return count, count / rows * 100
+
+
+print("📥 Perfilando datos de fraude (streaming)...")
+report = StreamingProfiler(**{**FRAUD_SPEC, 'top_k': 25}).run()
+profiles = report['column_profiles']
+rows = report['rows']
 
 print(f"\n{'='*80}")
 print(f"ANÁLISIS DE SYNTHETIC FRAUD DATA")
 print(f"{'='*80}\n")
 
 print(f"📊 DIMENSIONES:")
-print(f"   - Filas: {len(df):,}")
-print(f"   - Columnas: {df.shape[1]}")
+print(f"   - Filas: {rows:,}")
+print(f"   - Columnas: {report['columns']}")
+print(f"   - Tiempo de perfilado: {report['elapsed_seconds']:.2f}s")
 
-print(f"\n📋 COLUMNAS ({df.shape[1]}):")
-for i, col in enumerate(df.columns, 1):
-    dtype = df[col].dtype
-    nulls = df[col].isnull().sum()
-    unique = df[col].nunique()
-    print(f"   {i:2d}. {col:25s} ({str(dtype):10s}) - Nulos: {nulls:6d} | Únicos: {unique:,}")
+print(f"\n📋 COLUMNAS ({report['columns']}):")
+for i, (col, info) in enumerate(profiles.items(), 1):
+    print(f"   {i:2d}. {col:25s} ({info['dtype']:10s}) - Nulos: {info['nulls']:6d} | "
+          f"Únicos (aprox): {info['approx_unique']:,}")
 
 print(f"\n🎯 VARIABLE OBJETIVO (is_fraud):")
-fraud_counts = df['is_fraud'].value_counts()
-fraud_rate = (fraud_counts.get(True, 0) / len(df)) * 100
-print(f"   - Transacciones legítimas: {fraud_counts.get(False, 0):,} ({100-fraud_rate:.2f}%)")
-print(f"   - Transacciones fraudulentas: {fraud_counts.get(True, 0):,} ({fraud_rate:.2f}%)")
-print(f"   - Ratio de desbalance: 1:{int((100-fraud_rate)/fraud_rate)}")
+fraud_count, fraud_rate = share(profiles['is_fraud'], 'True', rows)
+print(f"   - Transacciones legítimas: {rows - fraud_count:,} ({100-fraud_rate:.2f}%)")
+print(f"   - Transacciones fraudulentas: {fraud_count:,} ({fraud_rate:.2f}%)")
+if fraud_rate > 0:
+    print(f"   - Ratio de desbalance: 1:{int((100-fraud_rate)/fraud_rate)}")
 
 print(f"\n💰 ANÁLISIS DE MONTOS:")
-print(df[['amount']].describe())
+amount = profiles['amount']
+print(pd.Series({k: amount[k] for k in ['count', 'mean', 'std', 'min', 'p25', 'p50', 'p75', 'max']}).to_string())
 print(f"\n   Por fraude:")
-print(df.groupby('is_fraud')['amount'].agg(['count', 'mean', 'median', 'std', 'min', 'max']))
+print(pd.DataFrame(report['numeric_by_target']['amount']).T.to_string())
 
 print(f"\n🌍 DISTRIBUCIÓN GEOGRÁFICA:")
 print(f"\n   Top 10 países:")
-print(df['country'].value_counts().head(10))
+print_top(profiles['country'])
 
 print(f"\n💳 TIPOS DE TARJETA:")
-print(df['card_type'].value_counts())
+print_top(profiles['card_type'])
 
 print(f"\n📱 CANALES DE TRANSACCIÓN:")
-print(df['channel'].value_counts())
+print_top(profiles['channel'])
 
 print(f"\n🏪 CATEGORÍAS DE COMERCIO (Top 10):")
-print(df['merchant_category'].value_counts().head(10))
+print_top(profiles['merchant_category'])
 
 print(f"\n⚠️  HIGH RISK MERCHANTS:")
-high_risk = df['high_risk_merchant'].value_counts()
-print(f"   - High Risk: {high_risk.get(True, 0):,} ({high_risk.get(True, 0)/len(df)*100:.2f}%)")
-print(f"   - Normal: {high_risk.get(False, 0):,} ({high_risk.get(False, 0)/len(df)*100:.2f}%)")
+high_risk, high_risk_pct = share(profiles['high_risk_merchant'], 'True', rows)
+print(f"   - High Risk: {high_risk:,} ({high_risk_pct:.2f}%)")
+print(f"   - Normal: {rows - high_risk:,} ({100 - high_risk_pct:.2f}%)")
 
 print(f"\n🕐 DISTRIBUCIÓN TEMPORAL:")
 print(f"   Horas del día (Top 5):")
-print(df['transaction_hour'].value_counts().head())
+print_top(profiles['transaction_hour'], limit=5)
 
 print(f"\n📊 CARD PRESENT vs NOT PRESENT:")
-card_present = df['card_present'].value_counts()
-print(f"   - Card Present: {card_present.get(True, 0):,} ({card_present.get(True, 0)/len(df)*100:.2f}%)")
-print(f"   - Card Not Present: {card_present.get(False, 0):,} ({card_present.get(False, 0)/len(df)*100:.2f}%)")
+card_present, card_present_pct = share(profiles['card_present'], 'True', rows)
+print(f"   - Card Present: {card_present:,} ({card_present_pct:.2f}%)")
+print(f"   - Card Not Present: {rows - card_present:,} ({100 - card_present_pct:.2f}%)")
 
 print(f"\n📍 DISTANCE FROM HOME:")
-print(df['distance_from_home'].value_counts().head(10))
+print_top(profiles['distance_from_home'])
 
 print(f"\n📈 CORRELACIÓN CON FRAUDE:")
-print("\nFraude por Card Present:")
-print(pd.crosstab(df['card_present'], df['is_fraud'], normalize='index') * 100)
-
-print("\nFraude por High Risk Merchant:")
-print(pd.crosstab(df['high_risk_merchant'], df['is_fraud'], normalize='index') * 100)
-
-print("\nFraude por Distance from Home:")
-print(pd.crosstab(df['distance_from_home'], df['is_fraud'], normalize='index') * 100)
+for col, title in [('card_present', 'Card Present'), ('high_risk_merchant', 'High Risk Merchant'),
+                   ('distance_from_home', 'Distance from Home'), ('channel', 'Channel'),
+                   ('card_type', 'Card Type')]:
+    print(f"\nFraude por {title}:")
+    print_contingency(report['contingency'][col])
 
 print(f"\n🔍 VELOCITY METRICS (ejemplo - primera transacción):")
 try:
     # El campo velocity_last_hour es un string que parece JSON
-    velocity_sample = df['velocity_last_hour'].iloc[0]
+    velocity_sample = report['head'][0]['velocity_last_hour']
     print(f"   Tipo: {type(velocity_sample)}")
     print(f"   Contenido: {velocity_sample}")
     
@@ -19,3 +19,4 @@ TRUNCATE TABLE fraud_daily_kpis CASCADE;
 TRUNCATE TABLE fraud_merchant_kpis CASCADE;
 TRUNCATE TABLE fraud_country_kpis CASCADE;
 TRUNCATE TABLE fraud_hourly_patterns CASCADE;
+TRUNCATE TABLE fraud_link_components CASCADE;
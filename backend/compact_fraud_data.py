@@ -5,51 +5,210 @@ Mantiene TODA la información relevante para dashboards y ML
 import pandas as pd
 import numpy as np
 import ast
+import os
 from datetime import datetime
+from heavy_hitters import top_k_table, top_k_from_csv, sketches_to_table
+from partitioned_store import write_partitions
+from id_maps import DEFAULT_ID_MAP_DIR, FRAUD_DIMENSIONS, IdMapRegistry
+from dataframe_engine import get_engine
+
+FRAUD_PARTITION_DIR = 'processed_fraud_transactions'
+
+# Estratos del sampling de transacciones legítimas
+SAMPLE_STRATA = ['country', 'merchant_category', 'channel', 'card_type']
+COMPACT_COLUMNS = [
+    'transaction_id', 'customer_id', 'card_number', 'date', 'hour', 'day_of_week',
+    'merchant_category', 'merchant_type', 'merchant', 'amount', 'currency',
+    'country', 'city', 'card_type', 'card_present', 'device', 'channel',
+    'device_fingerprint', 'distance_from_home', 'high_risk_merchant',
+    'is_weekend', 'is_fraud',
+    'velocity_num_trans', 'velocity_total_amount', 'velocity_unique_merchants',
+    'velocity_unique_countries', 'velocity_max_amount'
+]
+# Columnas de la fuente que necesita el dataset compacto (proyección del motor lazy)
+COMPACT_SOURCE_COLUMNS = [
+    'transaction_id', 'customer_id', 'card_number', 'timestamp', 'merchant_category', 'merchant_type',
+    'merchant', 'amount', 'currency', 'country', 'city', 'card_type', 'card_present', 'device', 'channel',
+    'device_fingerprint', 'distance_from_home', 'high_risk_merchant', 'weekend_transaction', 'is_fraud'
+]
+# columna -> (clave en velocity_last_hour, tipo SQL)
+VELOCITY_FIELDS = {
+    'velocity_num_trans': ('num_transactions', 'BIGINT'),
+    'velocity_total_amount': ('total_amount', 'DOUBLE'),
+    'velocity_unique_merchants': ('unique_merchants', 'BIGINT'),
+    'velocity_unique_countries': ('unique_countries', 'BIGINT'),
+    'velocity_max_amount': ('max_single_amount', 'DOUBLE'),
+}
+
+# Agregaciones por tabla: (claves, [(salida, operación, columna[, argumento])]) en el formato de
+# dataframe_engine, para que pandas y DuckDB produzcan exactamente las mismas columnas
+_TOTALS = [('total_transactions', 'count', 'transaction_id'), ('total_amount', 'sum', 'amount'),
+           ('avg_amount', 'mean', 'amount')]
+_FRAUD = [('fraud_count', 'sum', 'is_fraud'), ('fraud_rate', 'mean', 'is_fraud')]
+FRAUD_AGGREGATIONS = {
+    'daily': (['date'], _TOTALS + [('median_amount', 'median', 'amount')] + _FRAUD + [
+        ('unique_customers', 'nunique', 'customer_id'), ('unique_merchants', 'nunique', 'merchant'),
+        ('unique_countries', 'nunique', 'country'), ('fraud_amount', 'sum_where', 'amount', 'is_fraud')]),
+    'merchant': (['merchant', 'merchant_category', 'merchant_type'], _TOTALS + _FRAUD + [
+        ('unique_customers', 'nunique', 'customer_id')]),
+    'country': (['country'], _TOTALS + _FRAUD + [
+        ('unique_customers', 'nunique', 'customer_id'), ('unique_merchants', 'nunique', 'merchant')]),
+    'hourly': (['transaction_hour'], _TOTALS + _FRAUD),
+}
+
+
+def parse_velocity_columns(df):
+    """Reemplaza velocity_last_hour (dict como string) por 5 columnas numéricas"""
+    def parse_velocity(velocity_str):
+        try:
+            return ast.literal_eval(velocity_str)
+        except:
+            return {}
+    
+    velocity_data = df['velocity_last_hour'].apply(parse_velocity)
+    for column, (field, _) in VELOCITY_FIELDS.items():
+        df[column] = velocity_data.apply(lambda x: x.get(field, 0))
+    
+    # Eliminar columna original
+    df.drop('velocity_last_hour', axis=1, inplace=True)
+    return df
+
+
+def _velocity_sql(alias):
+    """Las mismas 5 columnas que parse_velocity_columns, extraídas con regex en DuckDB (0 si falta)"""
+    expressions = []
+    for column, (field, sql_type) in VELOCITY_FIELDS.items():
+        pattern = f"''{field}'': ([^,}}]+)"
+        expressions.append(f"COALESCE(TRY_CAST(regexp_extract({alias}velocity_last_hour, '{pattern}', 1) "
+                           f"AS {sql_type}), 0) AS {column}")
+    return ', '.join(expressions)
+
+
+def _round_kpis(agg):
+    """Tasa de fraude en % y montos a 2 decimales (común a ambos motores)"""
+    agg['fraud_rate'] = (agg['fraud_rate'] * 100).round(2)
+    for col in ['total_amount', 'avg_amount', 'median_amount', 'fraud_amount']:
+        if col in agg.columns:
+            agg[col] = agg[col].round(2)
+    return agg
+
 
 class FraudDataCompactor:
-    def __init__(self, csv_path='synthetic_fraud_data.csv'):
+    def __init__(self, csv_path='synthetic_fraud_data.csv', partition_by=('date',), id_map_dir=DEFAULT_ID_MAP_DIR,
+                 engine=None):
         self.csv_path = csv_path
+        self.partition_by = list(partition_by)
+        self.id_maps = IdMapRegistry(id_map_dir)
+        # 'pandas' (eager) o 'duckdb' (lazy: self.df es una vista y solo se materializan resultados)
+        self.engine = get_engine(engine)
         self.df = None
+        self.rows = 0
+        self.sample_size = None
+        self._dated = None
+        # Reproceso por fechas: solo esos días, con la tasa de sampling del dataset completo
+        self.dates = None
+        self._sampling = None
         
     def load_data(self, sample_size=None):
         """Carga datos con sampling opcional"""
-        print("📥 Cargando datos de fraude...")
+        print(f"📥 Cargando datos de fraude (motor {self.engine.name})...")
         
-        if sample_size:
-            # Para testing: cargar solo una muestra
-            self.df = pd.read_csv(self.csv_path, nrows=sample_size)
-        else:
-            # Cargar todo el dataset
-            self.df = pd.read_csv(self.csv_path)
+        # sample_size: para testing, solo las primeras filas
+        self.df = self.engine.load(self.csv_path, nrows=sample_size or None)
+        self.rows = self.engine.count(self.df)
+        self.sample_size = sample_size or None
+        self._dated = None
         
-        print(f"✅ Cargados: {len(self.df):,} registros")
+        print(f"✅ Cargados: {self.rows:,} registros")
+        return self
+    
+    def restrict_to_dates(self, dates):
+        """
+        Deja en self.df solo las transacciones de `dates` ('YYYY-MM-DD'). La tasa de sampling de
+        legítimas se fija antes con el total del dataset, para que las filas del día reprocesado
+        tengan el mismo peso que las del resto de particiones
+        """
+        self.dates = sorted({str(d) for d in dates})
+        print(f"\n📆 Reprocesando solo {len(self.dates)} fecha(s): {', '.join(self.dates)}")
+        
+        if self.engine.lazy:
+            total_legit = self.engine.con.execute(
+                f"SELECT COUNT(*) FROM {self.df} WHERE is_fraud = FALSE").fetchone()[0]
+            in_dates = ', '.join(f"'{d}'" for d in self.dates)
+            self.df = self.engine.view(f'SELECT * FROM {self.df} WHERE LEFT("timestamp", 10) IN ({in_dates})')
+        else:
+            total_legit = int((self.df['is_fraud'] == False).sum())
+            self.df = self.df[self.df['timestamp'].astype(str).str[:10].isin(self.dates)].reset_index(drop=True)
+        self._sampling = (min(200000, total_legit), total_legit)
+        self.rows = self.engine.count(self.df)
+        self._dated = None
+        
+        if self.rows == 0:
+            raise ValueError(f"❌ No hay transacciones para las fechas {', '.join(self.dates)}")
+        print(f"✅ {self.rows:,} registros en esas fechas")
         return self
     
     def parse_velocity_metrics(self):
         """Parsea el campo velocity_last_hour de JSON string a columnas"""
         print("\n📊 Parseando métricas de velocity...")
         
-        def parse_velocity(velocity_str):
-            try:
-                return ast.literal_eval(velocity_str)
-            except:
-                return {}
+        if self.engine.lazy:
+            # Solo lo usa el dataset compacto: se extrae en DuckDB al materializar esas filas
+            print(f"✅ Velocity metrics: se extraen solo sobre las transacciones compactas")
+            return self
         
-        velocity_data = self.df['velocity_last_hour'].apply(parse_velocity)
-        
-        self.df['velocity_num_trans'] = velocity_data.apply(lambda x: x.get('num_transactions', 0))
-        self.df['velocity_total_amount'] = velocity_data.apply(lambda x: x.get('total_amount', 0))
-        self.df['velocity_unique_merchants'] = velocity_data.apply(lambda x: x.get('unique_merchants', 0))
-        self.df['velocity_unique_countries'] = velocity_data.apply(lambda x: x.get('unique_countries', 0))
-        self.df['velocity_max_amount'] = velocity_data.apply(lambda x: x.get('max_single_amount', 0))
-        
-        # Eliminar columna original
-        self.df.drop('velocity_last_hour', axis=1, inplace=True)
+        parse_velocity_columns(self.df)
         
         print(f"✅ Velocity metrics parseadas: 5 nuevas columnas")
         return self
     
+    def _sample_legit(self, legit, sample_size, total_legit):
+        """Muestra estratificada de legítimas (pandas)"""
+        # Selección explícita de columnas: desde pandas 3 apply() excluye las claves de grupo
+        return legit.groupby(
+            SAMPLE_STRATA,
+            group_keys=False
+        )[list(legit.columns)].apply(lambda x: x.sample(
+            n=max(1, int(len(x) * sample_size / total_legit)),
+            random_state=42
+        )).reset_index(drop=True)
+    
+    def _select_compact_rows(self):
+        """(fraudes, muestra de legítimas, total de legítimas) según el motor"""
+        if not self.engine.lazy:
+            frauds = self.df[self.df['is_fraud'] == True].copy()
+            legit = self.df[self.df['is_fraud'] == False].copy()
+            sample_size, total_legit = self._sampling or (min(200000, len(legit)), len(legit))
+            return frauds, self._sample_legit(legit, sample_size, total_legit), len(legit)
+        
+        engine, source = self.engine, self.df
+        strata = ', '.join(f'"{col}"' for col in SAMPLE_STRATA)
+        not_null = ' AND '.join(f'"{col}" IS NOT NULL' for col in SAMPLE_STRATA)
+        legit_rows = engine.con.execute(f"SELECT COUNT(*) FROM {source} WHERE is_fraud = FALSE").fetchone()[0]
+        sample_size, total_legit = self._sampling or (min(200000, legit_rows), legit_rows)
+        
+        # Mismo sampling que pandas: grupos en orden de clave, RandomState(42) por grupo sobre
+        # las posiciones de sus filas en orden de archivo; solo se traen las filas elegidas
+        counts = engine.sql(f"SELECT {strata}, COUNT(*) AS n FROM {source} "
+                            f"WHERE is_fraud = FALSE AND {not_null} GROUP BY {strata}")
+        counts = counts.sort_values(SAMPLE_STRATA, kind='stable').reset_index(drop=True)
+        picks = [np.random.RandomState(42).choice(n, max(1, int(n * sample_size / total_legit)), replace=False)
+                 for n in counts['n']]
+        selection = counts.loc[np.repeat(counts.index, [len(p) for p in picks]), SAMPLE_STRATA].reset_index(drop=True)
+        selection['_pos'] = np.concatenate(picks) if picks else np.array([], dtype=np.int64)
+        selection['_order'] = np.arange(len(selection))
+        selected = engine.from_frame(selection)
+        
+        # velocity_last_hour se parsea en DuckDB solo sobre las filas elegidas
+        columns = lambda alias: ', '.join([f'{alias}"{col}"' for col in COMPACT_SOURCE_COLUMNS] + [_velocity_sql(alias)])
+        legit_sample = engine.sql(
+            f"SELECT {columns('l.')} FROM "
+            f"(SELECT *, ROW_NUMBER() OVER (PARTITION BY {strata} ORDER BY _row) - 1 AS _pos "
+            f" FROM {source} WHERE is_fraud = FALSE AND {not_null}) l "
+            f"JOIN {selected} s USING ({strata}, _pos) ORDER BY s._order")
+        frauds = engine.sql(f"SELECT {columns('')} FROM {source} WHERE is_fraud = TRUE ORDER BY _row")
+        return frauds, legit_sample, legit_rows
+    
     def create_compact_transactions(self):
         """
         Estrategia de Sampling Inteligente:
@@ -58,30 +217,18 @@ class FraudDataCompactor:
         """
         print("\n🎯 Creando dataset compacto de transacciones...")
         
-        # Separar fraudes y legítimas
-        frauds = self.df[self.df['is_fraud'] == True].copy()
-        legit = self.df[self.df['is_fraud'] == False].copy()
+        # Fraudes completos + sampling estratificado de legítimas (~200K) que mantiene
+        # representatividad por: país, merchant_category, channel, card_type
+        frauds, legit_sample, total_legit = self._select_compact_rows()
         
         print(f"   - Fraudulentas: {len(frauds):,} (100% conservadas)")
-        print(f"   - Legítimas: {len(legit):,}")
-        
-        # Sampling estratificado de legítimas
-        # Mantener representatividad por: país, merchant_category, channel, card_type
-        sample_size = min(200000, len(legit))
-        
-        # Sampling estratificado
-        legit_sample = legit.groupby(
-            ['country', 'merchant_category', 'channel', 'card_type'],
-            group_keys=False
-        ).apply(lambda x: x.sample(
-            n=max(1, int(len(x) * sample_size / len(legit))),
-            random_state=42
-        )).reset_index(drop=True)
-        
-        print(f"   - Muestra legítimas: {len(legit_sample):,} ({len(legit_sample)/len(legit)*100:.2f}%)")
+        print(f"   - Legítimas: {total_legit:,}")
+        print(f"   - Muestra legítimas: {len(legit_sample):,} ({len(legit_sample)/total_legit*100:.2f}%)")
         
         # Combinar
         compact_df = pd.concat([frauds, legit_sample], ignore_index=True)
+        if 'velocity_last_hour' in compact_df.columns:
+            parse_velocity_columns(compact_df)
         
         # Optimizar tipos de datos
         compact_df['timestamp'] = pd.to_datetime(compact_df['timestamp'], format='mixed', utc=True)
@@ -101,53 +248,35 @@ class FraudDataCompactor:
         compact_df['velocity_max_amount'] = compact_df['velocity_max_amount'].round(2)
         
         # Seleccionar solo columnas necesarias
-        columns_to_keep = [
-            'transaction_id', 'customer_id', 'card_number', 'date', 'hour', 'day_of_week',
-            'merchant_category', 'merchant_type', 'merchant', 'amount', 'currency',
-            'country', 'city', 'card_type', 'card_present', 'device', 'channel',
-            'device_fingerprint', 'distance_from_home', 'high_risk_merchant',
-            'is_weekend', 'is_fraud',
-            'velocity_num_trans', 'velocity_total_amount', 'velocity_unique_merchants',
-            'velocity_unique_countries', 'velocity_max_amount'
-        ]
-        
-        compact_df = compact_df[columns_to_keep]
+        compact_df = compact_df[COMPACT_COLUMNS]
         
         print(f"\n✅ Dataset compacto creado: {len(compact_df):,} registros")
-        print(f"   Reducción: {(1 - len(compact_df)/len(self.df))*100:.1f}%")
+        print(f"   Reducción: {(1 - len(compact_df)/self.rows)*100:.1f}%")
         
         return compact_df
     
+    def _aggregate(self, name, source=None):
+        keys, aggs = FRAUD_AGGREGATIONS[name]
+        return self.engine.aggregate(self.df if source is None else source, keys, aggs)
+    
+    def _with_date(self):
+        """Fuente con la columna date (fecha local del timestamp, como .dt.date en pandas)"""
+        if self._dated is None:
+            if self.engine.lazy:
+                self._dated = self.engine.view(
+                    f'SELECT *, CAST(LEFT("timestamp", 10) AS DATE) AS date FROM {self.df}')
+            else:
+                self.df['date'] = pd.to_datetime(self.df['timestamp']).dt.date
+                self._dated = self.df
+        return self._dated
+    
     def create_daily_aggregations(self):
         """Crea agregaciones diarias para dashboards"""
         print("\n📅 Creando agregaciones diarias...")
         
-        self.df['date'] = pd.to_datetime(self.df['timestamp']).dt.date
-        
-        daily_agg = self.df.groupby('date').agg({
-            'transaction_id': 'count',
-            'amount': ['sum', 'mean', 'median'],
-            'is_fraud': ['sum', 'mean'],
-            'customer_id': 'nunique',
-            'merchant': 'nunique',
-            'country': 'nunique'
-        }).reset_index()
-        
-        daily_agg.columns = [
-            'date', 'total_transactions', 'total_amount', 'avg_amount', 'median_amount',
-            'fraud_count', 'fraud_rate', 'unique_customers', 'unique_merchants', 'unique_countries'
-        ]
-        
-        # Calcular métricas adicionales
-        daily_agg['fraud_amount'] = self.df[self.df['is_fraud'] == True].groupby(
-            pd.to_datetime(self.df['timestamp']).dt.date
-        )['amount'].sum().values
-        
-        daily_agg['fraud_rate'] = (daily_agg['fraud_rate'] * 100).round(2)
-        daily_agg['total_amount'] = daily_agg['total_amount'].round(2)
-        daily_agg['avg_amount'] = daily_agg['avg_amount'].round(2)
-        daily_agg['median_amount'] = daily_agg['median_amount'].round(2)
-        daily_agg['fraud_amount'] = daily_agg['fraud_amount'].round(2)
+        daily_agg = _round_kpis(self._aggregate('daily', self._with_date()))
+        if self.engine.lazy:
+            daily_agg['date'] = pd.to_datetime(daily_agg['date']).dt.date
         
         print(f"✅ Agregaciones diarias creadas: {len(daily_agg):,} días")
         
@@ -157,22 +286,7 @@ class FraudDataCompactor:
         """Crea agregaciones por comerciante"""
         print("\n🏪 Creando agregaciones por comerciante...")
         
-        merchant_agg = self.df.groupby(['merchant', 'merchant_category', 'merchant_type']).agg({
-            'transaction_id': 'count',
-            'amount': ['sum', 'mean'],
-            'is_fraud': ['sum', 'mean'],
-            'customer_id': 'nunique'
-        }).reset_index()
-        
-        merchant_agg.columns = [
-            'merchant', 'merchant_category', 'merchant_type',
-            'total_transactions', 'total_amount', 'avg_amount',
-            'fraud_count', 'fraud_rate', 'unique_customers'
-        ]
-        
-        merchant_agg['fraud_rate'] = (merchant_agg['fraud_rate'] * 100).round(2)
-        merchant_agg['total_amount'] = merchant_agg['total_amount'].round(2)
-        merchant_agg['avg_amount'] = merchant_agg['avg_amount'].round(2)
+        merchant_agg = _round_kpis(self._aggregate('merchant'))
         
         # Calcular risk level
         def get_risk_level(fraud_rate):
@@ -195,22 +309,7 @@ class FraudDataCompactor:
         """Crea agregaciones por país"""
         print("\n🌍 Creando agregaciones por país...")
         
-        country_agg = self.df.groupby('country').agg({
-            'transaction_id': 'count',
-            'amount': ['sum', 'mean'],
-            'is_fraud': ['sum', 'mean'],
-            'customer_id': 'nunique',
-            'merchant': 'nunique'
-        }).reset_index()
-        
-        country_agg.columns = [
-            'country', 'total_transactions', 'total_amount', 'avg_amount',
-            'fraud_count', 'fraud_rate', 'unique_customers', 'unique_merchants'
-        ]
-        
-        country_agg['fraud_rate'] = (country_agg['fraud_rate'] * 100).round(2)
-        country_agg['total_amount'] = country_agg['total_amount'].round(2)
-        country_agg['avg_amount'] = country_agg['avg_amount'].round(2)
+        country_agg = _round_kpis(self._aggregate('country'))
         
         country_agg = country_agg.sort_values('total_transactions', ascending=False)
         
@@ -222,61 +321,146 @@ class FraudDataCompactor:
         """Crea patrones por hora del día"""
         print("\n🕐 Creando patrones horarios...")
         
-        hourly_agg = self.df.groupby('transaction_hour').agg({
-            'transaction_id': 'count',
-            'amount': ['sum', 'mean'],
-            'is_fraud': ['sum', 'mean']
-        }).reset_index()
-        
-        hourly_agg.columns = [
-            'hour', 'total_transactions', 'total_amount', 'avg_amount',
-            'fraud_count', 'fraud_rate'
-        ]
-        
-        hourly_agg['fraud_rate'] = (hourly_agg['fraud_rate'] * 100).round(2)
-        hourly_agg['total_amount'] = hourly_agg['total_amount'].round(2)
-        hourly_agg['avg_amount'] = hourly_agg['avg_amount'].round(2)
+        hourly_agg = _round_kpis(self._aggregate('hourly')).rename(columns={'transaction_hour': 'hour'})
         
         print(f"✅ Patrones horarios creados: 24 horas")
         
         return hourly_agg
     
-    def export_compact_data(self):
-        """Exporta todos los datasets compactos"""
+    def create_top_k_tables(self, k=50):
+        """Crea rankings top-k (Pareto) de comerciantes y clientes"""
+        print("\n🏆 Creando rankings top-k...")
+        
+        df = self.engine.to_pandas(self.df, ['merchant', 'customer_id', 'amount', 'is_fraud'])
+        fraud_amount = df['amount'] * df['is_fraud'].astype(int)
+        
+        top_k = pd.concat([
+            top_k_table('fraud', 'merchant_amount', df['merchant'], df['amount'], k=k),
+            top_k_table('fraud', 'merchant_fraud_amount', df['merchant'], fraud_amount, k=k),
+            top_k_table('fraud', 'customer_amount', df['customer_id'], df['amount'], k=k),
+            top_k_table('fraud', 'customer_fraud_amount', df['customer_id'], fraud_amount, k=k)
+        ], ignore_index=True)
+        
+        print(f"✅ Rankings top-k creados: {top_k['dimension'].nunique()} dimensiones")
+        
+        return top_k
+    
+    def stream_top_k(self, k=50, chunksize=500_000, capacity=5000):
+        """Rankings top-k en streaming sobre el CSV original (sin cargarlo completo)"""
+        print("\n🏆 Creando rankings top-k en streaming...")
+        
+        fraud_amount = lambda c: c['amount'] * c['is_fraud'].astype(int)
+        specs = {
+            'merchant_amount': (lambda c: c['merchant'], lambda c: c['amount']),
+            'merchant_fraud_amount': (lambda c: c['merchant'], fraud_amount),
+            'customer_amount': (lambda c: c['customer_id'], lambda c: c['amount']),
+            'customer_fraud_amount': (lambda c: c['customer_id'], fraud_amount)
+        }
+        
+        sketches = top_k_from_csv(self.csv_path, specs, k=k, capacity=capacity, chunksize=chunksize,
+                                  usecols=['merchant', 'customer_id', 'amount', 'is_fraud'])
+        top_k = sketches_to_table('fraud', sketches, k=k)
+        
+        rows = next(iter(sketches.values())).rows
+        print(f"✅ Rankings top-k creados: {rows:,} registros procesados en chunks de {chunksize:,}")
+        
+        return top_k
+    
+    def encode_identifiers(self, compact_df):
+        """
+        Reemplaza transaction_id, customer_id, card_number, merchant y device_fingerprint por
+        surrogate keys enteras persistentes (id_maps/) y escribe las tablas de dimensión
+        """
+        print("\n🔢 Codificando identificadores como enteros...")
+        
+        original_mb = compact_df[[col for col in FRAUD_DIMENSIONS if col in compact_df.columns]] \
+            .memory_usage(deep=True).sum() / 1024 / 1024
+        encoded_df, dimensions = self.id_maps.encode_columns(compact_df)
+        self.id_maps.save()
+        encoded_mb = encoded_df[[id_col for id_col, _ in FRAUD_DIMENSIONS.values()]] \
+            .memory_usage(deep=True).sum() / 1024 / 1024
+        
+        for table, dim_df in dimensions.items():
+            dim_df.to_csv(f'processed_{table}.csv', index=False)
+            print(f"   ✅ {table}: {len(dim_df):,} ids")
+        print(f"   Identificadores: {original_mb:.1f} MB → {encoded_mb:.1f} MB")
+        
+        return encoded_df, dimensions
+    
+    def export_compact_data(self, uploader=None, write_transactions=True):
+        """
+        Exporta todos los datasets compactos. Con uploader (pipelined_upload.PipelinedUploader)
+        cada tabla se entrega para subir apenas está lista, mientras se calculan las siguientes;
+        write_transactions=False omite el CSV y las particiones de transacciones. Con self.dates
+        (restrict_to_dates) solo se reemplazan esas fechas en transacciones, particiones y KPIs
+        diarios; las agregaciones globales requieren una corrida completa
+        """
         print("\n💾 Exportando datos compactados...")
         
-        # 1. Transacciones compactas
+        def emit(df, table, **kwargs):
+            if uploader is not None:
+                uploader.submit(df, table, **kwargs)
+        
+        # 1. Transacciones compactas (identificadores como enteros + dimensiones)
         compact_trans = self.create_compact_transactions()
-        compact_trans.to_csv('processed_fraud_transactions.csv', index=False)
+        compact_trans, dimensions = self.encode_identifiers(compact_trans)
+        emit(compact_trans, 'fraud_transactions', batch_size=10000)
+        for table, dim_df in dimensions.items():
+            emit(dim_df, table, batch_size=10000, on_conflict='id')
         size_mb = compact_trans.memory_usage(deep=True).sum() / 1024 / 1024
-        print(f"   ✅ Transacciones: {len(compact_trans):,} registros (~{size_mb:.1f} MB)")
+        if write_transactions:
+            self._write_by_date(compact_trans, 'processed_fraud_transactions.csv')
+            print(f"   ✅ Transacciones: {len(compact_trans):,} registros (~{size_mb:.1f} MB)")
+            self.export_partitions(compact_trans, replace_all=not self.dates)
+        else:
+            print(f"   ✅ Transacciones: {len(compact_trans):,} registros (~{size_mb:.1f} MB, sin CSV intermedio)")
         
         # 2. Agregaciones diarias
         daily_agg = self.create_daily_aggregations()
-        daily_agg.to_csv('processed_fraud_daily_kpis.csv', index=False)
+        self._write_by_date(daily_agg, 'processed_fraud_daily_kpis.csv')
+        emit(daily_agg, 'fraud_daily_kpis')
         print(f"   ✅ KPIs diarios: {len(daily_agg):,} registros")
         
+        if self.dates:
+            # Comerciantes, países, horas y top-k agregan todo el período: un subconjunto de días
+            # los dejaría incompletos, así que se conservan los de la última corrida completa
+            print("   ⏭️  KPIs por comerciante/país/hora y top-k sin cambios (requieren corrida completa)")
+            return {'transactions': compact_trans, 'daily': daily_agg, 'dimensions': dimensions}
+        
         # 3. Agregaciones por comerciante
         merchant_agg = self.create_merchant_aggregations()
         merchant_agg.to_csv('processed_fraud_merchant_kpis.csv', index=False)
+        emit(merchant_agg, 'fraud_merchant_kpis')
         print(f"   ✅ KPIs comerciantes: {len(merchant_agg):,} registros")
         
         # 4. Agregaciones por país
         country_agg = self.create_country_aggregations()
         country_agg.to_csv('processed_fraud_country_kpis.csv', index=False)
+        emit(country_agg, 'fraud_country_kpis')
         print(f"   ✅ KPIs países: {len(country_agg):,} registros")
         
         # 5. Patrones horarios
         hourly_agg = self.create_hourly_patterns()
         hourly_agg.to_csv('processed_fraud_hourly_patterns.csv', index=False)
+        emit(hourly_agg, 'fraud_hourly_patterns')
         print(f"   ✅ Patrones horarios: {len(hourly_agg):,} registros")
         
+        # 6. Rankings top-k (motor lazy: un pase en chunks sobre el CSV en vez de materializar
+        # las cuatro columnas completas; con muestra de testing, sobre la vista cargada)
+        if self.engine.lazy and not self.sample_size:
+            top_k = self.stream_top_k()
+        else:
+            top_k = self.create_top_k_tables()
+        top_k.to_csv('processed_fraud_top_k.csv', index=False)
+        emit(top_k, 'top_k_rankings')
+        print(f"   ✅ Rankings top-k: {len(top_k):,} registros")
+        
         # Resumen
         total_records = len(compact_trans) + len(daily_agg) + len(merchant_agg) + len(country_agg) + len(hourly_agg)
-        reduction = (1 - total_records / len(self.df)) * 100
+        reduction = (1 - total_records / self.rows) * 100
         
         print(f"\n📊 RESUMEN DE COMPACTACIÓN:")
-        print(f"   Original: {len(self.df):,} registros")
+        print(f"   Original: {self.rows:,} registros")
         print(f"   Compactado: {total_records:,} registros")
         print(f"   Reducción: {reduction:.1f}%")
         print(f"   Tamaño estimado: ~{size_mb:.1f} MB (de ~750 MB)")
@@ -286,18 +470,42 @@ class FraudDataCompactor:
             'daily': daily_agg,
             'merchant': merchant_agg,
             'country': country_agg,
-            'hourly': hourly_agg
+            'hourly': hourly_agg,
+            'top_k': top_k,
+            'dimensions': dimensions
         }
     
-    def run_compaction(self, sample_for_testing=None):
-        """Ejecuta el proceso completo de compactación"""
+    def _write_by_date(self, df, path):
+        """Escribe el CSV; con self.dates reemplaza solo las filas de esas fechas en el existente"""
+        if self.dates and os.path.exists(path):
+            existing = pd.read_csv(path)
+            existing = existing[~existing['date'].astype(str).isin(self.dates)]
+            df = pd.concat([existing, df], ignore_index=True)
+            df = df.sort_values('date', key=lambda col: col.astype(str), kind='stable')
+        df.to_csv(path, index=False)
+    
+    def export_partitions(self, compact_trans, replace_all=False, output_dir=FRAUD_PARTITION_DIR):
+        """
+        Escribe las transacciones compactas particionadas (date=.../[country=...]/) con manifest
+        de filas y min/max por partición. Con replace_all=False solo se reescriben las
+        particiones presentes en compact_trans (p. ej. reprocesar un día)
+        """
+        return write_partitions(compact_trans, output_dir, self.partition_by, replace_all=replace_all)
+    
+    def run_compaction(self, sample_for_testing=None, uploader=None, write_transactions=True, dates=None):
+        """
+        Ejecuta el proceso completo de compactación (ver export_compact_data para uploader).
+        dates: lista de 'YYYY-MM-DD' para reprocesar solo esos días sin tocar el resto
+        """
         print("\n" + "="*80)
         print("🗜️  INICIANDO COMPACTACIÓN DE DATOS DE FRAUDE")
         print("="*80)
         
         self.load_data(sample_size=sample_for_testing)
+        if dates:
+            self.restrict_to_dates(dates)
         self.parse_velocity_metrics()
-        results = self.export_compact_data()
+        results = self.export_compact_data(uploader=uploader, write_transactions=write_transactions)
         
         print("\n" + "="*80)
         print("✅ COMPACTACIÓN COMPLETADA")
@@ -310,9 +518,18 @@ if __name__ == "__main__":
     
     # Opción: ejecutar con muestra pequeña para testing
     # python compact_fraud_data.py test
-    if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    # --by-country: particiona las transacciones por date y country
+    # --engine duckdb: motor lazy multihilo (ver dataframe_engine.py)
+    # --dates 2024-10-01,2024-10-02: reprocesa solo esos días (particiones y KPIs diarios)
+    partition_by = ('date', 'country') if '--by-country' in sys.argv else ('date',)
+    engine = sys.argv[sys.argv.index('--engine') + 1] if '--engine' in sys.argv else None
+    dates = sys.argv[sys.argv.index('--dates') + 1].split(',') if '--dates' in sys.argv else None
+    if dates:
+        compactor = FraudDataCompactor(partition_by=partition_by, engine=engine)
+        compactor.run_compaction(dates=dates)
+    elif len(sys.argv) > 1 and sys.argv[1] == 'test':
         print("⚠️  MODO TEST: Procesando solo 100,000 registros\n")
-        compactor = FraudDataCompactor()
+        compactor = FraudDataCompactor(partition_by=partition_by, engine=engine)
         compactor.run_compaction(sample_for_testing=100000)
     else:
         print("⚠️  MODO COMPLETO: Procesando 7.48M registros")
@@ -320,7 +537,7 @@ if __name__ == "__main__":
         
         response = input("¿Continuar? (y/n): ")
         if response.lower() == 'y':
-            compactor = FraudDataCompactor()
+            compactor = FraudDataCompactor(partition_by=partition_by, engine=engine)
             compactor.run_compaction()
         else:
             print("Cancelado por el usuario")
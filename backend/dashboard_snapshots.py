@@ -0,0 +1,416 @@
+"""
+Snapshots pre-renderizados de los dashboards (digital, telco, airlines, retail, fraud)
+Cada bundle contiene exactamente las tarjetas KPI y series que renderiza la página
+(el mismo objeto que cada dashboard pasa a setData), calculados sobre los CSV procesados.
+Se escriben con nombre por hash de contenido + .json.gz y un manifest.json, de modo que
+la página hace un solo fetch estático (CDN / cache de Next.js) en vez de N consultas a Supabase.
+"""
+import gzip
+import hashlib
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+SNAPSHOT_SCHEMA_VERSION = 1
+SNAPSHOT_DIR = Path(__file__).resolve().parent.parent / 'dashboard-app' / 'public' / 'snapshots'
+
+INR_PER_USD = 83
+
+
+def _fixed(value, digits):
+    """Equivalente a Number.prototype.toFixed de JS"""
+    if value is None or np.isnan(value):
+        return 'NaN'
+    if np.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    return f"{value:.{digits}f}"
+
+
+def _rate(part, total):
+    return part / total * 100 if total else np.nan
+
+
+def _trend(value):
+    return {'value': f"{_fixed(abs(value), 1)}%", 'isPositive': bool(value >= 0)}
+
+
+# ============================================================================
+# Builders: mismo shape que setData en dashboard-app/app/<página>
+# ============================================================================
+
+def build_airlines_snapshot(flights, route_kpis):
+    total = len(flights)
+    price = flights['price'].fillna(0)
+    duration = flights['duration'].fillna(0)
+    stops = flights['stops']
+
+    price_usd = price / INR_PER_USD
+    price_bins = pd.cut(price_usd, [-np.inf, 100, 200, 300, 500, np.inf], right=False,
+                        labels=['Under $100', '$100-200', '$200-300', '$300-500', '$500+'])
+    duration_bins = pd.cut(duration, [-np.inf, 2, 4, 6, np.inf], right=False,
+                           labels=['Short (<2h)', 'Medium (2-4h)', 'Long (4-6h)', 'Very Long (6h+)'])
+
+    airlines = flights.assign(airline=flights['airline'].fillna('Unknown'), price=price) \
+        .groupby('airline', sort=False)['price'].agg(['size', 'sum']).reset_index()
+    airlines = airlines.sort_values('size', ascending=False, kind='stable').head(6)
+
+    top_routes = route_kpis.sort_values('total_flights', ascending=False, kind='stable').head(8) \
+        .fillna({'route': 'Unknown-Unknown', 'total_flights': 0, 'avg_price': 0, 'avg_duration': 0})
+
+    return {
+        'totalFlights': total,
+        'avgPrice': _fixed(price.sum() / total / INR_PER_USD, 0),
+        'avgDuration': _fixed(duration.sum() / total, 1),
+        'directFlightRate': _fixed(_rate(int((stops == 'zero').sum()), total), 1),
+        'classChartData': [{'name': name, 'value': int((flights['class'] == name).sum())}
+                           for name in ['Economy', 'Business']],
+        'stopsChartData': [{'name': name, 'value': int((stops == code).sum())}
+                           for name, code in [('Non-Stop', 'zero'), ('1 Stop', 'one'), ('2+ Stops', 'two_or_more')]],
+        'priceRangeData': [{'range': str(label), 'flights': int(count)}
+                           for label, count in price_bins.value_counts(sort=False).items()],
+        'durationSegmentData': [{'segment': str(label), 'flights': int(count)}
+                                for label, count in duration_bins.value_counts(sort=False).items()],
+        'airlineMarketShare': [{'airline': row.airline, 'share': _fixed(_rate(row.size, total), 1),
+                                'flights': int(row.size)} for row in airlines.itertuples()],
+        'topRoutes': [{'route': row.route, 'flights': int(row.total_flights),
+                       'avgPrice': row.avg_price / INR_PER_USD, 'duration': row.avg_duration}
+                      for row in top_routes.itertuples()],
+        'airlineChartData': [{'airline': row.airline, 'Avg Price': _fixed(row.sum / row.size / INR_PER_USD, 0),
+                              'flights': int(row.size)} for row in airlines.itertuples()],
+        'avgPriceTrend': {'value': '5.2%', 'isPositive': False},
+        'directFlightTrend': {'value': '12%', 'isPositive': True},
+    }
+
+
+def build_fraud_snapshot(transactions, daily_kpis, merchant_kpis, country_kpis, hourly_patterns):
+    # processed_fraud_transactions.csv tiene todos los fraudes pero solo una muestra de legítimas:
+    # totales, tasas y montos salen de los KPIs agregados sobre el dataset completo; de la muestra
+    # solo se usan conteos de fraudes (completos)
+    total = int(daily_kpis['total_transactions'].sum())
+    frauds = int(daily_kpis['fraud_count'].sum())
+    total_amount = round(float(daily_kpis['total_amount'].sum()), 2)
+    fraud_amount = round(float(daily_kpis['fraud_amount'].sum()), 2)
+
+    categories = merchant_kpis.assign(merchant_category=merchant_kpis['merchant_category'].fillna('Unknown')) \
+        .groupby('merchant_category', sort=False)[['total_transactions', 'fraud_count']].sum().reset_index()
+    categories['rate'] = (categories['fraud_count'] / categories['total_transactions'] * 100).round(1)
+    categories = categories.sort_values('rate', ascending=False, kind='stable').head(8)
+
+    is_fraud = transactions['is_fraud'] == 1
+    card_types = transactions.assign(card_type=transactions['card_type'].fillna('Unknown'), fraud=is_fraud) \
+        .groupby('card_type', sort=False)['fraud'].sum()
+
+    merchants = merchant_kpis.sort_values('fraud_rate', ascending=False, kind='stable').head(8) \
+        .fillna({'merchant': 'Unknown', 'fraud_rate': 0, 'total_amount': 0})
+    countries = country_kpis.sort_values('fraud_rate', ascending=False, kind='stable') \
+        .fillna({'country': 'Unknown', 'fraud_rate': 0, 'total_transactions': 0})
+    hours = hourly_patterns.sort_values('hour', kind='stable').fillna({'fraud_rate': 0, 'total_transactions': 0})
+
+    dates = pd.to_datetime(daily_kpis['date'])
+
+    return {
+        'totalTransactions': total,
+        'fraudulentTxns': frauds,
+        'legitimateTxns': total - frauds,
+        'fraudRate': _fixed(_rate(frauds, total) if total else 0, 2),
+        'fraudAmount': fraud_amount,
+        'legitimateAmount': round(total_amount - fraud_amount, 2),
+        'totalAmount': total_amount,
+        'categoryChartData': [{'name': row.merchant_category,
+                               'Fraud Rate': _fixed(row.fraud_count / row.total_transactions * 100, 1),
+                               'transactions': int(row.total_transactions)} for row in categories.itertuples()],
+        'topRiskyMerchants': [{'merchant': row.merchant, 'Fraud Rate': _fixed(row.fraud_rate, 1),
+                               'amount': row.total_amount} for row in merchants.itertuples()],
+        'countryRiskData': [{'country': row.country, 'Fraud Rate': _fixed(row.fraud_rate, 1),
+                             'transactions': int(row.total_transactions)} for row in countries.itertuples()],
+        'hourlyData': [{'hour': f"{int(row.hour)}:00", 'Fraud Rate': _fixed(row.fraud_rate, 1),
+                        'transactions': int(row.total_transactions)} for row in hours.itertuples()],
+        'cardTypeChartData': [{'name': name, 'value': int(value)} for name, value in card_types.items()],
+    }, {'min': dates.min().strftime('%Y-%m-%d'), 'max': dates.max().strftime('%Y-%m-%d')}
+
+
+def _churn_by(customers, col, churned, skip=(), fill=None):
+    """Clientes y churn por categoría (orden de primera aparición, como Object.entries)"""
+    values = customers[col]
+    if fill is not None:
+        values = values.fillna(fill)
+    keep = values.notna() & (values.astype(str).str.strip() != '') & ~values.isin(skip)
+    grouped = churned[keep].groupby(values[keep], sort=False).agg(['size', 'sum'])
+    grouped['rate'] = (grouped['sum'] / grouped['size'] * 100).round(1)
+    return grouped
+
+
+def build_telco_snapshot(customers, segment_kpis):
+    total = len(customers)
+    churned = customers['Churn_Binary'] == 1
+
+    def counts(col, skip=()):
+        values = customers[col]
+        keep = values.notna() & (values.astype(str).str.strip() != '') & ~values.isin(skip)
+        return [{'name': name, 'value': int(value)}
+                for name, value in values[keep].value_counts(sort=False).items() if value > 0]
+
+    def churn_rows(grouped, key):
+        return [{key: name, 'Churn Rate': _fixed(row['sum'] / row['size'] * 100, 1), 'customers': int(row['size'])}
+                for name, row in grouped.iterrows()]
+
+    contract = _churn_by(customers, 'Contract', churned, fill='Unknown') \
+        .sort_values('rate', ascending=False, kind='stable')
+    payment = _churn_by(customers, 'PaymentMethod', churned).sort_values('rate', ascending=False, kind='stable')
+    tenure = _churn_by(customers, 'Tenure_Segment', churned, skip=('Unknown',)) \
+        .sort_values('size', ascending=False, kind='stable')
+
+    charges = customers['MonthlyCharges'].fillna(0)
+    arpu = charges.groupby(customers['ARPU_Segment'].fillna('Unknown'), sort=False).agg(['size', 'sum'])
+    arpu['arpu'] = (arpu['sum'] / arpu['size']).round(2)
+    arpu = arpu.sort_values('arpu', ascending=False, kind='stable')
+
+    segments = segment_kpis.sort_values('revenue_at_risk', ascending=False, kind='stable').fillna(
+        {'revenue_at_risk': 0, 'churn_rate': 0, 'total_customers': 0, 'avg_monthly_charges': 0})
+
+    services = [('Streaming TV', 'StreamingTV'), ('Streaming Movies', 'StreamingMovies'),
+                ('Tech Support', 'TechSupport'), ('Online Security', 'OnlineSecurity'),
+                ('Device Protection', 'DeviceProtection')]
+
+    return {
+        'totalCustomers': total,
+        'churnRate': _fixed(_rate(int(churned.sum()), total), 1),
+        'avgARPU': _fixed(charges.sum() / total, 2),
+        'totalCLV': float(customers['Estimated_CLV'].fillna(0).sum()),
+        'contractChartData': counts('Contract'),
+        'churnByContractData': churn_rows(contract, 'contract'),
+        'internetChartData': counts('InternetService', skip=('No',)),
+        'paymentChurnData': churn_rows(payment, 'method'),
+        'servicesChartData': [{'name': name, 'value': int((customers[col] == 'Yes').sum())} for name, col in services],
+        'tenureChartData': churn_rows(tenure, 'segment'),
+        'arpuChartData': [{'segment': name, 'arpu': _fixed(row['sum'] / row['size'], 2), 'customers': int(row['size'])}
+                          for name, row in arpu.iterrows()],
+        'revenueAtRiskData': [{'segment': f"{row.contract}-{row.tenure_segment}-{row.arpu_segment}",
+                               'revenueAtRisk': row.revenue_at_risk, 'churnRate': row.churn_rate,
+                               'customers': int(row.total_customers)} for row in segments.head(8).itertuples()],
+        'topSegments': [{'segment': f"{row.contract} / {row.tenure_segment} / {row.arpu_segment}",
+                         'customers': int(row.total_customers), 'Churn Rate': _fixed(row.churn_rate, 1),
+                         'arpu': _fixed(row.avg_monthly_charges, 2), 'revenueAtRisk': _fixed(row.revenue_at_risk, 0)}
+                        for row in segments[segments['total_customers'] > 0].head(6).itertuples()],
+    }
+
+
+def build_digital_snapshot(performance):
+    perf = performance.rename(columns=str.lower)
+    for col in ['spend', 'revenue', 'new_customers', 'clicks', 'leads', 'impressions',
+                'active_customers_start_of_day']:
+        perf[col] = pd.to_numeric(perf[col], errors='coerce').fillna(0)
+
+    total_spend = perf['spend'].sum()
+    total_revenue = perf['revenue'].sum()
+    total_new = int(perf['new_customers'].sum())
+    avg_active = perf['active_customers_start_of_day'].sum() / len(perf)
+
+    channels = perf.assign(channel=perf['channel'].fillna('Unknown')).groupby('channel', sort=False)[
+        ['spend', 'revenue', 'new_customers', 'clicks', 'leads', 'impressions']].sum().reset_index()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        channels['roi'] = (channels['revenue'] - channels['spend']) / channels['spend'] * 100
+        channels['cac'] = channels['spend'] / channels['new_customers']
+        channels['ltv_cac'] = (channels['revenue'] / channels['new_customers']) / channels['cac']
+
+    def by(col, ascending):
+        return channels.sort_values(col, ascending=ascending, kind='stable')
+
+    perf['month'] = perf['date'].astype(str).str[:7]
+    monthly = perf.groupby('month')[['revenue', 'spend', 'new_customers']].sum().reset_index()
+
+    dates = pd.to_datetime(perf['date'])
+
+    return {
+        'totalSpend': _fixed(total_spend, 2),
+        'totalRevenue': _fixed(total_revenue, 2),
+        'roi': _fixed((total_revenue - total_spend) / total_spend * 100, 1),
+        'totalNewCustomers': total_new,
+        'cac': _fixed(total_spend / total_new, 2),
+        'arpu': _fixed(total_revenue / avg_active, 2),
+        'spendByChannelData': [{'name': row.channel, 'value': round(row.spend, 2)} for row in channels.itertuples()],
+        'revenueByChannelData': [{'channel': row.channel, 'revenue': round(row.revenue, 2)}
+                                 for row in by('revenue', False).itertuples()],
+        'roiByChannelData': [{'channel': row.channel, 'ROI': round(row.roi, 1)} for row in by('roi', False).itertuples()],
+        'cacByChannelData': [{'channel': row.channel, 'CAC': round(row.cac, 2)} for row in by('cac', True).itertuples()],
+        'ltvCacRatioData': [{'channel': row.channel, 'LTV/CAC': round(row.ltv_cac, 2)}
+                            for row in by('ltv_cac', False).itertuples()],
+        'monthlyTrendData': [{'month': row.month, 'Revenue': round(row.revenue, 2), 'Spend': round(row.spend, 2)}
+                             for row in monthly.itertuples()],
+        'newCustomersTrendData': [{'month': row.month, 'New Customers': int(row.new_customers)}
+                                  for row in monthly.itertuples()],
+        'channelPriorityData': [{'channel': row.channel, 'spend': _fixed(row.spend, 2), 'revenue': _fixed(row.revenue, 2),
+                                 'roi': _fixed(row.roi, 1), 'cac': _fixed(row.cac, 2),
+                                 'newCustomers': int(row.new_customers),
+                                 'status': 'scale' if row.roi > 100 else 'optimize' if row.roi > 0 else 'review'}
+                                for row in by('roi', False).head(5).itertuples()],
+    }, {'min': dates.min().strftime('%Y-%m-%d'), 'max': dates.max().strftime('%Y-%m-%d')}
+
+
+def build_retail_snapshot(transactions):
+    tx = transactions.rename(columns={'Date': 'date', 'Customer ID': 'customer_id', 'Quantity': 'quantity',
+                                      'Product Category': 'product_category', 'Total Amount': 'total_amount',
+                                      'Total_COGS': 'total_cogs', 'Gross_Profit': 'gross_profit'})
+    for col in ['total_amount', 'quantity', 'total_cogs', 'gross_profit']:
+        tx[col] = tx[col].fillna(0)
+
+    total = len(tx)
+    revenue = tx['total_amount'].sum()
+    cost = tx['total_cogs'].sum()
+
+    categories = tx.groupby('product_category', sort=False)['total_amount'].sum()
+
+    tx['month'] = tx['date'].astype(str).str[:7]
+    monthly = tx.groupby('month').agg(revenue=('total_amount', 'sum'), transactions=('total_amount', 'size'),
+                                      cost=('total_cogs', 'sum'), profit=('gross_profit', 'sum')).reset_index()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        monthly['margin'] = np.where(monthly['revenue'] > 0,
+                                     ((monthly['revenue'] - monthly['cost']) / monthly['revenue'] * 100).round(2), 0)
+    monthly_trend = [{'month': row.month, 'revenue': int(np.floor(row.revenue + 0.5)), 'transactions': int(row.transactions),
+                      'cost': int(np.floor(row.cost + 0.5)), 'profit': int(np.floor(row.profit + 0.5)),
+                      'margin': float(row.margin)} for row in monthly.itertuples()]
+
+    revenue_trend = margin_trend = 0
+    if len(monthly_trend) >= 2:
+        last, prev = monthly_trend[-1], monthly_trend[-2]
+        revenue_trend = (last['revenue'] - prev['revenue']) / prev['revenue'] * 100
+        margin_trend = last['margin'] - prev['margin']
+
+    dates = pd.to_datetime(tx['date'])
+
+    return {
+        'totalRevenue': float(revenue),
+        'avgOrderValue': float(revenue / total) if total else 0,
+        'uniqueCustomers': int(tx['customer_id'].nunique(dropna=False)),
+        'totalProducts': int(tx['quantity'].sum()),
+        'totalCost': float(cost),
+        'totalProfit': float(tx['gross_profit'].sum()),
+        'overallMargin': float((revenue - cost) / revenue * 100) if revenue > 0 else 0,
+        'categoryChartData': [{'name': name, 'value': int(np.floor(value + 0.5))} for name, value in categories.items()],
+        'monthlyTrend': monthly_trend,
+        'transactions': total,
+        'revenueTrend': _trend(revenue_trend),
+        'marginTrend': _trend(margin_trend),
+    }, {'min': dates.min().strftime('%Y-%m-%d'), 'max': dates.max().strftime('%Y-%m-%d')}
+
+
+# dashboard -> (builder, CSV de entrada en orden de argumentos)
+DASHBOARDS = {
+    'airlines': (build_airlines_snapshot, ['processed_airlines_flights.csv', 'processed_airlines_route_kpis.csv']),
+    'fraud': (build_fraud_snapshot, ['processed_fraud_transactions.csv', 'processed_fraud_daily_kpis.csv',
+                                     'processed_fraud_merchant_kpis.csv', 'processed_fraud_country_kpis.csv',
+                                     'processed_fraud_hourly_patterns.csv']),
+    'telco': (build_telco_snapshot, ['processed_telco_customers.csv', 'processed_telco_segment_kpis.csv']),
+    'digital': (build_digital_snapshot, ['digital_performance_data.csv']),
+    'retail': (build_retail_snapshot, ['processed_retail_transactions.csv']),
+}
+
+
+# ============================================================================
+# Bundles + manifest
+# ============================================================================
+
+def _to_builtin(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return str(value)
+
+
+def _finite(value):
+    """NaN/±inf → None en toda la estructura (np.float64 es float y no pasa por default=)"""
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    if isinstance(value, (float, np.floating)) and not np.isfinite(value):
+        return None
+    return value
+
+
+def write_bundle(dashboard, data, date_limit, output_dir):
+    """Escribe <dashboard>.<hash>.json y su .json.gz; devuelve la entrada del manifest"""
+    # Canales sin spend o sin clientes nuevos dan roi/cac/ltv_cac infinitos
+    bundle = {'dashboard': dashboard, 'schemaVersion': SNAPSHOT_SCHEMA_VERSION, 'data': _finite(data)}
+    if date_limit is not None:
+        bundle['dateLimit'] = date_limit
+
+    body = json.dumps(bundle, ensure_ascii=False, separators=(',', ':'), allow_nan=False,
+                      default=_to_builtin).encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()
+    filename = f"{dashboard}.{digest[:16]}.json"
+
+    (output_dir / filename).write_bytes(body)
+    # mtime=0: el .gz es determinista para el mismo contenido
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    (output_dir / f"{filename}.gz").write_bytes(compressed)
+
+    return {
+        'file': filename,
+        'sha256': digest,
+        'bytes': len(body),
+        'gzip_bytes': len(compressed),
+    }
+
+
+def export_snapshots(data_dir='.', output_dir=SNAPSHOT_DIR, dashboards=None, loader=None):
+    """
+    Construye los bundles de los dashboards cuyos CSV existen y actualiza manifest.json.
+    loader(path) -> DataFrame permite reutilizar datasets ya cargados (pipeline_daemon.py)
+    """
+    print("\n" + "="*80)
+    print("📸 GENERANDO SNAPSHOTS DE DASHBOARDS")
+    print("="*80)
+
+    data_dir, output_dir = Path(data_dir), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = output_dir / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {'dashboards': {}}
+    generated_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    for dashboard in dashboards or DASHBOARDS:
+        builder, inputs = DASHBOARDS[dashboard]
+        paths = [data_dir / name for name in inputs]
+        missing = [path.name for path in paths if not path.exists()]
+        if missing:
+            print(f"   ⚠️  {dashboard}: faltan {missing}, se conserva el snapshot anterior")
+            continue
+
+        frames = [loader(path) if loader else pd.read_csv(path, low_memory=False) for path in paths]
+        result = builder(*frames)
+        data, date_limit = result if isinstance(result, tuple) else (result, None)
+
+        entry = write_bundle(dashboard, data, date_limit, output_dir)
+        previous = manifest['dashboards'].get(dashboard, {})
+        entry['generated_at'] = generated_at if previous.get('sha256') != entry['sha256'] \
+            else previous.get('generated_at', generated_at)
+        entry['source_rows'] = int(len(frames[0]))
+        manifest['dashboards'][dashboard] = entry
+
+        # Borrar bundles anteriores del mismo dashboard
+        for stale in output_dir.glob(f"{dashboard}.*.json*"):
+            if not stale.name.startswith(entry['file']):
+                stale.unlink()
+
+        print(f"   ✅ {dashboard}: {entry['file']} ({entry['bytes'] / 1024:.1f} KB, "
+              f"{entry['gzip_bytes'] / 1024:.1f} KB gzip)")
+
+    manifest['schemaVersion'] = SNAPSHOT_SCHEMA_VERSION
+    manifest['generated_at'] = generated_at
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False))
+    print(f"   📄 Manifest: {manifest_path}")
+    return manifest
+
+
+if __name__ == "__main__":
+    # python dashboard_snapshots.py [dashboard ...]
+    export_snapshots(dashboards=sys.argv[1:] or None)
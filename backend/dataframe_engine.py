@@ -0,0 +1,249 @@
+"""
+Motores de DataFrame intercambiables para los procesadores
+Las agregaciones de los procesadores se declaran una sola vez como (columna de salida,
+operación, columna de entrada) y se ejecutan con:
+  - PandasEngine: pandas eager (referencia, comportamiento de siempre)
+  - DuckDBEngine: lazy y multihilo. Escanea la caché Arrow de source_cache con memory
+    mapping (mismos tipos que pandas) sin materializar el dataset; el optimizador aplica
+    proyección y filtros sobre el escaneo y solo se traen a pandas los resultados.
+
+El motor se elige con engine='pandas'|'duckdb' o DATAFRAME_ENGINE. Polars se evaluó pero no
+se agregó como dependencia: DuckDB ya la es (analytics_store.py) y cubre el mismo caso.
+
+    python dataframe_engine.py bench [csv] [filas]   -> compara motores en la compactación de fraude
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from source_cache import arrow_source, read_source
+
+
+DEFAULT_ENGINE = os.getenv('DATAFRAME_ENGINE', 'pandas')
+
+# Agregaciones: (salida, operación, columna[, argumento]) con operación en
+# count | sum | mean | median | nunique | sum_where (argumento = columna booleana) |
+# count_eq (argumento = valor)
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class PandasEngine:
+    name = 'pandas'
+    lazy = False
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+
+    def load(self, path, columns=None, nrows=None):
+        return read_source(path, columns, nrows, cache_dir=self.cache_dir)
+
+    def from_frame(self, df):
+        return df
+
+    def to_pandas(self, source, columns=None):
+        return source if columns is None else source[columns]
+
+    def count(self, source):
+        return len(source)
+
+    def aggregate(self, source, keys, aggs):
+        """
+        GroupBy de pandas con las agregaciones declaradas (claves ordenadas, claves nulas
+        excluidas, como groupby por defecto)
+        """
+        extra = {}
+        named = {}
+        for output, operation, column, *arg in aggs:
+            if operation == 'sum_where':
+                extra[output] = source[column].where(source[arg[0]].astype(bool), 0)
+                named[output] = (output, 'sum')
+            elif operation == 'count_eq':
+                extra[output] = source[column] == arg[0]
+                named[output] = (output, 'sum')
+            else:
+                named[output] = (column, operation)
+        frame = source.assign(**extra) if extra else source
+        return frame.groupby(keys).agg(**named).reset_index()
+
+
+class DuckDBEngine:
+    name = 'duckdb'
+    lazy = True
+
+    def __init__(self, threads=None, memory_limit=None, cache_dir=None):
+        self.cache_dir = cache_dir
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("❌ El motor duckdb requiere duckdb: pip install duckdb pyarrow") from e
+        self.con = duckdb.connect()
+        if threads:
+            self.con.execute(f"SET threads = {int(threads)}")
+        if memory_limit:
+            self.con.execute(f"SET memory_limit = '{memory_limit}'")
+        self._views = 0
+
+    def _register(self, obj):
+        self._views += 1
+        name = f"_src{self._views}"
+        self.con.register(name, obj)
+        return name
+
+    def load(self, path, columns=None, nrows=None):
+        """Vista lazy sobre la caché Arrow (memory-mapped); _row conserva el orden del archivo"""
+        import pyarrow as pa
+
+        table = arrow_source(path, columns, nrows, cache_dir=self.cache_dir)
+        if table is None:
+            table = pa.Table.from_pandas(read_source(path, columns, nrows, cache_dir=self.cache_dir),
+                                         preserve_index=False)
+        table = table.append_column('_row', pa.array(np.arange(table.num_rows, dtype=np.int64)))
+        return self._register(table)
+
+    def from_frame(self, df):
+        return self._register(df.assign(_row=np.arange(len(df), dtype=np.int64)))
+
+    def sql(self, query):
+        return self.con.execute(query).df()
+
+    def view(self, query):
+        """Registra una consulta como vista lazy (no se ejecuta hasta que se usa)"""
+        self._views += 1
+        name = f"_view{self._views}"
+        self.con.execute(f"CREATE OR REPLACE TEMP VIEW {name} AS {query}")
+        return name
+
+    def to_pandas(self, source, columns=None, where=None):
+        select = ', '.join(_quote(col) for col in columns) if columns else '* EXCLUDE (_row)'
+        condition = f" WHERE {where}" if where else ''
+        return self.sql(f"SELECT {select} FROM {source}{condition} ORDER BY _row")
+
+    def count(self, source):
+        return self.con.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+
+    def _types(self, source):
+        relation = self.con.table(source)
+        return {name: str(dtype) for name, dtype in zip(relation.columns, relation.types)}
+
+    def aggregate(self, source, keys, aggs):
+        """GROUP BY con la misma semántica que PandasEngine.aggregate"""
+        types = self._types(source)
+        integer = ('BOOLEAN', 'TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT')
+
+        def numeric(column):
+            # Los booleanos se suman/promedian como 0/1, igual que en pandas
+            return f"CAST({_quote(column)} AS BIGINT)" if types[column] == 'BOOLEAN' else _quote(column)
+
+        selects = []
+        for output, operation, column, *arg in aggs:
+            if operation == 'count':
+                expr = f"COUNT({_quote(column)})"
+            elif operation == 'sum':
+                expr = f"SUM({numeric(column)})"
+                if types[column] in integer:
+                    expr = f"CAST({expr} AS BIGINT)"
+            elif operation == 'mean':
+                expr = f"AVG({numeric(column)})"
+            elif operation == 'median':
+                expr = f"MEDIAN({numeric(column)})"
+            elif operation == 'nunique':
+                expr = f"COUNT(DISTINCT {_quote(column)})"
+            elif operation == 'sum_where':
+                expr = f"COALESCE(SUM({numeric(column)}) FILTER (WHERE {_quote(arg[0])}), 0)"
+                if types[column] in integer:
+                    expr = f"CAST({expr} AS BIGINT)"
+            elif operation == 'count_eq':
+                value = "'" + str(arg[0]).replace("'", "''") + "'" if isinstance(arg[0], str) else arg[0]
+                expr = f"CAST(COUNT(*) FILTER (WHERE {_quote(column)} = {value}) AS BIGINT)"
+            else:
+                raise ValueError(f"Operación desconocida: {operation}")
+            selects.append(f"{expr} AS {_quote(output)}")
+
+        key_list = ', '.join(_quote(key) for key in keys)
+        not_null = ' AND '.join(f"{_quote(key)} IS NOT NULL" for key in keys)
+        result = self.sql(f"SELECT {key_list}, {', '.join(selects)} FROM {source} "
+                          f"WHERE {not_null} GROUP BY {key_list}")
+        # Orden de claves de pandas (groupby sort=True)
+        return result.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def get_engine(engine=None, **kwargs):
+    """Instancia del motor ('pandas', 'duckdb' o un motor ya creado); por defecto DATAFRAME_ENGINE"""
+    if engine is None:
+        engine = DEFAULT_ENGINE
+    if not isinstance(engine, str):
+        return engine
+    if engine == 'pandas':
+        return PandasEngine(**kwargs)
+    if engine == 'duckdb':
+        return DuckDBEngine(**kwargs)
+    raise ValueError(f"Motor desconocido: {engine} (pandas | duckdb)")
+
+
+def compare_outputs(reference, candidate, atol=0.011):
+    """Diferencias entre dos resultados por tabla: [] si coinciden"""
+    differences = []
+    for name, expected in reference.items():
+        if not isinstance(expected, pd.DataFrame):
+            continue
+        actual = candidate[name]
+        if list(expected.columns) != list(actual.columns) or len(expected) != len(actual):
+            differences.append(f"{name}: forma {expected.shape} vs {actual.shape}")
+            continue
+        for col in expected.columns:
+            left = expected[col].reset_index(drop=True)
+            right = actual[col].reset_index(drop=True)
+            if pd.api.types.is_numeric_dtype(left) and pd.api.types.is_numeric_dtype(right):
+                bad = ~np.isclose(left.astype(float), right.astype(float), atol=atol, equal_nan=True)
+            else:
+                bad = left.astype(str).to_numpy() != right.astype(str).to_numpy()
+            if bad.any():
+                differences.append(f"{name}.{col}: {int(bad.sum())} filas distintas")
+    return differences
+
+
+def benchmark(csv_path='synthetic_fraud_data.csv', rows=None):
+    """Compactación de fraude con ambos motores: tiempos y verificación de paridad"""
+    import tempfile
+    from compact_fraud_data import FraudDataCompactor
+    from source_cache import CACHE_DIR
+
+    print(f"📊 Benchmark de motores: {csv_path} ({'todas las' if rows is None else f'{rows:,}'} filas)")
+    cache_dir = os.path.abspath(CACHE_DIR)
+    arrow_source(csv_path, cache_dir=cache_dir)  # caché Arrow caliente para ambos motores
+
+    results, timings = {}, {}
+    for name in ['pandas', 'duckdb']:
+        with tempfile.TemporaryDirectory() as workdir:
+            compactor = FraudDataCompactor(csv_path=os.path.abspath(csv_path),
+                                           engine=get_engine(name, cache_dir=cache_dir),
+                                           id_map_dir=os.path.join(workdir, 'id_maps'))
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            start = time.perf_counter()
+            try:
+                results[name] = compactor.run_compaction(sample_for_testing=rows)
+            finally:
+                os.chdir(cwd)
+            timings[name] = time.perf_counter() - start
+
+    differences = compare_outputs(results['pandas'], results['duckdb'])
+    print("\n" + "="*80)
+    print(f"   pandas: {timings['pandas']:.1f}s | duckdb: {timings['duckdb']:.1f}s "
+          f"(x{timings['pandas'] / timings['duckdb']:.1f})")
+    print(f"   Paridad: {'✅ resultados idénticos' if not differences else differences}")
+    return timings, differences
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark(sys.argv[2] if len(sys.argv) > 2 else 'synthetic_fraud_data.csv',
+                  int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    else:
+        print("Uso: python dataframe_engine.py bench [csv] [filas]")
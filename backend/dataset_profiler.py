@@ -0,0 +1,343 @@
+"""
+Profiler de datasets en streaming: un solo pase por chunks sobre cada CSV
+Nulos, min/max/momentos, cardinalidad HyperLogLog, top-k, duplicados por hash,
+cuantiles por muestreo y tablas de contingencia contra una variable objetivo
+"""
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from heavy_hitters import SpaceSaving
+from partitioned_store import is_partitioned, iter_partitions
+from source_cache import iter_source_chunks
+
+
+class HyperLogLog:
+    """Estimador de cardinalidad con 2^p registros (error típico ~1.04/sqrt(2^p))"""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = (hashes << np.uint64(self.p)) | np.uint64((1 << self.p) - 1)
+        # rho = posición del primer bit 1 (ceros a la izquierda + 1)
+        rho = (64 - np.floor(np.log2(rest.astype(np.float64))).astype(np.int64)).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros > 0:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+
+class Moments:
+    """Conteo, media, M2, min y max fusionables entre chunks (Chan et al.)"""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        n_b = len(values)
+        if n_b == 0:
+            return
+        mean_b = values.mean()
+        m2_b = ((values - mean_b) ** 2).sum()
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * self.n * n_b / n
+        self.n = n
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    def to_dict(self):
+        if self.n == 0:
+            return {'count': 0}
+        std = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+        return {'count': self.n, 'mean': self.mean, 'std': std, 'min': self.min, 'max': self.max}
+
+
+class StreamingProfiler:
+    def __init__(self, csv_path, name=None, chunksize=500_000, target=None, crosstab_cols=(),
+                 target_numeric_cols=(), top_k=10, sample_size=100_000, random_state=42,
+                 partition_filters=None):
+        self.csv_path = str(csv_path)
+        # Si csv_path es un dataset particionado, solo se leen las particiones que cumplen el filtro
+        self.partition_filters = partition_filters
+        self.name = name or Path(csv_path).stem
+        self.chunksize = chunksize
+        self.target = target
+        self.crosstab_cols = list(crosstab_cols)
+        self.target_numeric_cols = list(target_numeric_cols)
+        self.top_k = top_k
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(random_state)
+
+    def _init_state(self, chunk):
+        self.columns = list(chunk.columns)
+        self.dtypes = {col: str(chunk[col].dtype) for col in self.columns}
+        self.head = json.loads(chunk.head().to_json(orient='records', date_format='iso'))
+        self.rows = 0
+        self.nulls = dict.fromkeys(self.columns, 0)
+        self.hll = {col: HyperLogLog() for col in self.columns}
+        self.top_values = {col: SpaceSaving(capacity=max(100, self.top_k * 20)) for col in self.columns}
+        self.moments = {}
+        self.sample = {}
+        self.sample_keys = np.empty(0)
+        self.row_hashes = np.empty(0, dtype=np.uint64)
+        self.duplicates = 0
+        self.crosstabs = dict.fromkeys(self.crosstab_cols)
+        self.target_groups = {col: pd.DataFrame() for col in self.target_numeric_cols}
+
+    def _numeric_cols(self, chunk):
+        return [col for col in self.columns
+                if pd.api.types.is_numeric_dtype(chunk[col]) and not pd.api.types.is_bool_dtype(chunk[col])]
+
+    def _update(self, chunk):
+        self.rows += len(chunk)
+        numeric_cols = self._numeric_cols(chunk)
+
+        for col in self.columns:
+            series = chunk[col]
+            not_null = series.notna()
+            self.nulls[col] += int(len(series) - not_null.sum())
+            present = series[not_null]
+            self.hll[col].add_hashes(pd.util.hash_pandas_object(present, index=False).to_numpy())
+            self.top_values[col].update(present.astype(str).to_numpy())
+
+            if col in numeric_cols:
+                self.moments.setdefault(col, Moments()).update(series.to_numpy(dtype=np.float64))
+            elif str(series.dtype) != self.dtypes[col]:
+                self.dtypes[col] = str(series.dtype)
+
+        self._update_sample(chunk, numeric_cols)
+        self._update_duplicates(chunk)
+
+        if self.target:
+            for col in self.crosstab_cols:
+                counts = chunk.groupby([col, self.target], dropna=False).size()
+                previous = self.crosstabs[col]
+                self.crosstabs[col] = counts if previous is None else previous.add(counts, fill_value=0)
+            for col in self.target_numeric_cols:
+                grouped = chunk.groupby(self.target)[col].agg(['count', 'sum', 'min', 'max'])
+                grouped['sumsq'] = (chunk[col] ** 2).groupby(chunk[self.target]).sum()
+                self.target_groups[col] = self._merge_group_stats(self.target_groups[col], grouped)
+
+    @staticmethod
+    def _merge_group_stats(acc, new):
+        if acc.empty:
+            return new
+        index = acc.index.union(new.index)
+        acc, new = acc.reindex(index), new.reindex(index)
+        merged = acc[['count', 'sum', 'sumsq']].fillna(0) + new[['count', 'sum', 'sumsq']].fillna(0)
+        merged['min'] = np.fmin(acc['min'], new['min'])
+        merged['max'] = np.fmax(acc['max'], new['max'])
+        return merged
+
+    def _update_sample(self, chunk, numeric_cols):
+        """Bottom-k sampling: muestra uniforme sin reemplazo de tamaño fijo en un pase"""
+        keys = self.rng.random(len(chunk))
+        # sample_keys queda ordenado tras cada actualización: el último es el umbral
+        threshold = self.sample_keys[-1] if len(self.sample_keys) >= self.sample_size else 1.0
+        candidates = keys < threshold
+
+        all_keys = np.concatenate([self.sample_keys, keys[candidates]])
+        keep = np.argsort(all_keys)[:self.sample_size]
+        previous_size = len(self.sample_keys)
+        self.sample_keys = all_keys[keep]
+        for col in set(self.sample) | set(numeric_cols):
+            values = pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float64)[candidates]
+            previous = self.sample.get(col, np.full(previous_size, np.nan))
+            self.sample[col] = np.concatenate([previous, values])[keep]
+
+    def _update_duplicates(self, chunk):
+        """Duplicados exactos vía hash de fila (64 bits) contra el set ordenado acumulado"""
+        hashes = np.sort(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+        is_new = np.concatenate([[True], hashes[1:] != hashes[:-1]])
+        unique = hashes[is_new]
+        self.duplicates += int(len(hashes) - len(unique))
+
+        if len(self.row_hashes):
+            pos = np.searchsorted(self.row_hashes, unique)
+            seen = (pos < len(self.row_hashes)) & (self.row_hashes[np.minimum(pos, len(self.row_hashes) - 1)] == unique)
+            self.duplicates += int(seen.sum())
+            unique = unique[~seen]
+        # mergesort detecta las dos corridas ya ordenadas: fusión lineal
+        self.row_hashes = np.sort(np.concatenate([self.row_hashes, unique]), kind='mergesort')
+
+    def _report(self, elapsed):
+        columns = {}
+        for col in self.columns:
+            info = {
+                'dtype': self.dtypes[col],
+                'nulls': self.nulls[col],
+                'null_pct': round(self.nulls[col] / max(self.rows, 1) * 100, 2),
+                'approx_unique': self.hll[col].count(),
+            }
+            top = self.top_values[col].top_k(self.top_k)
+            info['top_values'] = {key: int(value) for key, value in zip(top['key'], top['value'])}
+            if col in self.moments:
+                info.update(self.moments[col].to_dict())
+                sample = self.sample.get(col)
+                if sample is not None and np.isfinite(sample).any():
+                    q25, q50, q75 = np.nanpercentile(sample, [25, 50, 75])
+                    info.update({'p25': q25, 'p50': q50, 'p75': q75})
+            columns[col] = info
+
+        report = {
+            'dataset': self.name,
+            'file': self.csv_path,
+            'rows': self.rows,
+            'columns': len(self.columns),
+            'duplicate_rows': self.duplicates,
+            'total_nulls': int(sum(self.nulls.values())),
+            'sample_size': int(len(self.sample_keys)),
+            'elapsed_seconds': round(elapsed, 2),
+            'head': self.head,
+            'column_profiles': columns
+        }
+
+        if self.target:
+            report['target'] = self.target
+            report['contingency'] = {}
+            for col, counts in self.crosstabs.items():
+                table = counts.unstack(fill_value=0)
+                positive_label = next((label for label in (True, 1, 'True', 'true') if label in table.columns), None)
+                positive = table[positive_label] if positive_label is not None else pd.Series(0, index=table.index)
+                total = table.sum(axis=1)
+                report['contingency'][col] = {
+                    str(value): {'total': int(total[value]), 'positive': int(positive[value]),
+                                 'rate_pct': round(float(positive[value] / total[value] * 100), 2)}
+                    for value in table.index
+                }
+            report['numeric_by_target'] = {}
+            for col, stats in self.target_groups.items():
+                mean = stats['sum'] / stats['count']
+                var = (stats['sumsq'] - stats['count'] * mean ** 2) / (stats['count'] - 1)
+                report['numeric_by_target'][col] = {
+                    str(value): {'count': int(stats.loc[value, 'count']), 'mean': mean[value],
+                                 'std': float(np.sqrt(max(var[value], 0))), 'min': stats.loc[value, 'min'],
+                                 'max': stats.loc[value, 'max']}
+                    for value in stats.index
+                }
+
+        return report
+
+    def _chunks(self):
+        if is_partitioned(self.csv_path):
+            for _, chunk in iter_partitions(self.csv_path, self.partition_filters, chunksize=self.chunksize):
+                yield chunk
+        else:
+            yield from iter_source_chunks(self.csv_path, self.chunksize, low_memory=False)
+
+    def run(self):
+        """Perfila el archivo (o las particiones seleccionadas) en un solo pase"""
+        start = time.perf_counter()
+        for i, chunk in enumerate(self._chunks()):
+            if i == 0:
+                self._init_state(chunk)
+            self._update(chunk)
+        return self._report(time.perf_counter() - start)
+
+
+def _profile_worker(kwargs):
+    return StreamingProfiler(**kwargs).run()
+
+
+def profile_datasets(specs, output_path='dataset_profile.json', workers=None):
+    """Perfila varios datasets en procesos paralelos y escribe un reporte JSON"""
+    specs = [spec for spec in specs if Path(spec['csv_path']).exists()]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        reports = list(executor.map(_profile_worker, specs))
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({'datasets': reports}, f, indent=2, ensure_ascii=False, default=_to_builtin)
+
+    print(f"✅ Reporte de perfilado: {output_path} ({len(reports)} datasets)")
+    return reports
+
+
+def print_profile(report):
+    """Imprime un perfil en el mismo formato que analyze_dataset"""
+    print(f"\n{'='*80}")
+    print(f"ANÁLISIS DE: {report['dataset']}")
+    print(f"{'='*80}\n")
+
+    print(f"📊 DIMENSIONES:")
+    print(f"   - Filas: {report['rows']:,}")
+    print(f"   - Columnas: {report['columns']}")
+
+    print(f"\n📋 COLUMNAS ({report['columns']}):")
+    for i, (col, info) in enumerate(report['column_profiles'].items(), 1):
+        print(f"   {i}. {col} ({info['dtype']}) - Nulos: {info['nulls']} ({info['null_pct']:.1f}%) "
+              f"| Únicos (aprox): {info['approx_unique']:,}")
+
+    print(f"\n🔍 PRIMERAS 5 FILAS:")
+    print(pd.DataFrame(report['head']))
+
+    print(f"\n📈 ESTADÍSTICAS DESCRIPTIVAS:")
+    stats = {col: {k: info[k] for k in ['count', 'mean', 'std', 'min', 'p25', 'p50', 'p75', 'max'] if k in info}
+             for col, info in report['column_profiles'].items() if 'mean' in info}
+    print(pd.DataFrame(stats))
+
+    print(f"\n🏷️  VALORES MÁS FRECUENTES:")
+    for col, info in report['column_profiles'].items():
+        if 'mean' not in info:
+            top = dict(list(info['top_values'].items())[:5])
+            print(f"   - {col}: ~{info['approx_unique']:,} valores únicos")
+            print(f"     {top}")
+
+    print(f"\n⚠️  CALIDAD DE DATOS:")
+    print(f"   - Total de valores nulos: {report['total_nulls']:,}")
+    print(f"   - Filas duplicadas: {report['duplicate_rows']:,}")
+    print(f"   - Tiempo de perfilado: {report['elapsed_seconds']:.2f}s")
+
+
+def _to_builtin(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return str(value)
+
+
+DATASETS = [
+    {'csv_path': 'retail_sales_dataset.csv', 'name': 'RETAIL SALES'},
+    {'csv_path': 'airlines_flights_data.csv', 'name': 'AIRLINES FLIGHTS'},
+    {'csv_path': 'WA_Fn-UseC_-Telco-Customer-Churn.csv', 'name': 'TELCO CUSTOMER CHURN'},
+    {'csv_path': 'digital_performance_data.csv', 'name': 'DIGITAL PERFORMANCE'},
+    {'csv_path': 'synthetic_fraud_data.csv', 'name': 'SYNTHETIC FRAUD DATA', 'target': 'is_fraud',
+     'crosstab_cols': ['card_present', 'high_risk_merchant', 'distance_from_home', 'channel', 'card_type'],
+     'target_numeric_cols': ['amount']},
+]
+
+
+if __name__ == "__main__":
+    # python dataset_profiler.py [output.json]
+    output = sys.argv[1] if len(sys.argv) > 1 else 'dataset_profile.json'
+    for report in profile_datasets(DATASETS, output_path=output):
+        print_profile(report)
@@ -0,0 +1,120 @@
+"""
+Curvas de tarifa precio vs days_left por ruta y clase
+Mínimos cuadrados de todos los grupos a la vez: ecuaciones normales acumuladas con
+bincount y un solo np.linalg.solve apilado (costo lineal en filas, no filas x grupos)
+"""
+import sys
+import time
+import numpy as np
+
+
+def design_matrix(days_left, degree=2):
+    """Base polinomial en log(days_left): [1, log d, log² d, ...]"""
+    x = np.log(np.asarray(days_left, dtype=np.float64))
+    return np.vander(x, degree + 1, increasing=True)
+
+
+def fit_grouped_least_squares(group, X, y, n_groups=None, ridge=1e-10):
+    """
+    Ajusta y ~ X·b por grupo. Devuelve (coeficientes, n, r2, rmse) con un array por grupo.
+
+    Para cada grupo se acumulan XᵀX, Xᵀy, Σy y Σy² con bincount (un pase por término),
+    y se resuelven los G sistemas p×p con un solve apilado.
+    """
+    if n_groups is None:
+        n_groups = int(group.max()) + 1
+    p = X.shape[1]
+
+    xtx = np.empty((n_groups, p, p))
+    for i in range(p):
+        for j in range(i, p):
+            acc = np.bincount(group, weights=X[:, i] * X[:, j], minlength=n_groups)
+            xtx[:, i, j] = acc
+            xtx[:, j, i] = acc
+
+    xty = np.stack([np.bincount(group, weights=X[:, i] * y, minlength=n_groups) for i in range(p)], axis=1)
+    n = np.bincount(group, minlength=n_groups)
+    sum_y = np.bincount(group, weights=y, minlength=n_groups)
+    sum_y2 = np.bincount(group, weights=y * y, minlength=n_groups)
+
+    # Solo se resuelven los grupos con al menos p filas válidas: uno sin filas tiene XᵀX nulo
+    # (y ridge nulo, porque escala con la traza) y haría fallar el solve de todo el lote.
+    # Regularización mínima para grupos con pocos valores distintos de days_left
+    coef = np.full((n_groups, p), np.nan)
+    fit = n >= p
+    if fit.any():
+        scale = np.trace(xtx[fit], axis1=1, axis2=2)[:, None, None]
+        coef[fit] = np.linalg.solve(xtx[fit] + ridge * scale * np.eye(p), xty[fit][:, :, None])[:, :, 0]
+
+    # SSE = Σy² - 2 bᵀXᵀy + bᵀXᵀX b
+    sse = sum_y2 - 2 * np.einsum('gi,gi->g', coef, xty) + np.einsum('gi,gij,gj->g', coef, xtx, coef)
+    sst = sum_y2 - sum_y ** 2 / np.maximum(n, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(sst > 0, 1 - sse / sst, np.nan)
+        rmse = np.sqrt(np.maximum(sse, 0) / np.maximum(n, 1))
+
+    return coef, n, r2, rmse
+
+
+def fit_fare_curves(df, group_cols=('route', 'class'), degree=2, grid=None):
+    """Devuelve (parámetros por grupo, valores ajustados sobre la grilla de days_left)"""
+    group_cols = list(group_cols)
+    grouper = df.groupby(group_cols, observed=True, sort=True)
+    keys = grouper.size().reset_index()[group_cols]
+    group = grouper.ngroup().to_numpy()
+
+    days_left = df['days_left'].to_numpy(dtype=np.float64)
+    price = df['price'].to_numpy(dtype=np.float64)
+    valid = (group >= 0) & (days_left > 0) & np.isfinite(price)
+
+    X = design_matrix(days_left[valid], degree)
+    coef, n, r2, rmse = fit_grouped_least_squares(group[valid], X, price[valid], n_groups=len(keys))
+
+    params = keys.copy()
+    for i in range(degree + 1):
+        params[f'b{i}'] = coef[:, i].round(4)
+    params['observations'] = n
+    params['r2'] = np.round(r2, 4)
+    params['rmse'] = np.round(rmse, 2)
+
+    if grid is None:
+        grid = np.arange(int(days_left[valid].min()), int(days_left[valid].max()) + 1)
+    fitted = coef @ design_matrix(grid, degree).T
+
+    curves = keys.loc[np.repeat(np.arange(len(keys)), len(grid))].reset_index(drop=True)
+    curves['days_left'] = np.tile(grid, len(keys))
+    curves['fitted_price'] = fitted.ravel().round(2)
+
+    ok = n > degree
+    return params[ok].reset_index(drop=True), curves[np.repeat(ok, len(grid))].reset_index(drop=True)
+
+
+def benchmark(row_sizes=(100_000, 1_000_000, 4_000_000), group_sizes=(10, 1_000, 100_000), degree=2):
+    """Tiempo del ajuste batch: debe crecer con las filas y no con el número de grupos"""
+    rng = np.random.default_rng(42)
+
+    def run(rows, groups):
+        group = rng.integers(0, groups, rows)
+        days_left = rng.integers(1, 50, rows)
+        price = 5000 + 20000 / days_left + rng.normal(0, 500, rows)
+        X = design_matrix(days_left, degree)
+        start = time.perf_counter()
+        fit_grouped_least_squares(group, X, price, n_groups=groups)
+        return time.perf_counter() - start
+
+    print("\n⏱️  Benchmark de ajuste batch (mínimos cuadrados por grupo):")
+    print("\n   Filas variables (1,000 grupos):")
+    for rows in row_sizes:
+        elapsed = run(rows, 1_000)
+        print(f"   {rows:>12,} filas: {elapsed:.3f}s ({elapsed / rows * 1e9:.1f} ns/fila)")
+
+    print(f"\n   Grupos variables ({row_sizes[-1]:,} filas):")
+    for groups in group_sizes:
+        elapsed = run(row_sizes[-1], groups)
+        print(f"   {groups:>12,} grupos: {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    # python fare_curves.py bench
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark()
@@ -0,0 +1,435 @@
+"""
+Motor declarativo de reglas de fraude, evaluado en una sola pasada por chunks
+Las reglas se escriben en YAML o JSON con condiciones en sintaxis de Python:
+
+    rules:
+      - name: monto_alto_sin_tarjeta
+        when: amount > 1000 and high_risk_merchant and not card_present
+      - name: rafaga_velocidad
+        when: velocity_num_trans >= 300 or velocity_unique_countries >= 4
+
+Compilación: cada condición se parsea con ast (solo comparaciones, and/or/not, aritmética,
+`in [...]` y abs(); cualquier otra cosa es un error) y se descompone en átomos (comparaciones
+hoja). Los átomos repetidos entre reglas se evalúan una sola vez por chunk, y cada regla se
+reduce a una combinación booleana de átomos. Con numexpr instalado, los átomos numéricos y las
+combinaciones se evalúan con numexpr (sin temporales intermedios); si no, con NumPy/pandas.
+
+Solo se leen las columnas referenciadas. Sirve sobre el crudo (synthetic_fraud_data.csv,
+velocity_last_hour se expande a velocity_*) o sobre processed_fraud_transactions.csv; en el
+compacto las legítimas son una muestra, así que hit rate y precision se reponderan con el total
+real de legítimas de processed_fraud_daily_kpis.csv (recall no cambia: están todos los fraudes).
+
+    python fraud_rules.py evaluate [reglas.yaml] [csv] [--chunksize 500000]
+    python fraud_rules.py bench [csv] [n_reglas]   -> una pasada vs pandas.eval regla por regla
+"""
+import ast
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from compact_fraud_data import VELOCITY_FIELDS
+from source_cache import _pyarrow, iter_source_chunks
+
+
+DEFAULT_RULES = 'fraud_rules.yaml'
+REPORT_CSV = 'fraud_rules_report.csv'
+DAILY_KPIS_CSV = 'processed_fraud_daily_kpis.csv'
+BOOL_COLUMNS = ['card_present', 'distance_from_home', 'high_risk_merchant', 'is_fraud', 'is_weekend']
+# Nombres del compacto -> columna del crudo
+RAW_ALIASES = {'hour': 'transaction_hour', 'is_weekend': 'weekend_transaction'}
+
+_COMPARE = {ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>='}
+_ARITHMETIC = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Mod: '%'}
+
+
+def _numexpr():
+    try:
+        import numexpr
+        return numexpr
+    except ImportError:
+        return None
+
+
+def load_rules(path=DEFAULT_RULES):
+    """Lista de reglas {name, when[, description]} desde YAML o JSON"""
+    path = Path(path)
+    text = path.read_text(encoding='utf-8')
+    if path.suffix in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("❌ Las reglas en YAML requieren pyyaml: pip install pyyaml (o usar JSON)") from e
+        spec = yaml.safe_load(text)
+    else:
+        spec = json.loads(text)
+    return spec['rules'] if isinstance(spec, dict) else spec
+
+
+# ----------------------------------------------------------------------
+# Compilación
+# ----------------------------------------------------------------------
+
+class RuleSet:
+    def __init__(self, rules):
+        names = [rule['name'] for rule in rules]
+        duplicated = sorted({name for name in names if names.count(name) > 1})
+        if duplicated:
+            raise ValueError(f"Reglas con nombre repetido: {duplicated}")
+        self.rules = rules
+        self.atoms = {}      # texto canónico -> nodo ast del átomo
+        self._atom_index = {}
+        self.columns = set()
+        self.trees = [self._compile(rule['name'], rule['when']) for rule in rules]
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES):
+        return cls(load_rules(path))
+
+    def _compile(self, name, text):
+        try:
+            tree = ast.parse(str(text), mode='eval').body
+        except SyntaxError as e:
+            raise ValueError(f"Regla {name}: sintaxis inválida ({e.msg})") from e
+        try:
+            return self._boolean(tree)
+        except ValueError as e:
+            raise ValueError(f"Regla {name}: {e}") from e
+
+    def _boolean(self, node):
+        """Árbol booleano: ('and'|'or', [hijos]) | ('not', hijo) | ('atom', índice)"""
+        if isinstance(node, ast.BoolOp):
+            return ('and' if isinstance(node.op, ast.And) else 'or', [self._boolean(value) for value in node.values])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ('not', self._boolean(node.operand))
+        if isinstance(node, ast.Compare) and len(node.ops) > 1:
+            # a < b < c -> (a < b) and (b < c)
+            operands = [node.left] + node.comparators
+            return ('and', [self._boolean(ast.Compare(left=operands[i], ops=[op], comparators=[operands[i + 1]]))
+                            for i, op in enumerate(node.ops)])
+        if isinstance(node, ast.Compare):
+            self._check_compare(node)
+        elif isinstance(node, ast.Name):
+            self.columns.add(node.id)
+        else:
+            raise ValueError(f"expresión no soportada: {ast.unparse(node)}")
+        key = ast.unparse(node)
+        if key not in self._atom_index:
+            self._atom_index[key] = len(self.atoms)
+            self.atoms[key] = node
+        return ('atom', self._atom_index[key])
+
+    def _check_compare(self, node):
+        op = node.ops[0]
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if not isinstance(node.comparators[0], (ast.List, ast.Tuple, ast.Set)) or \
+                    not all(isinstance(item, ast.Constant) for item in node.comparators[0].elts):
+                raise ValueError(f"`in` requiere una lista de constantes: {ast.unparse(node)}")
+            self._check_value(node.left)
+        elif type(op) in _COMPARE:
+            self._check_value(node.left)
+            self._check_value(node.comparators[0])
+        else:
+            raise ValueError(f"operador no soportado: {ast.unparse(node)}")
+
+    def _check_value(self, node):
+        if isinstance(node, ast.Name):
+            self.columns.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+            pass
+        elif isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            self._check_value(node.left)
+            self._check_value(node.right)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            self._check_value(node.operand)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'abs' \
+                and len(node.args) == 1 and not node.keywords:
+            self._check_value(node.args[0])
+        else:
+            raise ValueError(f"valor no soportado: {ast.unparse(node)}")
+
+    # ------------------------------------------------------------------
+    # Evaluación
+    # ------------------------------------------------------------------
+
+    def _value(self, node, frame):
+        if isinstance(node, ast.Name):
+            return frame[node.id]
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.BinOp):
+            left, right = self._value(node.left, frame), self._value(node.right, frame)
+            return {'+': np.add, '-': np.subtract, '*': np.multiply, '/': np.true_divide,
+                    '%': np.mod}[_ARITHMETIC[type(node.op)]](left, right)
+        if isinstance(node, ast.UnaryOp):
+            return -self._value(node.operand, frame)
+        return np.abs(self._value(node.args[0], frame))
+
+    def _numeric_atom(self, node, frame):
+        """True si el átomo solo usa columnas numéricas y constantes numéricas (apto para numexpr)"""
+        for child in ast.walk(node):
+            if isinstance(child, (ast.In, ast.NotIn)):
+                return False
+            if isinstance(child, ast.Constant) and isinstance(child.value, str):
+                return False
+            if isinstance(child, ast.Name) and child.id in frame and (
+                    pd.api.types.is_bool_dtype(frame[child.id]) or not pd.api.types.is_numeric_dtype(frame[child.id])):
+                return False
+        return True
+
+    def _atom(self, node, frame, numexpr=None):
+        if isinstance(node, ast.Name):
+            return frame[node.id].to_numpy(dtype=bool)
+        if numexpr is not None and self._numeric_atom(node, frame):
+            names = {child.id for child in ast.walk(node) if isinstance(child, ast.Name) and child.id in frame}
+            return numexpr.evaluate(ast.unparse(node), local_dict={name: frame[name].to_numpy() for name in names})
+        op = node.ops[0]
+        left = self._value(node.left, frame)
+        if isinstance(op, (ast.In, ast.NotIn)):
+            values = [item.value for item in node.comparators[0].elts]
+            hits = pd.Series(left).isin(values).to_numpy(dtype=bool)
+            return ~hits if isinstance(op, ast.NotIn) else hits
+        right = self._value(node.comparators[0], frame)
+        result = {'==': np.equal, '!=': np.not_equal, '<': np.less, '<=': np.less_equal, '>': np.greater,
+                  '>=': np.greater_equal}[_COMPARE[type(op)]](left, right)
+        return np.asarray(result, dtype=bool)
+
+    @staticmethod
+    def _expression(tree):
+        """Árbol booleano como expresión de numexpr sobre los átomos a0, a1, ..."""
+        kind, value = tree
+        if kind == 'atom':
+            return f"a{value}"
+        if kind == 'not':
+            return f"~({RuleSet._expression(value)})"
+        joiner = ' & ' if kind == 'and' else ' | '
+        return '(' + joiner.join(RuleSet._expression(child) for child in value) + ')'
+
+    @staticmethod
+    def _combine(tree, atoms):
+        kind, value = tree
+        if kind == 'atom':
+            return atoms[value]
+        if kind == 'not':
+            return ~RuleSet._combine(value, atoms)
+        reduce = np.logical_and if kind == 'and' else np.logical_or
+        return reduce.reduce([RuleSet._combine(child, atoms) for child in value])
+
+    def evaluate(self, frame):
+        """Matriz booleana (filas x reglas) para un chunk ya normalizado"""
+        missing = self.columns - set(frame.columns)
+        if missing:
+            raise ValueError(f"Columnas desconocidas en las reglas: {sorted(missing)}")
+        numexpr = _numexpr()
+        atoms = [self._atom(node, frame, numexpr) for node in self.atoms.values()]
+        hits = np.empty((len(frame), len(self.trees)), dtype=bool, order='F')
+        for i, tree in enumerate(self.trees):
+            if numexpr is not None and tree[0] != 'atom':
+                names = {f"a{index}" for index in _atom_indexes(tree)}
+                hits[:, i] = numexpr.evaluate(self._expression(tree),
+                                              local_dict={name: atoms[int(name[1:])] for name in names})
+            else:
+                hits[:, i] = self._combine(tree, atoms)
+        return hits
+
+
+def _atom_indexes(tree):
+    kind, value = tree
+    if kind == 'atom':
+        return [value]
+    if kind == 'not':
+        return _atom_indexes(value)
+    return [index for child in value for index in _atom_indexes(child)]
+
+
+# ----------------------------------------------------------------------
+# Lectura y normalización
+# ----------------------------------------------------------------------
+
+def _source_columns(csv_path, needed):
+    """Columnas a leer de la fuente y si es el crudo (velocity_last_hour sin expandir)"""
+    header = set(pd.read_csv(csv_path, nrows=0).columns)
+    raw = 'velocity_last_hour' in header
+    columns = set()
+    for column in set(needed) | {'is_fraud'}:
+        if raw and column in VELOCITY_FIELDS:
+            columns.add('velocity_last_hour')
+        elif raw and column in RAW_ALIASES:
+            columns.add(RAW_ALIASES[column])
+        elif column in header:
+            columns.add(column)
+        else:
+            raise ValueError(f"Columna desconocida en las reglas: {column} (no está en {Path(csv_path).name})")
+    return sorted(columns), raw
+
+
+def _velocity_field(velocity, field):
+    """Un campo numérico de velocity_last_hour (0 si falta); con pyarrow el regex corre en C++"""
+    pattern = f"'{field}': (?P<value>[^,}}]+)"
+    pa = _pyarrow()
+    if pa is not None:
+        import pyarrow.compute as pc
+        values = pc.extract_regex(pa.array(velocity, type=pa.string(), from_pandas=True), pattern).field('value')
+        try:
+            return pd.Series(pc.cast(values, pa.float64()).to_numpy(zero_copy_only=False), index=velocity.index).fillna(0)
+        except pa.ArrowInvalid:
+            return pd.to_numeric(pd.Series(values.to_numpy(zero_copy_only=False), index=velocity.index),
+                                 errors='coerce').fillna(0)
+    return pd.to_numeric(velocity.astype(str).str.extract(pattern, expand=False), errors='coerce').fillna(0)
+
+
+def _as_bool(values):
+    """True/False, 'True'/'False' o 0/1 -> bool"""
+    if pd.api.types.is_bool_dtype(values):
+        return values
+    if pd.api.types.is_numeric_dtype(values):
+        return values.fillna(0) != 0
+    return values.astype(str).str.lower().isin(['true', '1', '1.0'])
+
+
+def normalize_chunk(chunk, needed, raw):
+    """Nombres del compacto, velocity_* numéricas y columnas booleanas como bool"""
+    frame = chunk.rename(columns={source: name for name, source in RAW_ALIASES.items()}) if raw else chunk
+    if raw and 'velocity_last_hour' in frame:
+        for column in set(needed) & set(VELOCITY_FIELDS):
+            frame[column] = _velocity_field(frame['velocity_last_hour'], VELOCITY_FIELDS[column][0])
+    for column in BOOL_COLUMNS:
+        if column in frame:
+            frame[column] = _as_bool(frame[column])
+    return frame
+
+
+def _legit_weight(csv_path, legit_rows):
+    """Peso de cada legítima del compacto: total real de legítimas / legítimas en la muestra"""
+    daily_path = Path(csv_path).with_name(DAILY_KPIS_CSV)
+    if not daily_path.exists() or not legit_rows:
+        print(f"   ⚠️  Sin {DAILY_KPIS_CSV}: hit rate y precision quedan sobre la muestra compacta")
+        return 1.0
+    daily = pd.read_csv(daily_path)
+    return float((daily['total_transactions'] - daily['fraud_count']).sum()) / legit_rows
+
+
+def evaluate_rules(rules=DEFAULT_RULES, csv_path='synthetic_fraud_data.csv', chunksize=500_000,
+                   report_path=REPORT_CSV):
+    """Evalúa todas las reglas en una pasada y devuelve hit rate, precision y recall por regla"""
+    ruleset = rules if isinstance(rules, RuleSet) else RuleSet(load_rules(rules) if isinstance(rules, (str, Path))
+                                                                else rules)
+    columns, raw = _source_columns(csv_path, ruleset.columns)
+    print("\n" + "="*80)
+    print(f"🧮 REGLAS DE FRAUDE: {len(ruleset.trees)} reglas, {len(ruleset.atoms)} átomos distintos, "
+          f"{len(columns)} columnas ({'crudo' if raw else 'compacto'}, "
+          f"{'numexpr' if _numexpr() else 'NumPy'})")
+    print("="*80)
+
+    start = time.perf_counter()
+    hits = np.zeros(len(ruleset.trees), dtype=np.int64)
+    true_positives = np.zeros(len(ruleset.trees), dtype=np.int64)
+    rows = frauds = 0
+    for chunk in iter_source_chunks(csv_path, chunksize, columns=columns):
+        frame = normalize_chunk(chunk, ruleset.columns, raw)
+        matrix = ruleset.evaluate(frame)
+        fraud = frame['is_fraud'].to_numpy(dtype=bool)
+        hits += np.count_nonzero(matrix, axis=0)
+        true_positives += np.count_nonzero(matrix[fraud], axis=0)
+        rows += len(frame)
+        frauds += int(fraud.sum())
+    elapsed = time.perf_counter() - start
+
+    weight = 1.0 if raw else _legit_weight(csv_path, rows - frauds)
+    false_positives = (hits - true_positives) * weight
+    total = frauds + (rows - frauds) * weight
+    flagged = true_positives + false_positives
+    precision = np.divide(true_positives, flagged, out=np.zeros(len(hits)), where=flagged > 0)
+    recall = true_positives / frauds if frauds else np.zeros(len(hits))
+    report = pd.DataFrame({
+        'rule': [rule['name'] for rule in ruleset.rules],
+        'when': [str(rule['when']) for rule in ruleset.rules],
+        'hits': np.round(flagged).astype(np.int64),
+        'hit_rate': np.round(flagged / total * 100, 4),
+        'true_positives': true_positives,
+        'precision': np.round(precision * 100, 2),
+        'recall': np.round(recall * 100, 2),
+        'f1': np.round(np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(hits)),
+                                 where=(precision + recall) > 0), 4),
+        'lift': np.round(precision / (frauds / total), 2) if frauds else 0.0,
+    })
+    if report_path:
+        report.to_csv(report_path, index=False)
+
+    print(f"   📥 {rows:,} transacciones ({frauds:,} fraudes) evaluadas en {elapsed:.2f}s "
+          f"({rows * len(ruleset.trees) / max(elapsed, 1e-9) / 1e6:,.0f}M evaluaciones regla·fila/s)")
+    if weight != 1.0:
+        print(f"   ⚖️  Legítimas reponderadas x{weight:.1f} (muestra compacta)")
+    print(f"   {'regla':<32} {'hit rate':>9} {'precision':>10} {'recall':>8} {'lift':>6}")
+    for _, row in report.sort_values('f1', ascending=False).head(20).iterrows():
+        print(f"   {row['rule'][:32]:<32} {row['hit_rate']:>8.2f}% {row['precision']:>9.2f}% "
+              f"{row['recall']:>7.2f}% {row['lift']:>6.2f}")
+    if report_path:
+        print(f"   ✅ Reporte: {report_path}")
+    return report
+
+
+def generate_rules(n_rules=300):
+    """Grilla de reglas candidatas (umbrales y combinaciones) para el benchmark"""
+    amounts = [100, 250, 500, 1000, 2000, 5000]
+    velocity = [50, 100, 200, 300, 400]
+    templates = [
+        "amount > {a} and high_risk_merchant and not card_present",
+        "amount > {a} and velocity_num_trans >= {v}",
+        "velocity_num_trans >= {v} or velocity_unique_countries >= 4",
+        "amount > {a} and country in ['Nigeria', 'Russia', 'Brazil']",
+        "amount / (velocity_max_amount + 1) > 0.{d} and hour < 6",
+        "amount > {a} and merchant_category in ['Travel', 'Retail'] and is_weekend",
+        "velocity_total_amount > {a} * 100 and distance_from_home",
+        "not card_present and channel == 'web' and amount > {a}",
+        "velocity_unique_merchants >= {m} and amount > {a}",
+        "abs(amount - velocity_max_amount) < {a} and high_risk_merchant",
+    ]
+    rules = []
+    for i in range(n_rules):
+        template = templates[i % len(templates)]
+        a, v = amounts[(i // len(templates)) % len(amounts)], velocity[(i // 7) % len(velocity)]
+        rules.append({'name': f"r{i:03d}", 'when': template.format(a=a, v=v, m=v // 4, d=(i % 9) + 1)})
+    return rules
+
+
+def benchmark(csv_path='synthetic_fraud_data.csv', n_rules=300):
+    """Una pasada con átomos compartidos vs pandas.eval de cada regla sobre el DataFrame completo"""
+    rules = generate_rules(n_rules)
+    ruleset = RuleSet(rules)
+    start = time.perf_counter()
+    report = evaluate_rules(ruleset, csv_path, report_path=None)
+    engine = time.perf_counter() - start
+
+    columns, raw = _source_columns(csv_path, ruleset.columns)
+    start = time.perf_counter()
+    frame = normalize_chunk(pd.read_csv(csv_path, usecols=columns), ruleset.columns, raw)
+    baseline_hits = [int(frame.eval(rule['when']).sum()) for rule in rules]
+    baseline = time.perf_counter() - start
+    engine_hits = [int(hits) for hits in report['hits']] if raw else None
+
+    print("\n" + "="*80)
+    print(f"📊 {len(rules)} reglas ({len(ruleset.atoms)} átomos distintos) sobre {len(frame):,} filas")
+    print(f"   motor: {engine:.2f}s | pandas.eval regla por regla: {baseline:.2f}s (x{baseline / engine:.1f})")
+    if engine_hits is not None:
+        same = engine_hits == baseline_hits
+        print(f"   Paridad de hits: {'✅ idénticos' if same else '❌ difieren'}")
+    return engine, baseline
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    chunksize = int(args[args.index('--chunksize') + 1]) if '--chunksize' in args else 500_000
+    positional = [arg for i, arg in enumerate(args[1:], 1) if not arg.startswith('--')
+                  and not args[i - 1].startswith('--')]
+    command = args[0] if args else 'evaluate'
+
+    if command == 'bench':
+        benchmark(positional[0] if positional else 'synthetic_fraud_data.csv',
+                  int(positional[1]) if len(positional) > 1 else 300)
+    else:
+        evaluate_rules(positional[0] if positional else DEFAULT_RULES,
+                       positional[1] if len(positional) > 1 else 'synthetic_fraud_data.csv', chunksize)
@@ -9,10 +9,12 @@
 -- 1. TABLA PRINCIPAL DE TRANSACCIONES (COMPACTA)
 -- ============================================================================
 
+-- Los identificadores de alta cardinalidad viajan como surrogate keys enteras estables
+-- (id_maps.py); el valor original está en las tablas fraud_dim_* (sección 1b)
 CREATE TABLE IF NOT EXISTS fraud_transactions (
-    transaction_id TEXT PRIMARY KEY,
-    customer_id TEXT NOT NULL,
-    card_number BIGINT NOT NULL,
+    transaction_id BIGINT PRIMARY KEY,
+    customer_id BIGINT NOT NULL,
+    card_id BIGINT NOT NULL,
     
     -- Temporal (optimizado - sin timestamp completo)
     date DATE NOT NULL,
@@ -23,7 +25,7 @@ CREATE TABLE IF NOT EXISTS fraud_transactions (
     -- Merchant
     merchant_category TEXT NOT NULL,
     merchant_type TEXT NOT NULL,
-    merchant TEXT NOT NULL,
+    merchant_id BIGINT NOT NULL,
     
     -- Transaction
     amount DECIMAL(12,2) NOT NULL,
@@ -38,7 +40,7 @@ CREATE TABLE IF NOT EXISTS fraud_transactions (
     card_present SMALLINT NOT NULL,
     device TEXT NOT NULL,
     channel TEXT NOT NULL,
-    device_fingerprint TEXT,
+    device_id BIGINT,
     
     -- Risk Indicators
     distance_from_home SMALLINT NOT NULL,
@@ -64,6 +66,33 @@ CREATE INDEX idx_fraud_trans_customer ON fraud_transactions(customer_id);
 CREATE INDEX idx_fraud_trans_merchant_cat ON fraud_transactions(merchant_category);
 CREATE INDEX idx_fraud_trans_country ON fraud_transactions(country);
 CREATE INDEX idx_fraud_trans_amount ON fraud_transactions(amount) WHERE is_fraud = 1;
+CREATE INDEX idx_fraud_trans_merchant ON fraud_transactions(merchant_id);
+
+-- ============================================================================
+-- 1b. DIMENSIONES DE IDENTIFICADORES (id entero -> valor original)
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS fraud_dim_transactions (id BIGINT PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS fraud_dim_customers (id BIGINT PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS fraud_dim_cards (id BIGINT PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS fraud_dim_merchants (id BIGINT PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS fraud_dim_devices (id BIGINT PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+
+-- Vista con los identificadores originales (para consultas ad-hoc)
+CREATE OR REPLACE VIEW v_fraud_transactions_decoded AS
+SELECT
+    t.*,
+    dt.key as transaction_key,
+    dc.key as customer_key,
+    dk.key as card_number,
+    dm.key as merchant,
+    dd.key as device_fingerprint
+FROM fraud_transactions t
+LEFT JOIN fraud_dim_transactions dt ON dt.id = t.transaction_id
+LEFT JOIN fraud_dim_customers dc ON dc.id = t.customer_id
+LEFT JOIN fraud_dim_cards dk ON dk.id = t.card_id
+LEFT JOIN fraud_dim_merchants dm ON dm.id = t.merchant_id
+LEFT JOIN fraud_dim_devices dd ON dd.id = t.device_id;
 
 -- ============================================================================
 -- 2. KPIs DIARIOS AGREGADOS
@@ -121,9 +150,20 @@ CREATE TABLE IF NOT EXISTS fraud_merchant_kpis (
     risk_level TEXT NOT NULL,
     
     created_at TIMESTAMP DEFAULT NOW(),
-    UNIQUE(merchant, merchant_category)
+    CONSTRAINT fraud_merchant_kpis_grain UNIQUE(merchant, merchant_category, merchant_type)
 );
 
+-- Instalaciones previas: la unicidad era por (merchant, merchant_category), pero cada par tiene
+-- varias filas (una por merchant_type) y el upsert fallaba con claves repetidas en el lote
+ALTER TABLE fraud_merchant_kpis DROP CONSTRAINT IF EXISTS fraud_merchant_kpis_merchant_merchant_category_key;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'fraud_merchant_kpis_grain') THEN
+        ALTER TABLE fraud_merchant_kpis
+            ADD CONSTRAINT fraud_merchant_kpis_grain UNIQUE (merchant, merchant_category, merchant_type);
+    END IF;
+END $$;
+
 CREATE INDEX idx_merchant_kpis_risk ON fraud_merchant_kpis(risk_level);
 CREATE INDEX idx_merchant_kpis_fraud_rate ON fraud_merchant_kpis(fraud_rate);
 CREATE INDEX idx_merchant_kpis_category ON fraud_merchant_kpis(merchant_category);
@@ -176,6 +216,34 @@ CREATE TABLE IF NOT EXISTS fraud_hourly_patterns (
 
 CREATE INDEX idx_hourly_patterns_hour ON fraud_hourly_patterns(hour);
 
+-- ============================================================================
+-- 5b. COMPONENTES DEL GRAFO CLIENTE–TARJETA–DISPOSITIVO (link_graph.py)
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS fraud_link_components (
+    id SERIAL PRIMARY KEY,
+    component_id INTEGER NOT NULL UNIQUE, -- 1 = componente más grande
+    
+    -- Tamaño
+    nodes INTEGER NOT NULL,
+    customers INTEGER NOT NULL,
+    cards INTEGER NOT NULL,
+    devices INTEGER NOT NULL,
+    edges INTEGER NOT NULL,
+    
+    -- Transacciones de los clientes de la componente
+    transactions INTEGER NOT NULL,
+    fraud_count INTEGER NOT NULL,
+    fraud_rate DECIMAL(5,2) NOT NULL,
+    fraud_customers INTEGER NOT NULL,
+    total_amount DECIMAL(15,2) NOT NULL,
+    fraud_amount DECIMAL(15,2) NOT NULL,
+    
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX idx_link_components_size ON fraud_link_components(customers DESC);
+
 -- ============================================================================
 -- 6. VISTAS PARA DASHBOARDS
 -- ============================================================================
@@ -190,7 +258,7 @@ SELECT
     SUM(CASE WHEN is_fraud = 1 THEN amount ELSE 0 END) as fraud_amount,
     ROUND(AVG(CASE WHEN is_fraud = 1 THEN 1.0 ELSE 0.0 END) * 100, 2) as fraud_rate,
     COUNT(DISTINCT customer_id) as unique_customers,
-    COUNT(DISTINCT merchant) as unique_merchants,
+    COUNT(DISTINCT merchant_id) as unique_merchants,
     COUNT(DISTINCT country) as unique_countries
 FROM fraud_transactions;
 
@@ -312,7 +380,8 @@ $$ LANGUAGE plpgsql;
 -- ============================================================================
 
 -- Comentarios sobre el tamaño esperado:
--- fraud_transactions: ~1.7M registros x ~200 bytes = ~340 MB
+-- fraud_transactions: ~1.7M registros x ~170 bytes = ~290 MB (ids enteros en vez de texto)
+-- fraud_dim_*: ~1.7M transacciones + clientes/tarjetas/dispositivos/comerciantes, ~40 bytes por fila
 -- fraud_daily_kpis: ~30 registros x 100 bytes = ~3 KB
 -- fraud_merchant_kpis: ~105 registros x 150 bytes = ~16 KB
 -- fraud_country_kpis: ~12 registros x 150 bytes = ~2 KB
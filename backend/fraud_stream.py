@@ -0,0 +1,409 @@
+"""
+Ingesta de transacciones de fraude en streaming con KPIs mantenidos incrementalmente
+Consume eventos en micro-lotes desde una fuente intercambiable (tail de un CSV o una cola;
+LocalQueueSource emula la cola en el mismo proceso), actualiza acumuladores de
+fraud_daily_kpis, fraud_merchant_kpis, fraud_country_kpis y fraud_hourly_patterns y hace
+upsert solo de las filas de KPI que cambiaron en el lote.
+
+Sumas y conteos son exactos; los únicos (HyperLogLog, p=12) y la mediana diaria
+(histograma logarítmico con error relativo de ~0.5%) son aproximados.
+
+    python fraud_stream.py tail <csv> [--bootstrap synthetic_fraud_data.csv] [--dry-run]
+    python fraud_stream.py demo [csv] [eventos_por_segundo]   -> cola local + servidor mock
+"""
+import io
+import os
+import pickle
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from source_cache import iter_source_chunks
+
+
+CHECKPOINT_PATH = 'fraud_stream_state.pkl'
+HLL_P = 12
+HISTOGRAM_GAMMA = 1.01
+HISTOGRAM_BINS = 2048
+
+# tabla -> columnas de agrupación, on_conflict y columnas con únicos
+KPI_TABLES = {
+    'fraud_daily_kpis': {
+        'key': ['date'], 'conflict': 'date',
+        'distinct': {'unique_customers': 'customer_id', 'unique_merchants': 'merchant',
+                     'unique_countries': 'country'},
+    },
+    'fraud_merchant_kpis': {
+        'key': ['merchant', 'merchant_category', 'merchant_type'],
+        'conflict': 'merchant,merchant_category,merchant_type',
+        'distinct': {'unique_customers': 'customer_id'},
+    },
+    'fraud_country_kpis': {
+        'key': ['country'], 'conflict': 'country',
+        'distinct': {'unique_customers': 'customer_id', 'unique_merchants': 'merchant'},
+    },
+    'fraud_hourly_patterns': {
+        'key': ['hour'], 'conflict': 'hour',
+        'distinct': {},
+    },
+}
+SUM_COLUMNS = ['total_transactions', 'total_amount', 'fraud_count', 'fraud_amount']
+
+
+def prepare_events(df):
+    """Normaliza eventos crudos (mismo formato que synthetic_fraud_data.csv)"""
+    events = pd.DataFrame(index=df.index)
+    timestamps = pd.to_datetime(df['timestamp'], format='mixed', utc=True)
+    events['date'] = timestamps.dt.strftime('%Y-%m-%d')
+    events['hour'] = df['transaction_hour'].astype(int) if 'transaction_hour' in df else timestamps.dt.hour
+    for col in ['merchant', 'merchant_category', 'merchant_type', 'country', 'customer_id']:
+        events[col] = df[col].astype(str)
+    events['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0)
+    fraud = df['is_fraud'].replace({'True': 1, 'False': 0, 'true': 1, 'false': 0, True: 1, False: 0})
+    events['is_fraud'] = pd.to_numeric(fraud, errors='coerce').fillna(0).astype(int)
+    events['fraud_amount'] = events['amount'] * events['is_fraud']
+    return events
+
+
+def _hash(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+class KeyedHLL:
+    """Un HyperLogLog por clave, en una matriz (claves x 2^p registros) actualizada en bloque"""
+
+    def __init__(self, p=HLL_P):
+        self.p = p
+        self.m = 1 << p
+        self.rows = {}
+        self.registers = np.zeros((0, self.m), dtype=np.uint8)
+
+    def _row_index(self, keys):
+        new = [key for key in pd.unique(keys) if key not in self.rows]
+        if new:
+            for key in new:
+                self.rows[key] = len(self.rows)
+            grown = np.zeros((len(self.rows), self.m), dtype=np.uint8)
+            grown[:len(self.registers)] = self.registers
+            self.registers = grown
+        return np.fromiter((self.rows[key] for key in keys), dtype=np.int64, count=len(keys))
+
+    def add(self, keys, values):
+        rows = self._row_index(keys)
+        hashes = _hash(values)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = (hashes << np.uint64(self.p)) | np.uint64((1 << self.p) - 1)
+        rho = (64 - np.floor(np.log2(rest.astype(np.float64))).astype(np.int64)).astype(np.uint8)
+        np.maximum.at(self.registers, (rows, idx), rho)
+
+    def count(self, keys):
+        registers = self.registers[[self.rows[key] for key in keys]].astype(np.float64)
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.exp2(-registers).sum(axis=1)
+        zeros = (registers == 0).sum(axis=1)
+        small = (estimate <= 2.5 * self.m) & (zeros > 0)
+        estimate[small] = self.m * np.log(self.m / zeros[small])
+        return np.round(estimate).astype(np.int64)
+
+
+class KeyedHistogram:
+    """Histograma logarítmico por clave para la mediana (error relativo ~(gamma-1)/2)"""
+
+    def __init__(self, gamma=HISTOGRAM_GAMMA, bins=HISTOGRAM_BINS):
+        self.log_gamma = np.log(gamma)
+        self.bins = bins
+        self.counts = {}
+
+    def add(self, keys, values):
+        values = np.asarray(values, dtype=np.float64)
+        bins = np.clip(np.floor(np.log(np.maximum(values, 0.01) / 0.01) / self.log_gamma), 0, self.bins - 1)
+        frame = pd.DataFrame({'key': keys, 'bin': bins.astype(np.int64)})
+        for key, group in frame.groupby('key', sort=False)['bin']:
+            counts = self.counts.setdefault(key, np.zeros(self.bins, dtype=np.int64))
+            counts += np.bincount(group.to_numpy(), minlength=self.bins)
+
+    def median(self, key):
+        counts = self.counts[key]
+        position = np.searchsorted(np.cumsum(counts), (counts.sum() + 1) / 2)
+        return float(0.01 * np.exp((position + 0.5) * self.log_gamma))
+
+
+class IncrementalFraudKPIs:
+    """Acumuladores de los cuatro KPIs de fraude; update() devuelve solo las filas modificadas"""
+
+    def __init__(self):
+        self.sums = {table: pd.DataFrame(columns=SUM_COLUMNS, dtype=np.float64) for table in KPI_TABLES}
+        self.keys = {table: {} for table in KPI_TABLES}
+        self.distinct = {table: {name: KeyedHLL() for name in spec['distinct']} for table, spec in KPI_TABLES.items()}
+        self.medians = KeyedHistogram()
+        self.events = 0
+
+    @staticmethod
+    def _key_strings(events, key_columns):
+        if len(key_columns) == 1:
+            return events[key_columns[0]].astype(str).to_numpy(dtype=object)
+        keys = events[key_columns[0]].astype(str)
+        for col in key_columns[1:]:
+            keys = keys + '\x1f' + events[col].astype(str)
+        return keys.to_numpy(dtype=object)
+
+    def update(self, events):
+        self.events += len(events)
+        changed = {}
+        for table, spec in KPI_TABLES.items():
+            keys = self._key_strings(events, spec['key'])
+            grouped = events.assign(_key=keys).groupby('_key', sort=False)
+            batch = grouped.agg(total_transactions=('amount', 'size'), total_amount=('amount', 'sum'),
+                                fraud_count=('is_fraud', 'sum'), fraud_amount=('fraud_amount', 'sum'))
+            self.sums[table] = self.sums[table].add(batch.astype(np.float64), fill_value=0)
+
+            first = grouped[spec['key']].first()
+            for key, values in zip(first.index, first.itertuples(index=False)):
+                self.keys[table].setdefault(key, tuple(values))
+            for name, column in spec['distinct'].items():
+                self.distinct[table][name].add(keys, events[column].to_numpy(dtype=object))
+            if table == 'fraud_daily_kpis':
+                self.medians.add(keys, events['amount'].to_numpy())
+
+            changed[table] = self.rows(table, list(batch.index))
+        return changed
+
+    def rows(self, table, keys=None):
+        """Filas de KPI con el mismo formato que FraudDataCompactor.create_*_aggregations"""
+        spec = KPI_TABLES[table]
+        sums = self.sums[table] if keys is None else self.sums[table].loc[keys]
+        keys = list(sums.index)
+
+        rows = pd.DataFrame([self.keys[table][key] for key in keys], columns=spec['key'])
+        count = sums['total_transactions'].to_numpy()
+        rows['total_transactions'] = count.astype(np.int64)
+        rows['total_amount'] = sums['total_amount'].round(2).to_numpy()
+        rows['avg_amount'] = (sums['total_amount'].to_numpy() / count).round(2)
+        if table == 'fraud_daily_kpis':
+            rows['median_amount'] = np.round([self.medians.median(key) for key in keys], 2)
+        rows['fraud_count'] = sums['fraud_count'].to_numpy().astype(np.int64)
+        rows['fraud_rate'] = (sums['fraud_count'].to_numpy() / count * 100).round(2)
+        if table == 'fraud_daily_kpis':
+            rows['fraud_amount'] = sums['fraud_amount'].round(2).to_numpy()
+        for name in spec['distinct']:
+            rows[name] = self.distinct[table][name].count(keys)
+        if table == 'fraud_merchant_kpis':
+            rows['risk_level'] = np.select(
+                [rows['fraud_rate'] >= 50, rows['fraud_rate'] >= 30, rows['fraud_rate'] >= 15],
+                ['critical', 'high', 'medium'], default='low')
+        if table == 'fraud_hourly_patterns':
+            rows['hour'] = rows['hour'].astype(int)
+        return rows
+
+
+# ----------------------------------------------------------------------
+# Fuentes de eventos
+# ----------------------------------------------------------------------
+
+class FileTailSource:
+    """Sigue un CSV al que se agregan filas (como tail -f); la posición se guarda en el checkpoint"""
+
+    def __init__(self, path, position=None, poll_interval=0.2):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.header = None
+        self.position = position
+
+    def poll(self, max_events, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.path.exists():
+                with open(self.path, 'rb') as f:
+                    header = f.readline()
+                    if self.header is None and header.endswith(b'\n'):
+                        self.header = header
+                        self.position = self.position or f.tell()
+                    if self.header is not None:
+                        f.seek(self.position)
+                        lines = []
+                        for line in f:
+                            if not line.endswith(b'\n') or len(lines) >= max_events:
+                                break
+                            lines.append(line)
+                        if lines:
+                            self.position += sum(len(line) for line in lines)
+                            return pd.read_csv(io.BytesIO(self.header + b''.join(lines)))
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+
+class LocalQueueSource:
+    """Cola en memoria con la misma interfaz que una cola externa (emula el broker en local)"""
+
+    def __init__(self, events_queue=None):
+        self.queue = events_queue or queue.Queue()
+        self.position = None
+
+    def publish(self, event):
+        self.queue.put({**event, '_published_at': time.time()})
+
+    def poll(self, max_events, timeout):
+        try:
+            events = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return None
+        while len(events) < max_events:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return pd.DataFrame(events)
+
+
+# ----------------------------------------------------------------------
+# Destinos
+# ----------------------------------------------------------------------
+
+class SupabaseKPISink:
+    """Upsert de las filas de KPI modificadas con el transporte compartido"""
+
+    def __init__(self, transport=None):
+        if transport is None:
+            from supabase_transport import get_transport
+            transport = get_transport()
+        self.transport = transport
+
+    def write(self, changed):
+        for table, rows in changed.items():
+            if len(rows):
+                records = rows.astype(object).where(rows.notna(), None).to_dict('records')
+                self.transport.upsert(table, records, on_conflict=KPI_TABLES[table]['conflict'])
+
+
+class DryRunSink:
+    def __init__(self):
+        self.written = {table: 0 for table in KPI_TABLES}
+
+    def write(self, changed):
+        for table, rows in changed.items():
+            self.written[table] += len(rows)
+
+
+# ----------------------------------------------------------------------
+# Ingestor
+# ----------------------------------------------------------------------
+
+class StreamingFraudIngestor:
+    def __init__(self, source, sink, checkpoint_path=CHECKPOINT_PATH, max_events=5000, timeout=0.5):
+        self.source = source
+        self.sink = sink
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.max_events = max_events
+        self.timeout = timeout
+        self.kpis = IncrementalFraudKPIs()
+        self.batches = 0
+        self.load_checkpoint()
+
+    def load_checkpoint(self):
+        if self.checkpoint_path and self.checkpoint_path.exists():
+            with open(self.checkpoint_path, 'rb') as f:
+                state = pickle.load(f)
+            self.kpis = state['kpis']
+            self.source.position = state.get('position')
+            print(f"♻️  Checkpoint: {self.kpis.events:,} eventos acumulados")
+
+    def save_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+        tmp_path = self.checkpoint_path.with_name(self.checkpoint_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'kpis': self.kpis, 'position': self.source.position}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def bootstrap(self, csv_path, chunksize=500_000):
+        """Acumula el histórico (sin subir) para que los upserts partan de los totales completos"""
+        print(f"📚 Bootstrap desde {csv_path}...")
+        start = time.perf_counter()
+        for chunk in iter_source_chunks(csv_path, chunksize,
+                                        columns=['timestamp', 'transaction_hour', 'merchant', 'merchant_category',
+                                                 'merchant_type', 'country', 'customer_id', 'amount', 'is_fraud']):
+            self.kpis.update(prepare_events(chunk))
+        self.save_checkpoint()
+        print(f"✅ Bootstrap: {self.kpis.events:,} eventos ({time.perf_counter() - start:.1f}s)")
+
+    def full_tables(self):
+        return {table: self.kpis.rows(table) for table in KPI_TABLES}
+
+    def process(self, raw):
+        start = time.perf_counter()
+        published = raw.pop('_published_at') if '_published_at' in raw else None
+        changed = self.kpis.update(prepare_events(raw))
+        self.sink.write(changed)
+        self.save_checkpoint()
+        self.batches += 1
+
+        done = time.time()
+        latency = f", latencia evento→upsert máx {done - published.min():.2f}s" if published is not None else ""
+        rows = sum(len(frame) for frame in changed.values())
+        print(f"   ⚡ Lote {self.batches}: {len(raw):,} eventos, {rows} filas de KPI actualizadas "
+              f"({(time.perf_counter() - start) * 1000:.0f} ms{latency})")
+        return changed
+
+    def run(self, max_batches=None, idle_timeout=None):
+        """Bucle principal; termina tras max_batches o tras idle_timeout segundos sin eventos"""
+        print("="*80)
+        print("📡 INGESTA DE FRAUDE EN STREAMING")
+        print("="*80)
+        idle_since = time.monotonic()
+        while max_batches is None or self.batches < max_batches:
+            raw = self.source.poll(self.max_events, self.timeout)
+            if raw is None or raw.empty:
+                if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                    break
+                continue
+            idle_since = time.monotonic()
+            self.process(raw)
+
+
+def demo(csv_path='synthetic_fraud_data.csv', rate=2000, total=20_000):
+    """Publica eventos del CSV en una cola local y los sube a un servidor PostgREST mock"""
+    from supabase_transport import SupabaseTransport, _start_mock_server
+
+    server, received = _start_mock_server()
+    transport = SupabaseTransport(f'http://127.0.0.1:{server.server_port}', 'mock-key', http2=False)
+    source = LocalQueueSource()
+    ingestor = StreamingFraudIngestor(source, SupabaseKPISink(transport), checkpoint_path=None, max_events=1000)
+
+    def produce():
+        for chunk in iter_source_chunks(csv_path, 500):
+            for event in chunk.to_dict('records'):
+                source.publish(event)
+                time.sleep(1 / rate)
+                total_left[0] -= 1
+                if total_left[0] <= 0:
+                    return
+
+    total_left = [total]
+    threading.Thread(target=produce, daemon=True).start()
+    ingestor.run(idle_timeout=2)
+    transport.summary()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else 'demo'
+
+    if command == 'tail':
+        bootstrap = args[args.index('--bootstrap') + 1] if '--bootstrap' in args else None
+        sink = DryRunSink() if '--dry-run' in args else SupabaseKPISink()
+        ingestor = StreamingFraudIngestor(FileTailSource(args[1]), sink)
+        if bootstrap and ingestor.kpis.events == 0:
+            ingestor.bootstrap(bootstrap)
+        try:
+            ingestor.run()
+        except KeyboardInterrupt:
+            print(f"\n👋 Detenido tras {ingestor.batches} lotes ({ingestor.kpis.events:,} eventos)")
+    else:
+        demo(*(args[1:2] or ['synthetic_fraud_data.csv']), *[int(arg) for arg in args[2:3]])
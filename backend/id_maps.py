@@ -0,0 +1,142 @@
+"""
+Surrogate keys enteros persistentes para identificadores de alta cardinalidad
+Cada IdMap asigna ids estables entre corridas (los nuevos valores reciben el siguiente id)
+y se guarda como índice hash compacto en disco (.npz: hashes ordenados + ids + claves).
+La búsqueda es vectorizada (searchsorted sobre hashes de 64 bits) y se verifica contra la
+clave original, por lo que una colisión se detecta en vez de asignar un id incorrecto.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_ID_MAP_DIR = 'id_maps'
+# Clave fija de hash_array: los hashes deben ser los mismos en todas las corridas
+HASH_KEY = 'portfolio-idmap1'
+
+# columna de fraud_transactions -> (columna entera, tabla de dimensión)
+FRAUD_DIMENSIONS = {
+    'transaction_id': ('transaction_id', 'fraud_dim_transactions'),
+    'customer_id': ('customer_id', 'fraud_dim_customers'),
+    'card_number': ('card_id', 'fraud_dim_cards'),
+    'merchant': ('merchant_id', 'fraud_dim_merchants'),
+    'device_fingerprint': ('device_id', 'fraud_dim_devices'),
+}
+
+
+def _hash(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object), hash_key=HASH_KEY, categorize=True)
+
+
+class IdMap:
+    def __init__(self, path):
+        self.path = Path(path)
+        if self.path.exists():
+            with np.load(self.path, allow_pickle=False) as data:
+                self.keys = data['keys']
+                self.sorted_hashes = data['sorted_hashes']
+                self.sorted_ids = data['sorted_ids']
+        else:
+            self.keys = np.array([], dtype=str)
+            self.sorted_hashes = np.array([], dtype=np.uint64)
+            self.sorted_ids = np.array([], dtype=np.int64)
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _lookup(self, keys, hashes):
+        """ids (1..n) de las claves ya conocidas, 0 si no existen"""
+        positions = np.searchsorted(self.sorted_hashes, hashes)
+        positions = np.minimum(positions, max(len(self.sorted_hashes) - 1, 0))
+        ids = np.zeros(len(keys), dtype=np.int64)
+        if len(self.sorted_hashes):
+            found = self.sorted_hashes[positions] == hashes
+            ids[found] = self.sorted_ids[positions[found]]
+            collided = found & (self.keys[np.maximum(ids, 1) - 1] != keys)
+            if collided.any():
+                raise ValueError(f"❌ Colisión de hash en {self.path.name}: {keys[collided][:3].tolist()}")
+        return ids
+
+    def encode(self, values):
+        """Devuelve ids enteros (Int64, nulos como <NA>), asignando ids nuevos a valores no vistos"""
+        series = pd.Series(values)
+        present = series.notna().to_numpy()
+        codes, uniques = pd.factorize(series[present].astype(str))
+
+        keys = np.asarray(uniques, dtype=str)
+        hashes = _hash(keys)
+        ids = self._lookup(keys, hashes)
+
+        new = ids == 0
+        if new.any():
+            new_hashes = hashes[new]
+            if len(np.unique(new_hashes)) != len(new_hashes) or np.isin(new_hashes, self.sorted_hashes).any():
+                raise ValueError(f"❌ Colisión de hash al asignar ids en {self.path.name}")
+            ids[new] = np.arange(len(self.keys) + 1, len(self.keys) + 1 + new.sum())
+
+            self.keys = np.concatenate([self.keys, keys[new]])
+            all_hashes = np.concatenate([self.sorted_hashes, new_hashes])
+            all_ids = np.concatenate([self.sorted_ids, ids[new]])
+            order = np.argsort(all_hashes, kind='stable')
+            self.sorted_hashes, self.sorted_ids = all_hashes[order], all_ids[order]
+            self.dirty = True
+
+        result = np.zeros(len(series), dtype=np.int64)
+        result[present] = ids[codes]
+        return pd.arrays.IntegerArray(result, mask=~present)
+
+    def decode(self, ids):
+        ids = pd.array(ids, dtype='Int64')
+        keys = pd.Series(pd.NA, index=range(len(ids)), dtype=object)
+        valid = ~ids.isna()
+        keys[valid] = self.keys[ids[valid].to_numpy(dtype=np.int64) - 1]
+        return keys
+
+    def dimension_table(self):
+        return pd.DataFrame({'id': np.arange(1, len(self.keys) + 1, dtype=np.int64), 'key': self.keys})
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.stem + '.tmp.npz')
+        np.savez_compressed(tmp_path, keys=self.keys, sorted_hashes=self.sorted_hashes, sorted_ids=self.sorted_ids)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+class IdMapRegistry:
+    """Un IdMap por dimensión, guardados en `directory`"""
+
+    def __init__(self, directory=DEFAULT_ID_MAP_DIR):
+        self.directory = Path(directory)
+        self.maps = {}
+
+    def get(self, name):
+        if name not in self.maps:
+            self.maps[name] = IdMap(self.directory / f"{name}.npz")
+        return self.maps[name]
+
+    def encode_columns(self, df, dimensions=FRAUD_DIMENSIONS):
+        """
+        Reemplaza las columnas de `dimensions` por sus ids enteros (misma posición)
+        y devuelve (df_codificado, {tabla_dimensión: DataFrame id/key})
+        """
+        encoded = df.copy()
+        tables = {}
+        for column, (id_column, table) in dimensions.items():
+            if column not in encoded.columns:
+                continue
+            id_map = self.get(table)
+            position = encoded.columns.get_loc(column)
+            ids = id_map.encode(encoded.pop(column))
+            encoded.insert(position, id_column, ids)
+            tables[table] = id_map.dimension_table()
+        return encoded, tables
+
+    def save(self):
+        for id_map in self.maps.values():
+            id_map.save()
@@ -0,0 +1,586 @@
+"""
+Servicio local de KPIs con caché de resultados
+Los dashboards consultan KPIs parametrizados (filtros, rangos de fechas) que se calculan con
+DuckDB sobre los artefactos procesados. Las respuestas se guardan ya serializadas en una caché
+LRU con TTL; las consultas idénticas que llegan mientras otra igual se está calculando esperan
+ese mismo resultado (request coalescing) en lugar de ejecutar la consulta otra vez.
+
+Las tablas se cargan en una base DuckDB en memoria desde los CSV procesados o desde
+analytics.duckdb (--db, que se adjunta solo durante la carga para no bloquear al pipeline).
+Cuando una corrida del pipeline reescribe las fuentes de un dashboard (cambia el mtime) se
+recargan sus tablas y se descartan sus entradas de la caché; POST /invalidate fuerza lo mismo.
+
+    python kpi_service.py serve [--port 8766] [--db analytics.duckdb] [--data-dir .]
+    python kpi_service.py bench [--requests 2000] [--concurrency 8] [--data-dir .]
+    python kpi_service.py invalidate [dashboard ...]   -> lo que llama el pipeline tras procesar
+
+Endpoints:
+    GET  /kpis/digital   ?channel= &start= &end=                   KPIs mensuales por canal
+    GET  /kpis/telco     ?contract= &internet_service= &payment_method= &gender=
+    GET  /kpis/airlines  ?airline= &source_city= &destination_city= &class= &limit=
+    GET  /kpis/retail    ?category= &gender= &start= &end=
+    GET  /kpis/fraud     ?by=date|country|merchant_category|hour|channel &country= &start= &end=
+    GET  /stats                                                    caché, versiones, consultas
+    POST /invalidate     {"dashboards": [...]}                     (todos si se omite)
+"""
+import http.client
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+from analytics_store import COLUMN_MAPPINGS, DIGITAL_KPIS_VIEW_SQL, TABLE_SOURCES, AnalyticsStore
+
+
+KPI_SERVICE_PORT = int(os.getenv('KPI_SERVICE_PORT', '8766'))
+KPI_CACHE_SIZE = int(os.getenv('KPI_CACHE_SIZE', '512'))
+KPI_CACHE_TTL = float(os.getenv('KPI_CACHE_TTL', '300'))
+# Cada cuánto se revisa el mtime de las fuentes de un dashboard (segundos)
+SOURCE_CHECK_INTERVAL = 1.0
+MAX_ROUTE_LIMIT = 1000
+
+DASHBOARD_TABLES = {
+    'digital': ['digital_performance_data'],
+    'telco': ['telco_customers'],
+    'airlines': ['airlines_flights'],
+    'retail': ['retail_transactions'],
+    'fraud': ['fraud_transactions', 'fraud_daily_kpis'],
+}
+FRAUD_GROUPINGS = ['date', 'country', 'merchant_category', 'hour', 'channel']
+
+
+# ----------------------------------------------------------------------
+# Consultas por dashboard: parámetros -> (SQL, valores)
+# ----------------------------------------------------------------------
+
+def _where(params, equals, date_column=None):
+    """Filtros de igualdad sobre columnas permitidas y rango start/end sobre la fecha"""
+    clauses, values = [], []
+    for name, column in equals.items():
+        if params.get(name):
+            clauses.append(f"{column} = ?")
+            values.append(params[name])
+    if date_column:
+        for name, operator in [('start', '>='), ('end', '<=')]:
+            if params.get(name):
+                clauses.append(f"{date_column} {operator} CAST(? AS DATE)")
+                values.append(params[name])
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), values
+
+
+def digital_query(params):
+    where, values = _where(params, {'channel': 'channel'}, 'period_start')
+    return f"SELECT * FROM digital_performance_kpis{where} ORDER BY channel, period_start", values
+
+
+def telco_query(params):
+    # Mismas fórmulas que processed_telco_segment_kpis.csv, con filtros opcionales
+    where, values = _where(params, {'contract': 'contract', 'internet_service': 'internet_service',
+                                    'payment_method': 'payment_method', 'gender': 'gender'})
+    return f"""
+        SELECT contract, tenure_segment, arpu_segment,
+               CAST(SUM(churn_binary) AS BIGINT) AS churned_count,
+               ROUND(AVG(churn_binary) * 100, 2) AS churn_rate,
+               COUNT(*) AS total_customers,
+               AVG(monthly_charges) AS avg_monthly_charges,
+               AVG(total_charges) AS avg_total_charges,
+               ROUND(SUM(churn_binary) * AVG(monthly_charges), 2) AS revenue_at_risk
+        FROM telco_customers{where}
+        GROUP BY contract, tenure_segment, arpu_segment
+        ORDER BY contract, tenure_segment, arpu_segment""", values
+
+
+def airlines_query(params):
+    where, values = _where(params, {'airline': 'airline', 'source_city': 'source_city',
+                                    'destination_city': 'destination_city', 'class': 'class'})
+    limit = min(int(params.get('limit') or 50), MAX_ROUTE_LIMIT)
+    return f"""
+        SELECT route, airline,
+               AVG(price) AS avg_price,
+               SUM(price) AS total_revenue,
+               COUNT(*) AS total_flights,
+               AVG(duration) AS avg_duration,
+               COUNT(*) FILTER (WHERE stops = 'zero') AS direct_flights,
+               ROUND(COUNT(*) FILTER (WHERE stops = 'zero') / COUNT(*) * 100, 2) AS direct_flight_rate
+        FROM airlines_flights{where}
+        GROUP BY route, airline
+        ORDER BY total_revenue DESC, route, airline
+        LIMIT {limit}""", values
+
+
+def retail_query(params):
+    where, values = _where(params, {'category': 'product_category', 'gender': 'gender'}, 'date')
+    return f"""
+        SELECT year_month AS period, product_category AS category,
+               SUM(total_amount) AS revenue,
+               SUM(gross_profit) AS profit,
+               COUNT(*) AS transactions,
+               SUM(quantity) AS units_sold,
+               ROUND(SUM(gross_profit) / SUM(total_amount) * 100, 2) AS margin_pct
+        FROM retail_transactions{where}
+        GROUP BY year_month, product_category
+        ORDER BY period, category""", values
+
+
+def fraud_query(params):
+    # fraud_transactions tiene todos los fraudes pero solo una muestra proporcional de legítimas:
+    # cada legítima pesa (legítimas reales según fraud_daily_kpis) / (legítimas en la muestra)
+    by = params.get('by') or 'date'
+    if by not in FRAUD_GROUPINGS:
+        raise ValueError(f"by debe ser uno de {FRAUD_GROUPINGS}")
+    where, values = _where(params, {'country': 'country', 'merchant_category': 'merchant_category',
+                                    'channel': 'channel'}, 'date')
+    return f"""
+        WITH weights AS (
+            SELECT COALESCE((SELECT SUM(total_transactions - fraud_count) FROM fraud_daily_kpis)
+                            / NULLIF((SELECT COUNT(*) FROM fraud_transactions
+                                      WHERE CAST(is_fraud AS INTEGER) = 0), 0), 1.0) AS legit_weight
+        ),
+        weighted AS (
+            SELECT t.*, CASE WHEN CAST(t.is_fraud AS INTEGER) = 1 THEN 1.0 ELSE w.legit_weight END AS weight
+            FROM fraud_transactions t, weights w
+        )
+        SELECT {by},
+               CAST(ROUND(SUM(weight)) AS BIGINT) AS total_transactions,
+               ROUND(SUM(amount * weight), 2) AS total_amount,
+               ROUND(SUM(amount * weight) / SUM(weight), 2) AS avg_amount,
+               CAST(SUM(CAST(is_fraud AS INTEGER)) AS BIGINT) AS fraud_count,
+               ROUND(SUM(CAST(is_fraud AS INTEGER)) / SUM(weight) * 100, 2) AS fraud_rate
+        FROM weighted{where}
+        GROUP BY {by}
+        ORDER BY {by}""", values
+
+
+QUERIES = {
+    'digital': (digital_query, {'channel', 'start', 'end'}),
+    'telco': (telco_query, {'contract', 'internet_service', 'payment_method', 'gender'}),
+    'airlines': (airlines_query, {'airline', 'source_city', 'destination_city', 'class', 'limit'}),
+    'retail': (retail_query, {'category', 'gender', 'start', 'end'}),
+    'fraud': (fraud_query, {'by', 'country', 'merchant_category', 'channel', 'start', 'end'}),
+}
+
+
+# ----------------------------------------------------------------------
+# Caché LRU + TTL con coalescing
+# ----------------------------------------------------------------------
+
+class KPICache:
+    """
+    LRU con vencimiento por TTL. get_or_compute ejecuta compute() una sola vez por clave
+    aunque lleguen varias peticiones iguales a la vez; las demás esperan el mismo Future.
+    Con maxsize=0 la caché queda desactivada (cada petición calcula)
+    """
+
+    def __init__(self, maxsize=KPI_CACHE_SIZE, ttl=KPI_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # clave -> (vence, valor)
+        self.inflight = {}            # clave -> Future
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'expired': 0, 'evictions': 0, 'invalidated': 0}
+
+    def get_or_compute(self, key, compute):
+        """Devuelve (valor, 'hit' | 'miss' | 'coalesced')"""
+        if self.maxsize <= 0:
+            return compute(), 'miss'
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return entry[1], 'hit'
+                del self.entries[key]
+                self.stats['expired'] += 1
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            return future.result(), 'coalesced'
+
+        try:
+            value = compute()
+        except Exception as e:
+            with self.lock:
+                self.inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.inflight.pop(key, None)
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        future.set_result(value)
+        return value, 'miss'
+
+    def invalidate(self, dashboards=None):
+        """Descarta las entradas de los dashboards indicados (todas si es None)"""
+        with self.lock:
+            stale = [key for key in self.entries if dashboards is None or key[0] in dashboards]
+            for key in stale:
+                del self.entries[key]
+            self.stats['invalidated'] += len(stale)
+        return len(stale)
+
+    def summary(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+            return {**self.stats, 'entries': len(self.entries), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hit_rate': round((self.stats['hits'] + self.stats['coalesced']) / lookups, 4) if lookups else None}
+
+
+# ----------------------------------------------------------------------
+# Servicio
+# ----------------------------------------------------------------------
+
+class KPIService:
+    def __init__(self, data_dir='.', db_path=None, cache_size=KPI_CACHE_SIZE, ttl=KPI_CACHE_TTL,
+                 check_interval=SOURCE_CHECK_INTERVAL):
+        self.data_dir = Path(data_dir)
+        self.db_path = Path(db_path) if db_path else None
+        self.store = AnalyticsStore(':memory:')
+        self.cache = KPICache(cache_size, ttl)
+        self.check_interval = check_interval
+        self.generations = {}   # dashboard -> generación de datos (parte de la clave de caché)
+        self.fingerprints = {}
+        self.checked_at = {}
+        self.load_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.local = threading.local()
+        self.query_stats = {'queries': 0, 'query_seconds': 0.0, 'reloads': 0}
+
+    def _cursor(self):
+        # Un cursor por hilo del servidor: DuckDB ejecuta consultas concurrentes sobre la misma base
+        cursor = getattr(self.local, 'cursor', None)
+        if cursor is None:
+            cursor = self.local.cursor = self.store.con.cursor()
+        return cursor
+
+    def _sources(self, dashboard):
+        if self.db_path:
+            return [self.db_path]
+        return [self.data_dir / name for table in DASHBOARD_TABLES[dashboard]
+                for name in TABLE_SOURCES[table] if (self.data_dir / name).exists()]
+
+    def _fingerprint(self, dashboard):
+        return tuple((str(path), path.stat().st_mtime_ns, path.stat().st_size) for path in self._sources(dashboard))
+
+    def _load(self, dashboard):
+        start = time.perf_counter()
+        tables = DASHBOARD_TABLES[dashboard]
+        if self.db_path:
+            path = str(self.db_path).replace("'", "''")
+            self.store.con.execute(f"ATTACH '{path}' AS source_db (READ_ONLY)")
+            try:
+                for table in tables:
+                    self.store.con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM source_db.{table}")
+            finally:
+                self.store.con.execute("DETACH source_db")
+        else:
+            for table in tables:
+                paths = [self.data_dir / name for name in TABLE_SOURCES[table] if (self.data_dir / name).exists()]
+                if not paths:
+                    raise FileNotFoundError(f"{table}: sin archivos procesados en {self.data_dir}")
+                self.store.load_csv(table, paths, COLUMN_MAPPINGS.get(table))
+        if dashboard == 'digital':
+            self.store.con.execute(DIGITAL_KPIS_VIEW_SQL)
+        rows = sum(self.store.row_count(table) for table in tables)
+        print(f"   🦆 {dashboard}: {rows:,} filas cargadas ({time.perf_counter() - start:.2f}s)")
+
+    def generation(self, dashboard):
+        """Generación vigente del dashboard; recarga sus tablas si cambiaron las fuentes"""
+        now = time.monotonic()
+        if dashboard in self.generations and now - self.checked_at.get(dashboard, 0) < self.check_interval:
+            return self.generations[dashboard]
+        with self.load_lock:
+            fingerprint = self._fingerprint(dashboard)
+            self.checked_at[dashboard] = time.monotonic()
+            if self.fingerprints.get(dashboard) != fingerprint:
+                reload = dashboard in self.generations
+                self._load(dashboard)
+                self.fingerprints[dashboard] = fingerprint
+                self.generations[dashboard] = self.generations.get(dashboard, 0) + 1
+                if reload:
+                    self.query_stats['reloads'] += 1
+                    dropped = self.cache.invalidate([dashboard])
+                    print(f"   🔄 {dashboard}: fuentes actualizadas, {dropped} entradas de caché descartadas")
+            return self.generations[dashboard]
+
+    def warm(self, dashboards=None):
+        for dashboard in dashboards or DASHBOARD_TABLES:
+            if self._sources(dashboard):
+                self.generation(dashboard)
+
+    def _execute(self, dashboard, params):
+        build, _ = QUERIES[dashboard]
+        sql, values = build(params)
+        start = time.perf_counter()
+        cursor = self._cursor()
+        cursor.execute(sql, values)
+        columns = [column[0] for column in cursor.description]
+        data = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        elapsed = time.perf_counter() - start
+        with self.stats_lock:
+            self.query_stats['queries'] += 1
+            self.query_stats['query_seconds'] += elapsed
+        payload = {'dashboard': dashboard, 'params': params, 'rows': len(data), 'data': data}
+        # Se guarda el cuerpo ya serializado: un hit de caché no vuelve a generar JSON
+        return json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+
+    def kpis(self, dashboard, params):
+        """Cuerpo JSON de la consulta y estado de caché ('hit' | 'miss' | 'coalesced')"""
+        if dashboard not in QUERIES:
+            raise KeyError(f"dashboard desconocido: {dashboard}")
+        unknown = set(params) - QUERIES[dashboard][1]
+        if unknown:
+            raise ValueError(f"parámetros no soportados para {dashboard}: {sorted(unknown)}")
+        params = {name: value for name, value in sorted(params.items()) if value != ''}
+        key = (dashboard, self.generation(dashboard), tuple(params.items()))
+        return self.cache.get_or_compute(key, lambda: self._execute(dashboard, params))
+
+    def invalidate(self, dashboards=None):
+        """Descarta la caché y fuerza a revisar las fuentes en la próxima petición"""
+        dashboards = [d for d in (dashboards or DASHBOARD_TABLES) if d in DASHBOARD_TABLES]
+        for dashboard in dashboards:
+            self.checked_at.pop(dashboard, None)
+        return {'dashboards': dashboards, 'dropped': self.cache.invalidate(dashboards)}
+
+    def stats(self):
+        queries = self.query_stats['queries']
+        return {
+            'cache': self.cache.summary(),
+            'generations': dict(self.generations),
+            'queries': queries,
+            'avg_query_ms': round(self.query_stats['query_seconds'] / queries * 1000, 2) if queries else None,
+            'reloads': self.query_stats['reloads'],
+        }
+
+
+def _make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Encabezados y cuerpo van en escrituras separadas: sin TCP_NODELAY cada respuesta
+            # keep-alive espera ~40 ms al ACK retrasado del cliente (Nagle)
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def _send(self, status, payload=None, body=None, cache=None):
+            if body is None:
+                body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if cache:
+                self.send_header('X-Cache', cache)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            parts = [part for part in url.path.split('/') if part]
+            if parts == ['stats']:
+                return self._send(200, service.stats())
+            if parts == ['health']:
+                return self._send(200, {'ok': True})
+            if len(parts) == 2 and parts[0] == 'kpis':
+                try:
+                    body, cache = service.kpis(parts[1], dict(parse_qsl(url.query)))
+                except KeyError as e:
+                    return self._send(404, {'error': str(e.args[0])})
+                except ValueError as e:
+                    return self._send(400, {'error': str(e)})
+                except FileNotFoundError as e:
+                    return self._send(503, {'error': str(e)})
+                except Exception as e:
+                    return self._send(500, {'error': f"{type(e).__name__}: {e}"})
+                return self._send(200, body=body, cache=cache)
+            self._send(404, {'error': 'ruta desconocida'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if self.path == '/invalidate':
+                return self._send(200, service.invalidate(payload.get('dashboards')))
+            self._send(404, {'error': 'ruta desconocida'})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(service, port=KPI_SERVICE_PORT):
+    """Servidor HTTP en un hilo (port=0 elige un puerto libre); devuelve el servidor"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(service))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='kpi-service', daemon=True).start()
+    return server
+
+
+def serve(data_dir='.', db_path=None, port=KPI_SERVICE_PORT):
+    service = KPIService(data_dir, db_path)
+    print("="*80)
+    print(f"📊 KPI SERVICE desde {db_path or Path(data_dir).resolve()}")
+    print("="*80)
+    service.warm()
+    server = ThreadingHTTPServer(('127.0.0.1', port), _make_handler(service))
+    server.daemon_threads = True
+    print(f"   Escuchando en http://127.0.0.1:{port} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print("👋 KPI service detenido")
+
+
+def notify_invalidate(dashboards=None, port=KPI_SERVICE_PORT, timeout=2.0):
+    """Avisa al servicio (si está corriendo) que una corrida del pipeline cambió los datos"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('POST', '/invalidate', body=json.dumps({'dashboards': dashboards}).encode('utf-8'),
+                     headers={'Content-Type': 'application/json'})
+        return json.loads(conn.getresponse().read())
+    except OSError:
+        return None
+    finally:
+        conn.close()
+
+
+# ----------------------------------------------------------------------
+# Generador de carga
+# ----------------------------------------------------------------------
+
+BENCH_QUERIES = [
+    '/kpis/digital', '/kpis/digital?channel=Google', '/kpis/digital?start=2023-06-01&end=2023-12-31',
+    '/kpis/telco', '/kpis/telco?contract=Month-to-month', '/kpis/telco?internet_service=Fiber%20optic',
+    '/kpis/airlines', '/kpis/airlines?airline=Vistara', '/kpis/airlines?class=Business&limit=20',
+    '/kpis/retail', '/kpis/retail?category=Electronics', '/kpis/retail?gender=Female',
+    '/kpis/fraud', '/kpis/fraud?by=country', '/kpis/fraud?by=merchant_category',
+    '/kpis/fraud?by=hour&country=USA', '/kpis/fraud?by=channel',
+]
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def load_test(port, requests=2000, concurrency=8, queries=None, seed=42):
+    """
+    Peticiones concurrentes con conexiones keep-alive. Las rutas se eligen con una
+    distribución Zipf (pocas rutas concentran la mayoría de las peticiones, como en un dashboard)
+    """
+    queries = [q for q in (queries or BENCH_QUERIES)]
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+    plan = rng.choices(queries, weights=weights, k=requests)
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(paths):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local = []
+        for path in paths:
+            start = time.perf_counter()
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            local.append(time.perf_counter() - start)
+            if response.status != 200:
+                with lock:
+                    errors.append(f"{path}: {response.status}")
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(plan[i::concurrency],)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': round(elapsed, 2),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def benchmark(data_dir='.', db_path=None, requests=2000, concurrency=8):
+    """Latencia y throughput del servicio sin caché vs con caché LRU/TTL + coalescing"""
+    results = {}
+    for mode, cache_size in [('sin caché', 0), ('con caché', KPI_CACHE_SIZE)]:
+        service = KPIService(data_dir, db_path, cache_size=cache_size)
+        service.warm()
+        queries = [q for q in BENCH_QUERIES if service._sources(urlsplit(q).path.split('/')[2])]
+        server = start_server(service, port=0)
+        try:
+            results[mode] = load_test(server.server_port, requests, concurrency, queries)
+            results[mode]['cache'] = service.cache.summary()
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.store.close()
+
+    print("\n" + "="*80)
+    print(f"📊 KPI service: {requests:,} peticiones, {concurrency} clientes concurrentes")
+    for mode, result in results.items():
+        print(f"   {mode}: {result['rps']:,.1f} req/s | p50 {result['p50_ms']} ms | p95 {result['p95_ms']} ms | "
+              f"p99 {result['p99_ms']} ms | errores {result['errors']}")
+        if result['cache']['maxsize']:
+            cache = result['cache']
+            print(f"      caché: {cache['hits']:,} hits, {cache['coalesced']:,} coalesced, "
+                  f"{cache['misses']:,} misses (hit rate {cache['hit_rate']:.1%})")
+    return results
+
+
+def _option(args, name, default=None):
+    if name in args:
+        index = args.index(name)
+        value = args[index + 1]
+        del args[index:index + 2]
+        return value
+    return default
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    data_dir = _option(args, '--data-dir', '.')
+    db_path = _option(args, '--db')
+    port = int(_option(args, '--port', KPI_SERVICE_PORT))
+    requests = int(_option(args, '--requests', 2000))
+    concurrency = int(_option(args, '--concurrency', 8))
+    command = args[0] if args else 'serve'
+
+    if command == 'serve':
+        serve(data_dir, db_path, port)
+    elif command == 'bench':
+        benchmark(data_dir, db_path, requests, concurrency)
+    elif command == 'invalidate':
+        print(notify_invalidate(args[1:] or None, port=port))
+    else:
+        print(__doc__)
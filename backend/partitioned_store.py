@@ -0,0 +1,204 @@
+"""
+Dataset particionado estilo Hive (date=YYYY-MM-DD/country=XX/part-0.csv)
+Un manifest.json en la raíz guarda por partición sus valores, filas, bytes y min/max de
+las columnas numéricas, de modo que los lectores cargan solo las particiones que
+necesitan (pruning) y reprocesar un día reescribe solo esa partición.
+"""
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import quote
+
+import pandas as pd
+
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_SCHEMA_VERSION = 1
+PART_FILE = 'part-0.csv'
+# Igual que Hive: las filas con clave nula van a una partición propia
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+
+def _partition_path(partition_by, values):
+    return '/'.join(f"{col}={quote(str(value), safe='')}" for col, value in zip(partition_by, values))
+
+
+def _atomic_write_text(path, text):
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def _column_stats(df, columns):
+    stats = {}
+    for col in columns:
+        values = df[col].dropna()
+        if len(values):
+            stats[col] = {'min': values.min().item(), 'max': values.max().item()}
+    return stats
+
+
+def load_manifest(root):
+    path = Path(root) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_partitions(df, root, partition_by=('date',), stats_columns=None, replace_all=False):
+    """
+    Escribe df particionado por `partition_by` y actualiza el manifest.
+    Solo se reescriben las particiones presentes en df; con replace_all=True además
+    se eliminan las que ya no existen (reconstrucción completa).
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    partition_by = list(partition_by)
+
+    manifest = load_manifest(root)
+    if manifest is None or manifest['partition_by'] != partition_by:
+        if manifest is not None:
+            print(f"   ⚠️  Cambió el particionado ({manifest['partition_by']} → {partition_by}): se reconstruye {root}")
+            replace_all = True
+        manifest = {'schemaVersion': MANIFEST_SCHEMA_VERSION, 'partition_by': partition_by, 'partitions': {}}
+
+    data_columns = [col for col in df.columns if col not in partition_by]
+    if stats_columns is None:
+        stats_columns = [col for col in data_columns if pd.api.types.is_numeric_dtype(df[col])]
+
+    written = set()
+    now = datetime.now().isoformat()
+    # Las claves de partición se escriben como texto (fechas en ISO)
+    keys = df[partition_by].astype(object)
+    keys = keys.where(keys.notna(), NULL_PARTITION).astype(str)
+    for values, part in df.groupby([keys[col] for col in partition_by], sort=True):
+        values = values if isinstance(values, tuple) else (values,)
+        relative = _partition_path(partition_by, values)
+        part_dir = root / relative
+        part_dir.mkdir(parents=True, exist_ok=True)
+
+        file_path = part_dir / PART_FILE
+        tmp_path = part_dir / (PART_FILE + '.tmp')
+        part[data_columns].to_csv(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+
+        manifest['partitions'][relative] = {
+            'path': f"{relative}/{PART_FILE}",
+            'values': dict(zip(partition_by, values)),
+            'rows': int(len(part)),
+            'bytes': file_path.stat().st_size,
+            'stats': _column_stats(part, stats_columns),
+            'written_at': now,
+        }
+        written.add(relative)
+
+    if replace_all:
+        for relative in set(manifest['partitions']) - written:
+            del manifest['partitions'][relative]
+        # Archivos huérfanos (particiones de una corrida anterior) y directorios que quedan vacíos
+        for file_path in root.rglob(PART_FILE):
+            if file_path.parent.relative_to(root).as_posix() not in manifest['partitions']:
+                file_path.unlink()
+        for directory in sorted((p for p in root.rglob('*') if p.is_dir()), key=lambda p: len(p.parts), reverse=True):
+            if not any(directory.iterdir()):
+                directory.rmdir()
+
+    manifest['columns'] = list(df.columns)
+    manifest['total_rows'] = sum(entry['rows'] for entry in manifest['partitions'].values())
+    manifest['updated_at'] = now
+    _atomic_write_text(root / MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False))
+
+    print(f"   ✅ {root}: {len(written)} particiones escritas, {len(manifest['partitions'])} en total")
+    return manifest
+
+
+def _matches(value, condition):
+    """condition: escalar, lista/conjunto de valores o tupla (desde, hasta) inclusiva"""
+    if isinstance(condition, tuple):
+        low, high = condition
+        return (low is None or value >= str(low)) and (high is None or value <= str(high))
+    if isinstance(condition, (list, set, frozenset)):
+        return value in {str(item) for item in condition}
+    return value == str(condition)
+
+
+def _overlaps(stats, condition):
+    if stats is None:
+        return True
+    low, high = condition
+    return (low is None or stats['max'] >= low) and (high is None or stats['min'] <= high)
+
+
+def select_partitions(manifest, filters=None, stats_filters=None):
+    """
+    Devuelve las entradas del manifest que pueden contener filas que cumplen los filtros.
+    filters: {columna_de_partición: valor | [valores] | (desde, hasta)}
+    stats_filters: {columna_numérica: (desde, hasta)}, descarta por min/max
+    """
+    filters = filters or {}
+    stats_filters = stats_filters or {}
+    selected = []
+    for entry in manifest['partitions'].values():
+        if not all(_matches(entry['values'][col], cond) for col, cond in filters.items()):
+            continue
+        if not all(_overlaps(entry['stats'].get(col), cond) for col, cond in stats_filters.items()):
+            continue
+        selected.append(entry)
+    return sorted(selected, key=lambda entry: entry['path'])
+
+
+def iter_partitions(root, filters=None, stats_filters=None, columns=None, chunksize=None):
+    """Itera (entrada, DataFrame) por partición seleccionada, con las columnas de partición restauradas"""
+    root = Path(root)
+    manifest = load_manifest(root)
+    if manifest is None:
+        raise FileNotFoundError(f"No hay {MANIFEST_NAME} en {root}")
+
+    partition_by = manifest['partition_by']
+    ordered = [col for col in manifest['columns'] if columns is None or col in columns]
+    usecols = None if columns is None else [col for col in columns if col not in partition_by]
+    for entry in select_partitions(manifest, filters, stats_filters):
+        reader = pd.read_csv(root / entry['path'], usecols=usecols, chunksize=chunksize, low_memory=False)
+        for chunk in ([reader] if chunksize is None else reader):
+            for col in partition_by:
+                if columns is None or col in columns:
+                    value = entry['values'][col]
+                    chunk[col] = None if value == NULL_PARTITION else value
+            yield entry, chunk[ordered]
+
+
+def read_partitions(root, filters=None, stats_filters=None, columns=None):
+    """Carga en un solo DataFrame solo las particiones seleccionadas"""
+    frames = [chunk for _, chunk in iter_partitions(root, filters, stats_filters, columns)]
+    if not frames:
+        manifest = load_manifest(root)
+        return pd.DataFrame(columns=columns or manifest.get('columns', []))
+    return pd.concat(frames, ignore_index=True)
+
+
+def is_partitioned(path):
+    path = Path(path)
+    return path.is_dir() and (path / MANIFEST_NAME).exists()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python partitioned_store.py <directorio> [desde] [hasta] -> particiones seleccionadas por fecha
+    root = sys.argv[1] if len(sys.argv) > 1 else 'processed_fraud_transactions'
+    manifest = load_manifest(root)
+    if manifest is None:
+        print(f"❌ No hay {MANIFEST_NAME} en {root}")
+        sys.exit(1)
+
+    filters = {}
+    if len(sys.argv) > 2:
+        filters['date'] = (sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    selected = select_partitions(manifest, filters)
+    rows = sum(entry['rows'] for entry in selected)
+    print(f"📂 {root}: particionado por {manifest['partition_by']}, {manifest['total_rows']:,} registros")
+    print(f"   Seleccionadas: {len(selected)}/{len(manifest['partitions'])} particiones, {rows:,} registros")
+    for entry in selected[:20]:
+        print(f"   - {entry['path']}: {entry['rows']:,} registros")
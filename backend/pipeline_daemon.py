@@ -0,0 +1,398 @@
+"""
+Daemon del pipeline: datasets y cliente de Supabase en memoria, trabajos por un endpoint local
+Evita pagar en cada paso el arranque de Python, los imports, la conexión y la recarga de CSV.
+Los trabajos independientes corren en paralelo; los que tocan las mismas tablas se serializan.
+
+    python pipeline_daemon.py serve [--port 8765 | --socket /tmp/pipeline.sock]
+    python pipeline_daemon.py submit <tipo> ['{"param": ...}'] [--wait]
+    python pipeline_daemon.py status [job_id]
+    python pipeline_daemon.py shutdown
+
+Tipos de trabajo:
+    refresh    {"tables": [...]}                      recarga datasets procesados en memoria
+    process    {"domain": "retail|airlines|telco|fraud", "sample": n, "dates": ["YYYY-MM-DD"] (solo fraud)}
+    recompute  {"target": "snapshots", "dashboards": [...]} | {"target": "series", "series": [...]}
+               | {"target": "ranges", "indexes": [...]} | {"target": "digital_kpis"} | {"target": "anomalies"}
+    upload     {"tables": [...]}                      upsert desde los datasets en memoria
+    reconcile  {"tables": [...], "repair": false}     verify_upload por fingerprints
+"""
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import pandas as pd
+
+from analytics_store import COLUMN_MAPPINGS, TABLE_SOURCES
+from kpi_service import notify_invalidate
+from upload_reconciliation import RECONCILE_SPECS
+
+
+DEFAULT_PORT = 8765
+DOMAIN_TABLES = {
+    domain: [table for table in TABLE_SOURCES if table.startswith(domain)] + ['top_k_rankings']
+    for domain in ('retail', 'airlines', 'telco', 'fraud')
+}
+SNAPSHOT_TABLES = {
+    'airlines': ['airlines_flights', 'airlines_route_kpis'],
+    'fraud': ['fraud_transactions', 'fraud_daily_kpis', 'fraud_merchant_kpis', 'fraud_country_kpis',
+              'fraud_hourly_patterns'],
+    'telco': ['telco_customers', 'telco_segment_kpis'],
+    'digital': ['digital_performance_data'],
+    'retail': ['retail_transactions'],
+}
+
+
+class WarmDatasets:
+    """CSV procesados en memoria; se recargan solo si cambia el mtime del archivo"""
+
+    def __init__(self, data_dir='.'):
+        self.data_dir = Path(data_dir)
+        self.frames = {}
+        self.lock = threading.Lock()
+
+    def _load(self, path):
+        mtime = path.stat().st_mtime_ns
+        with self.lock:
+            cached = self.frames.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        df = pd.read_csv(path, low_memory=False)
+        with self.lock:
+            self.frames[path] = (mtime, df)
+        return df
+
+    def file(self, path):
+        """Copia del CSV (los consumidores pueden modificarla)"""
+        return self._load(Path(path)).copy()
+
+    def table(self, table):
+        paths = [self.data_dir / name for name in TABLE_SOURCES[table] if (self.data_dir / name).exists()]
+        if not paths:
+            return None
+        df = pd.concat([self._load(path) for path in paths], ignore_index=True)
+        return df.rename(columns=COLUMN_MAPPINGS.get(table, {}))
+
+    def refresh(self, tables=None):
+        loaded = {}
+        for table in tables or TABLE_SOURCES:
+            df = self.table(table)
+            if df is not None:
+                loaded[table] = len(df)
+        return loaded
+
+    def summary(self):
+        with self.lock:
+            return {path.name: len(df) for path, (_, df) in self.frames.items()}
+
+
+class PipelineDaemon:
+    def __init__(self, data_dir='.', workers=4):
+        self.datasets = WarmDatasets(data_dir)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+        self.resource_locks = {}
+        self._uploader = None
+        self._uploader_lock = threading.Lock()
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+
+    @property
+    def uploader(self):
+        # Se crea una sola vez: el cliente y el transporte quedan calientes entre trabajos
+        with self._uploader_lock:
+            if self._uploader is None:
+                from upload_to_supabase import SupabaseUploader
+                self._uploader = SupabaseUploader()
+            return self._uploader
+
+    # ------------------------------------------------------------------
+    # Trabajos
+    # ------------------------------------------------------------------
+
+    def _resources(self, job_type, params):
+        if job_type == 'process':
+            return DOMAIN_TABLES[params['domain']]
+        if job_type == 'recompute' and params.get('target', 'snapshots') == 'snapshots':
+            dashboards = params.get('dashboards') or list(SNAPSHOT_TABLES)
+            return [table for dashboard in dashboards for table in SNAPSHOT_TABLES[dashboard]] + ['snapshots']
+        if job_type == 'recompute' and params.get('target') in ('series', 'ranges'):
+            return ['snapshots']
+        if job_type == 'recompute' and params.get('target') == 'anomalies':
+            return ['kpi_anomaly_alerts']
+        if job_type == 'recompute':
+            return ['digital_performance_kpis']
+        return list(params.get('tables') or TABLE_SOURCES)
+
+    def _run_refresh(self, params):
+        return self.datasets.refresh(params.get('tables'))
+
+    def _run_process(self, params):
+        domain = params['domain']
+        if domain == 'retail':
+            from process_retail import RetailProcessor
+            RetailProcessor().run_full_analysis()
+        elif domain == 'airlines':
+            from process_airlines import AirlinesProcessor
+            AirlinesProcessor().run_full_analysis()
+        elif domain == 'telco':
+            from process_telco import TelcoProcessor
+            TelcoProcessor().run_full_analysis()
+        elif domain == 'fraud':
+            from compact_fraud_data import FraudDataCompactor
+            FraudDataCompactor().run_compaction(sample_for_testing=params.get('sample'), dates=params.get('dates'))
+        else:
+            raise ValueError(f"Dominio desconocido: {domain}")
+        # Si el servicio de KPIs está corriendo, descarta ya la caché del dashboard
+        notify_invalidate([domain])
+        return self.datasets.refresh(DOMAIN_TABLES[domain])
+
+    def _run_recompute(self, params):
+        target = params.get('target', 'snapshots')
+        from dashboard_snapshots import SNAPSHOT_DIR, export_snapshots
+        if target == 'snapshots':
+            manifest = export_snapshots(self.datasets.data_dir, params.get('output_dir', SNAPSHOT_DIR),
+                                        dashboards=params.get('dashboards'), loader=self.datasets.file)
+            return {name: entry['file'] for name, entry in manifest['dashboards'].items()}
+        if target == 'series':
+            from time_series import export_series
+            manifest = export_series(self.datasets.data_dir, params.get('output_dir', SNAPSHOT_DIR),
+                                     series=params.get('series'), loader=self.datasets.file)
+            return {name: sorted(entry['resolutions']) for name, entry in manifest['series'].items()}
+        if target == 'ranges':
+            from range_index import build_indexes
+            indexes = build_indexes(self.datasets.data_dir, output_dir=params.get('output_dir', SNAPSHOT_DIR),
+                                    names=params.get('indexes'), loader=self.datasets.file)
+            return {name: {'start': str(index.start), 'days': index.days} for name, index in indexes.items()}
+        if target == 'anomalies':
+            from kpi_anomalies import run_detection
+            alerts = run_detection(self.datasets.data_dir)
+            return {'alerts': 0 if alerts is None else len(alerts)}
+        if target == 'digital_kpis':
+            return {'ok': bool(self.uploader.calculate_and_upload_digital_kpis())}
+        raise ValueError(f"Objetivo desconocido: {target}")
+
+    def _run_upload(self, params):
+        uploaded = {}
+        for table in params.get('tables') or []:
+            df = self.datasets.table(table)
+            if df is None:
+                uploaded[table] = 'sin archivos locales'
+                continue
+            conflict = RECONCILE_SPECS.get(table, {}).get('conflict')
+            total, errors = self.uploader.upload_data(df, table, on_conflict=conflict)
+            uploaded[table] = {'rows': total, 'errors': len(errors)}
+        return uploaded
+
+    def _run_reconcile(self, params):
+        results = self.uploader.verify_upload(params.get('tables'), repair=params.get('repair', False))
+        return {table: {'mismatches': len(result['mismatches']), 'error': result['error']}
+                for table, result in results.items()}
+
+    def submit(self, job_type, params=None):
+        handler = getattr(self, f'_run_{job_type}', None)
+        if handler is None:
+            raise ValueError(f"Tipo de trabajo desconocido: {job_type}")
+        params = params or {}
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'type': job_type,
+            'params': params,
+            'state': 'queued',
+            'submitted_at': datetime.now().isoformat(timespec='seconds'),
+            'resources': sorted(set(self._resources(job_type, params))),
+        }
+        with self.jobs_lock:
+            self.jobs[job['id']] = job
+        self.executor.submit(self._execute, job, handler)
+        return job
+
+    def _execute(self, job, handler):
+        # Locks por tabla en orden fijo: trabajos sobre tablas distintas corren en paralelo
+        with self.jobs_lock:
+            locks = [self.resource_locks.setdefault(name, threading.Lock()) for name in job['resources']]
+        for lock in locks:
+            lock.acquire()
+        start = time.perf_counter()
+        job['state'] = 'running'
+        job['started_at'] = datetime.now().isoformat(timespec='seconds')
+        try:
+            job['result'] = handler(job['params'])
+            job['state'] = 'done'
+        except Exception as e:
+            job['state'] = 'failed'
+            job['error'] = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+            job['duration_s'] = round(time.perf_counter() - start, 3)
+            print(f"   {'✅' if job['state'] == 'done' else '❌'} {job['type']} {job['id']}: "
+                  f"{job['state']} ({job['duration_s']}s)")
+
+    def status(self):
+        with self.jobs_lock:
+            jobs = list(self.jobs.values())
+        states = pd.Series([job['state'] for job in jobs], dtype=object).value_counts().to_dict()
+        return {
+            'pid': os.getpid(),
+            'started_at': self.started_at,
+            'datasets': self.datasets.summary(),
+            'jobs': {state: int(count) for state, count in states.items()},
+        }
+
+
+# ----------------------------------------------------------------------
+# Endpoint local (HTTP en localhost o socket Unix)
+# ----------------------------------------------------------------------
+
+def _make_handler(daemon, server_ref):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = [part for part in self.path.split('/') if part]
+            if parts == ['status']:
+                return self._send(200, daemon.status())
+            if parts == ['jobs']:
+                with daemon.jobs_lock:
+                    return self._send(200, list(daemon.jobs.values()))
+            if len(parts) == 2 and parts[0] == 'jobs':
+                job = daemon.jobs.get(parts[1])
+                return self._send(200, job) if job else self._send(404, {'error': 'job no encontrado'})
+            self._send(404, {'error': 'ruta desconocida'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if self.path == '/jobs':
+                try:
+                    return self._send(202, daemon.submit(payload.get('type'), payload.get('params')))
+                except (ValueError, KeyError) as e:
+                    return self._send(400, {'error': str(e)})
+            if self.path == '/shutdown':
+                self._send(200, {'ok': True})
+                threading.Thread(target=server_ref[0].shutdown, daemon=True).start()
+                return
+            self._send(404, {'error': 'ruta desconocida'})
+
+        def address_string(self):
+            return 'unix' if isinstance(self.client_address, str) else self.client_address[0]
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ''
+
+
+def serve(data_dir='.', port=DEFAULT_PORT, socket_path=None, workers=4):
+    daemon = PipelineDaemon(data_dir, workers)
+    server_ref = []
+    handler = _make_handler(daemon, server_ref)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, handler)
+        where = socket_path
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        where = f"http://127.0.0.1:{port}"
+    server_ref.append(server)
+
+    print("="*80)
+    print(f"🛰️  PIPELINE DAEMON escuchando en {where} (pid {os.getpid()})")
+    print("="*80)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.executor.shutdown(wait=False, cancel_futures=True)
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+    print("👋 Daemon detenido")
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path):
+        super().__init__('localhost')
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def request(method, path, payload=None, port=DEFAULT_PORT, socket_path=None):
+    """Cliente mínimo del daemon; devuelve el JSON de respuesta"""
+    conn = _UnixHTTPConnection(socket_path) if socket_path else http.client.HTTPConnection('127.0.0.1', port)
+    body = json.dumps(payload).encode('utf-8') if payload is not None else None
+    headers = {'Content-Type': 'application/json'} if body else {}
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def _option(args, name, default=None):
+    if name in args:
+        index = args.index(name)
+        value = args[index + 1]
+        del args[index:index + 2]
+        return value
+    return default
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    socket_path = _option(args, '--socket')
+    port = int(_option(args, '--port', DEFAULT_PORT))
+    wait = '--wait' in args
+    args = [arg for arg in args if arg != '--wait']
+    command = args[0] if args else 'serve'
+    client = {'port': port, 'socket_path': socket_path}
+
+    if command == 'serve':
+        serve(port=port, socket_path=socket_path, workers=int(_option(args, '--workers', 4)))
+    elif command == 'submit':
+        params = json.loads(args[2]) if len(args) > 2 else {}
+        job = request('POST', '/jobs', {'type': args[1], 'params': params}, **client)
+        while wait and job.get('state') in ('queued', 'running'):
+            time.sleep(0.2)
+            job = request('GET', f"/jobs/{job['id']}", **client)
+        print(json.dumps(job, indent=2, ensure_ascii=False))
+    elif command == 'status':
+        path = f"/jobs/{args[1]}" if len(args) > 1 else '/status'
+        print(json.dumps(request('GET', path, **client), indent=2, ensure_ascii=False))
+    elif command == 'shutdown':
+        print(request('POST', '/shutdown', {}, **client))
+    else:
+        print(__doc__)
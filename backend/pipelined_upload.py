@@ -0,0 +1,276 @@
+"""
+Procesamiento y carga solapados
+Hasta ahora compact_fraud_data.py escribía processed_fraud_transactions.csv completo y recién
+después upload_fraud_data lo volvía a leer y subía lote a lote: tiempo total = proceso + subida.
+PipelinedUploader recibe los DataFrames a medida que el procesador los produce y los sube en
+segundo plano con tres etapas:
+
+  procesador (hilo principal) --submit()--> cola de tablas --> preparación (hilo): dedup,
+  registros, JSON y compresión --> cola acotada de lotes --> envío (hilo): POST a PostgREST
+
+La cola de lotes es acotada: si la red se atrasa, la preparación se bloquea (y con ella, cuando
+se llena la cola de tablas, el procesador), de modo que la memoria no crece sin límite. El tiempo
+total se acerca a max(proceso, subida). Con write_transactions=False no se escribe el CSV
+intermedio de transacciones.
+
+    python pipelined_upload.py fraud [--no-files] [--engine duckdb] [--sample N]
+    python pipelined_upload.py bench [csv] [filas] [latencia_ms]   -> secuencial vs solapado (mock)
+"""
+import os
+import queue
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from analytics_store import COLUMN_MAPPINGS
+from upload_dedup import SKIP_UNCHANGED, UploadDeduplicator
+from upload_reconciliation import RECONCILE_SPECS
+
+
+# Lotes preparados en espera de envío (cada uno ocupa batch_size registros en memoria)
+UPLOAD_QUEUE_BATCHES = int(os.getenv('UPLOAD_QUEUE_BATCHES', '4'))
+# Tablas entregadas por el procesador y aún no preparadas
+UPLOAD_QUEUE_TABLES = 16
+FRAUD_BOOL_COLUMNS = ['card_present', 'distance_from_home', 'high_risk_merchant', 'is_fraud', 'is_weekend']
+
+
+def prepare_upload_frame(df, table_name):
+    """Mapeo de columnas de la tabla y booleanos de fraud_transactions como 0/1"""
+    if table_name in COLUMN_MAPPINGS:
+        df = df.rename(columns=COLUMN_MAPPINGS[table_name])
+
+    if table_name == 'fraud_transactions':
+        df = df.copy()
+        for col in FRAUD_BOOL_COLUMNS:
+            if col in df.columns:
+                # Manejar strings, Python bools, y números
+                df[col] = df[col].replace({
+                    'true': 1, 'false': 0, 'True': 1, 'False': 0,
+                    True: 1, False: 0, '1': 1, '0': 0
+                })
+                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    return df
+
+
+def frame_to_records(df):
+    """Lista de dicts para el upsert, con NaN como None (Supabase no acepta NaN)"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def conflict_columns(df, table_name, on_conflict=None):
+    """Columnas de la clave única de la tabla, si están en el DataFrame"""
+    conflict = on_conflict or RECONCILE_SPECS.get(table_name, {}).get('conflict')
+    if conflict and set(conflict.split(',')) <= set(df.columns):
+        return conflict.split(',')
+    return None
+
+
+class PipelinedUploader:
+    def __init__(self, transport, max_batches=UPLOAD_QUEUE_BATCHES, max_tables=UPLOAD_QUEUE_TABLES,
+                 skip_unchanged=SKIP_UNCHANGED, dedup_dir=None):
+        self.transport = transport
+        self.skip_unchanged = skip_unchanged
+        self.dedup_dir = dedup_dir
+        self.tables = queue.Queue(maxsize=max_tables)
+        self.batches = queue.Queue(maxsize=max_batches)
+        self.results = {}
+        self.stats = {'producer_wait': 0.0, 'prepare_wait': 0.0, 'prepare_seconds': 0.0, 'send_seconds': 0.0}
+        self._threads = []
+        self._started = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._threads = [threading.Thread(target=self._prepare_loop, name='upload-prepare', daemon=True),
+                         threading.Thread(target=self._send_loop, name='upload-send', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def submit(self, df, table_name, batch_size=5000, on_conflict=None):
+        """Entrega una tabla para subir; vuelve enseguida salvo que la cola de tablas esté llena"""
+        start = time.perf_counter()
+        self.tables.put((df, table_name, batch_size, on_conflict))
+        self.stats['producer_wait'] += time.perf_counter() - start
+
+    def _prepare_loop(self):
+        while True:
+            item = self.tables.get()
+            if item is None:
+                self._put_batch(None)
+                return
+            df, table_name, batch_size, on_conflict = item
+            result = self.results.setdefault(table_name, {'rows': 0, 'uploaded': 0, 'errors': []})
+            try:
+                start = time.perf_counter()
+                df = prepare_upload_frame(df, table_name)
+                # Deduplicar por la clave única y hacer el upsert sobre ella: una clave repetida
+                # haría fallar el lote completo
+                dedup = None
+                key_columns = conflict_columns(df, table_name, on_conflict)
+                if key_columns:
+                    on_conflict = ','.join(key_columns)
+                    kwargs = {'directory': self.dedup_dir} if self.dedup_dir else {}
+                    dedup = UploadDeduplicator(table_name, key_columns, **kwargs)
+                    df = dedup.filter(df, skip_unchanged=self.skip_unchanged)
+                result['rows'] += len(df)
+                self.stats['prepare_seconds'] += time.perf_counter() - start
+
+                for i in range(0, len(df), batch_size):
+                    start = time.perf_counter()
+                    chunk = df.iloc[i:i + batch_size]
+                    batch = self.transport.prepare(table_name, frame_to_records(chunk), on_conflict=on_conflict)
+                    self.stats['prepare_seconds'] += time.perf_counter() - start
+                    self._put_batch((batch, chunk if dedup is not None else None, dedup, result))
+                # Fin de la tabla: el hilo de envío guarda los hashes enviados
+                self._put_batch((None, None, dedup, result))
+            except Exception as e:
+                result['errors'].append(f"Error preparando {table_name}: {e}")
+                print(f"   ❌ Error preparando {table_name}: {e}")
+
+    def _put_batch(self, item):
+        start = time.perf_counter()
+        self.batches.put(item)
+        self.stats['prepare_wait'] += time.perf_counter() - start
+
+    def _send_loop(self):
+        while True:
+            item = self.batches.get()
+            if item is None:
+                return
+            batch, chunk, dedup, result = item
+            if batch is None:
+                # Fin de la tabla: un error al guardar los hashes no debe matar el hilo de envío
+                # (la preparación quedaría bloqueada en la cola acotada y close() no volvería)
+                if dedup is not None:
+                    try:
+                        dedup.report()
+                        dedup.save()
+                    except Exception as e:
+                        error_msg = f"Error guardando hashes de dedup de {dedup.table}: {e}"
+                        result['errors'].append(error_msg)
+                        print(f"   ❌ {error_msg}")
+                continue
+            start = time.perf_counter()
+            try:
+                self.transport.send(batch)
+                result['uploaded'] += batch['rows']
+                if dedup is not None:
+                    dedup.mark_sent(chunk)
+            except Exception as e:
+                error_msg = f"Error en lote de {batch['table']}: {e}"
+                result['errors'].append(error_msg)
+                print(f"   ❌ {error_msg}")
+            self.stats['send_seconds'] += time.perf_counter() - start
+
+    def close(self):
+        """Espera a que se envíe todo lo entregado y devuelve {tabla: filas, subidas, errores}"""
+        self.tables.put(None)
+        for thread in self._threads:
+            thread.join()
+
+        stats = self.stats
+        elapsed = time.perf_counter() - self._started
+        print(f"\n📤 Carga solapada: {sum(r['uploaded'] for r in self.results.values()):,} filas en "
+              f"{len(self.results)} tablas")
+        print(f"   ⏱️  {elapsed:.1f}s desde el inicio | envío {stats['send_seconds']:.1f}s | "
+              f"preparación {stats['prepare_seconds']:.1f}s | esperas por backpressure: "
+              f"preparación {stats['prepare_wait']:.1f}s, procesador {stats['producer_wait']:.1f}s")
+        for table, result in self.results.items():
+            if result['errors']:
+                print(f"   ⚠️  {table}: {len(result['errors'])} errores")
+        return self.results
+
+
+def run_fraud_pipeline(transport, write_transactions=True, engine=None, sample=None, **kwargs):
+    """Compactación de fraude con la subida solapada (reemplaza compactar + upload_fraud_data)"""
+    from compact_fraud_data import FraudDataCompactor
+
+    compactor = FraudDataCompactor(engine=engine, **kwargs)
+    with PipelinedUploader(transport) as uploader:
+        compactor.run_compaction(sample_for_testing=sample, uploader=uploader,
+                                 write_transactions=write_transactions)
+    transport.summary()
+    return uploader.results
+
+
+def benchmark(csv_path='synthetic_fraud_data.csv', rows=None, latency_ms=50):
+    """Compactación + subida secuencial vs solapada contra un servidor mock con latencia por lote"""
+    import tempfile
+    from compact_fraud_data import FraudDataCompactor
+    from id_maps import FRAUD_DIMENSIONS
+    from source_cache import CACHE_DIR
+    from supabase_transport import SupabaseTransport, _start_mock_server
+
+    csv_path, cache_dir = os.path.abspath(csv_path), os.path.abspath(CACHE_DIR)
+    fraud_tables = [('processed_fraud_transactions.csv', 'fraud_transactions', 10000, None)] + \
+        [(f'processed_{table}.csv', table, 10000, 'id') for _, table in FRAUD_DIMENSIONS.values()] + \
+        [(f'processed_fraud_{name}.csv', f'fraud_{name}', 5000, None)
+         for name in ['daily_kpis', 'merchant_kpis', 'country_kpis', 'hourly_patterns']] + \
+        [('processed_fraud_top_k.csv', 'top_k_rankings', 5000, None)]
+    timings = {}
+
+    for mode in ['secuencial', 'solapado']:
+        server, received = _start_mock_server(delay=latency_ms / 1000)
+        transport = SupabaseTransport(f'http://127.0.0.1:{server.server_port}', 'mock-key', http2=False)
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            start = time.perf_counter()
+            try:
+                compactor = FraudDataCompactor(csv_path=csv_path, id_map_dir='id_maps')
+                compactor.engine.cache_dir = cache_dir
+                if mode == 'secuencial':
+                    compactor.run_compaction(sample_for_testing=rows)
+                    processed = time.perf_counter() - start
+                    # Igual que upload_fraud_data: releer los CSV y subir lote a lote
+                    for path, table, batch_size, on_conflict in fraud_tables:
+                        df = prepare_upload_frame(pd.read_csv(path), table)
+                        key_columns = conflict_columns(df, table, on_conflict)
+                        if key_columns:
+                            on_conflict = ','.join(key_columns)
+                            df = UploadDeduplicator(table, key_columns, persist=False).filter(df)
+                        records = frame_to_records(df)
+                        for i in range(0, len(records), batch_size):
+                            transport.upsert(table, records[i:i + batch_size], on_conflict=on_conflict)
+                else:
+                    with PipelinedUploader(transport, dedup_dir=os.path.join(workdir, '.upload_dedup')) as uploader:
+                        compactor.run_compaction(sample_for_testing=rows, uploader=uploader, write_transactions=False)
+                        processed = time.perf_counter() - start
+            finally:
+                os.chdir(cwd)
+        timings[mode] = (processed, time.perf_counter() - start, received['rows'])
+        transport.close()
+        server.shutdown()
+
+    print("\n" + "="*80)
+    print(f"📊 Proceso + subida ({latency_ms} ms por lote en el servidor mock)")
+    for mode, (processed, total, uploaded) in timings.items():
+        print(f"   {mode}: proceso {processed:.1f}s, total {total:.1f}s ({uploaded:,} filas recibidas)")
+    return timings
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else 'fraud'
+
+    if command == 'bench':
+        benchmark(args[1] if len(args) > 1 else 'synthetic_fraud_data.csv',
+                  int(args[2]) if len(args) > 2 else None,
+                  float(args[3]) if len(args) > 3 else 50)
+    else:
+        from dotenv import load_dotenv
+        from supabase_transport import get_transport
+
+        load_dotenv()
+        sample = int(args[args.index('--sample') + 1]) if '--sample' in args else None
+        engine = args[args.index('--engine') + 1] if '--engine' in args else None
+        run_fraud_pipeline(get_transport(), write_transactions='--no-files' not in args, engine=engine,
+                           sample=sample)
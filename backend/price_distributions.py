@@ -0,0 +1,88 @@
+"""
+Histogramas y cuantiles de precios por grupo (ruta, aerolínea, clase, ventana de reserva)
+Un solo sort de una clave compuesta (grupo + valor) y searchsorted para todos los grupos a la vez
+"""
+import numpy as np
+
+
+def log_bin_edges(values, bins=20):
+    """Bordes fijos log-espaciados sobre el rango global (comparables entre grupos)"""
+    values = values[np.isfinite(values) & (values > 0)]
+    return np.geomspace(values.min(), values.max(), bins + 1)
+
+
+def grouped_distributions(df, group_cols, measure, bins=20, quantiles=(0.1, 0.5, 0.9), edges=None):
+    """
+    Devuelve (tabla de cuantiles, tabla de histograma) para `measure` en cada grupo.
+
+    La clave compuesta es `código_grupo + posición_normalizada_en_log(valor)`, de modo que
+    un único argsort deja cada grupo contiguo y ordenado; los bordes de todos los
+    histogramas y las posiciones de los cuantiles se resuelven con aritmética de índices
+    y un searchsorted vectorizado.
+    """
+    grouper = df.groupby(group_cols, observed=True, sort=True)
+    keys = grouper.size().reset_index()[group_cols]
+    n_groups = len(keys)
+
+    values = df[measure].to_numpy(dtype=np.float64)
+    group = grouper.ngroup().to_numpy()
+
+    valid = np.isfinite(values) & (values > 0) & (group >= 0)
+    values, group = values[valid], group[valid]
+
+    if edges is None:
+        edges = log_bin_edges(values, bins)
+    bins = len(edges) - 1
+
+    lo, hi = np.log(edges[0]), np.log(edges[-1])
+    u = np.clip((np.log(values) - lo) / (hi - lo), 0.0, 1.0) * (1 - 1e-9)
+    composite = group + u
+
+    order = np.argsort(composite, kind='stable')
+    composite = composite[order]
+    sorted_values = values[order]
+
+    counts = np.bincount(group, minlength=n_groups)
+    start = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    # Histogramas: posición de cada borde de cada grupo en el array ordenado
+    edges_u = (np.log(edges) - lo) / (hi - lo) * (1 - 1e-9)
+    edges_u[-1] = 1.0
+    boundaries = np.searchsorted(composite, np.arange(n_groups)[:, None] + edges_u[None, :], side='left')
+    hist = np.diff(boundaries, axis=1)
+
+    # Cuantiles con interpolación lineal dentro de cada grupo
+    q = np.asarray(quantiles)
+    safe_start = np.minimum(start, len(sorted_values) - 1)
+    last = safe_start + np.maximum(counts, 1) - 1
+    pos = safe_start[:, None] + q[None, :] * np.maximum(counts[:, None] - 1, 0)
+    low = np.floor(pos).astype(np.int64)
+    high = np.minimum(low + 1, last[:, None])
+    frac = pos - low
+    quant = sorted_values[low] * (1 - frac) + sorted_values[high] * frac
+
+    sums = np.bincount(group, weights=values, minlength=n_groups)
+
+    quantile_table = keys.copy()
+    quantile_table.insert(len(group_cols), 'measure', measure)
+    quantile_table['observations'] = counts
+    quantile_table['mean'] = (sums / np.maximum(counts, 1)).round(2)
+    quantile_table['min'] = sorted_values[safe_start].round(2)
+    for i, qi in enumerate(q):
+        quantile_table[f'p{int(round(qi * 100)):02d}'] = quant[:, i].round(2)
+    quantile_table['max'] = sorted_values[last].round(2)
+
+    hist_table = keys.loc[np.repeat(np.arange(n_groups), bins)].reset_index(drop=True)
+    hist_table.insert(len(group_cols), 'measure', measure)
+    hist_table['bin_index'] = np.tile(np.arange(bins), n_groups)
+    hist_table['bin_start'] = np.tile(edges[:-1], n_groups).round(2)
+    hist_table['bin_end'] = np.tile(edges[1:], n_groups).round(2)
+    hist_table['count'] = hist.ravel()
+    hist_table['pct'] = (hist / np.maximum(counts, 1)[:, None] * 100).ravel().round(2)
+
+    # Grupos sin observaciones válidas no se exportan
+    non_empty = counts > 0
+    quantile_table = quantile_table[non_empty].reset_index(drop=True)
+    hist_table = hist_table[np.repeat(non_empty, bins)].reset_index(drop=True)
+
+    return quantile_table, hist_table
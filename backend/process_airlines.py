@@ -4,17 +4,28 @@ Calcula KPIs principales: On-time rate, Delay metrics, Route efficiency
 """
 import pandas as pd
 import numpy as np
+from heavy_hitters import top_k_table
+from price_distributions import grouped_distributions
+from fare_curves import fit_fare_curves
+from source_cache import read_source
+from dataframe_engine import get_engine
 
 class AirlinesProcessor:
-    def __init__(self, csv_path='airlines_flights_data.csv'):
+    def __init__(self, csv_path='airlines_flights_data.csv', engine=None):
         self.csv_path = csv_path
+        self.engine = get_engine(engine)
         self.df = None
         self.kpis = {}
+        self.top_k = None
+        self.price_quantiles = None
+        self.price_histograms = None
+        self.fare_curve_params = None
+        self.fare_curves = None
         
     def load_data(self):
         """Carga y limpia el dataset"""
         print("📥 Cargando datos de Airlines Flights...")
-        self.df = pd.read_csv(self.csv_path)
+        self.df = read_source(self.csv_path)
         
         # Crear features adicionales
         # Calcular delay estimado (asumiendo que duration vs optimal puede indicar delay)
@@ -110,6 +121,23 @@ class AirlinesProcessor:
         
         return route_metrics
     
+    def top_routes_analysis(self, k=20):
+        """Top-k de rutas (Pareto) con memoria acotada"""
+        print("\n🏆 Top Rutas (Pareto):")
+        
+        self.top_k = pd.concat([
+            top_k_table('airlines', 'route_revenue', self.df['route'], self.df['price'], k=k),
+            top_k_table('airlines', 'route_flights', self.df['route'], k=k),
+            top_k_table('airlines', 'route_airline_revenue',
+                        self.df['route'] + ' | ' + self.df['airline'], self.df['price'], k=k)
+        ], ignore_index=True)
+        
+        route_revenue = self.top_k[self.top_k['dimension'] == 'route_revenue']
+        for _, row in route_revenue.head(10).iterrows():
+            print(f"   {row['key']}: {row['share_pct']:.2f}% (Acumulado: {row['cumulative_share_pct']:.2f}%)")
+        
+        return self.top_k
+    
     def class_analysis(self):
         """Análisis por clase"""
         print("\n🎫 Análisis por Clase de Vuelo:")
@@ -140,6 +168,45 @@ class AirlinesProcessor:
         print(booking_metrics)
         return booking_metrics
     
+    def fare_curve_analysis(self):
+        """Curvas de tarifa precio vs days_left por ruta y clase (ajuste batch)"""
+        print("\n📈 Curvas de Tarifa (precio vs días de anticipación):")
+        
+        self.fare_curve_params, self.fare_curves = fit_fare_curves(self.df, group_cols=('route', 'class'))
+        
+        print(f"   Curvas ajustadas: {len(self.fare_curve_params):,} (ruta x clase)")
+        print(f"   R² mediano: {self.fare_curve_params['r2'].median():.3f}")
+        
+        # Sobreprecio de última hora: precio ajustado a 1 día vs a 30 días
+        pivot = self.fare_curves[self.fare_curves['days_left'].isin([1, 30])].pivot_table(
+            index='class', columns='days_left', values='fitted_price', aggfunc='median')
+        if 1 in pivot.columns and 30 in pivot.columns:
+            for cls, row in pivot.iterrows():
+                print(f"   {cls}: 1 día ${row[1]:,.2f} vs 30 días ${row[30]:,.2f} (+{(row[1] / row[30] - 1) * 100:.1f}%)")
+        
+        return self.fare_curve_params, self.fare_curves
+    
+    def price_distribution_analysis(self, bins=20):
+        """Histogramas y cuantiles (p10/p50/p90) de precio por ruta, aerolínea, clase y ventana"""
+        print("\n📊 Distribución de Precios (histogramas + cuantiles):")
+        
+        group_cols = ['route', 'airline', 'class', 'booking_window']
+        quantiles, histograms = [], []
+        for measure in ['price', 'price_per_hour']:
+            q, h = grouped_distributions(self.df, group_cols, measure, bins=bins)
+            quantiles.append(q)
+            histograms.append(h)
+        
+        self.price_quantiles = pd.concat(quantiles, ignore_index=True)
+        self.price_histograms = pd.concat(histograms, ignore_index=True)
+        
+        n_groups = len(self.price_quantiles) // 2
+        print(f"   {n_groups:,} grupos x 2 medidas x {bins} bins = {len(self.price_histograms):,} filas de histograma")
+        print(self.price_quantiles[self.price_quantiles['measure'] == 'price']
+              .groupby('class')[['p10', 'p50', 'p90']].median().round(2))
+        
+        return self.price_quantiles, self.price_histograms
+    
     def stops_analysis(self):
         """Análisis por número de escalas"""
         print("\n🔄 Análisis por Número de Escalas:")
@@ -176,18 +243,40 @@ class AirlinesProcessor:
         print(f"   ✅ Vuelos exportados: processed_airlines_flights.csv")
         
         # Tabla de KPIs agregados por ruta
-        route_kpis = self.df.groupby(['route', 'airline']).agg({
-            'price': ['mean', 'sum', 'count'],
-            'duration': 'mean',
-            'stops': lambda x: (x == 'zero').sum()
-        }).reset_index()
+        keys = ['route', 'airline']
+        source = self.engine.from_frame(self.df[keys + ['price', 'duration', 'stops']])
+        route_kpis = self.engine.aggregate(source, keys, [
+            ('avg_price', 'mean', 'price'),
+            ('total_revenue', 'sum', 'price'),
+            ('total_flights', 'count', 'price'),
+            ('avg_duration', 'mean', 'duration'),
+            ('direct_flights', 'count_eq', 'stops', 'zero')
+        ])
         
-        route_kpis.columns = ['route', 'airline', 'avg_price', 'total_revenue', 'total_flights', 'avg_duration', 'direct_flights']
         route_kpis['direct_flight_rate'] = (route_kpis['direct_flights'] / route_kpis['total_flights'] * 100).round(2)
         
         route_kpis.to_csv('processed_airlines_route_kpis.csv', index=False)
         print(f"   ✅ KPIs por ruta exportados: processed_airlines_route_kpis.csv")
         
+        # Top-k de rutas (Pareto)
+        if self.top_k is not None:
+            self.top_k.to_csv('processed_airlines_top_k.csv', index=False)
+            print(f"   ✅ Top-k de rutas exportado: processed_airlines_top_k.csv")
+        
+        # Distribuciones de precio precalculadas
+        if self.price_quantiles is not None:
+            self.price_quantiles.to_csv('processed_airlines_price_quantiles.csv', index=False)
+            self.price_histograms.to_csv('processed_airlines_price_histograms.csv', index=False)
+            print(f"   ✅ Distribuciones de precio exportadas: processed_airlines_price_quantiles.csv, "
+                  f"processed_airlines_price_histograms.csv")
+        
+        # Curvas de tarifa
+        if self.fare_curve_params is not None:
+            self.fare_curve_params.to_csv('processed_airlines_fare_curve_params.csv', index=False)
+            self.fare_curves.to_csv('processed_airlines_fare_curves.csv', index=False)
+            print(f"   ✅ Curvas de tarifa exportadas: processed_airlines_fare_curve_params.csv, "
+                  f"processed_airlines_fare_curves.csv")
+        
         return flights_table, route_kpis
     
     def run_full_analysis(self):
@@ -196,8 +285,11 @@ class AirlinesProcessor:
         self.calculate_kpis()
         self.airline_analysis()
         self.route_analysis()
+        self.top_routes_analysis()
         self.class_analysis()
         self.booking_window_analysis()
+        self.fare_curve_analysis()
+        self.price_distribution_analysis()
         self.stops_analysis()
         self.export_for_supabase()
         
@@ -206,5 +298,9 @@ class AirlinesProcessor:
         print("="*80)
 
 if __name__ == "__main__":
-    processor = AirlinesProcessor()
+    import sys
+    
+    # --engine duckdb: agregaciones de export con el motor lazy (ver dataframe_engine.py)
+    engine = sys.argv[sys.argv.index('--engine') + 1] if '--engine' in sys.argv else None
+    processor = AirlinesProcessor(engine=engine)
     processor.run_full_analysis()
@@ -5,17 +5,25 @@ Calcula KPIs principales: Revenue, Gross Margin, AOV, Pareto
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from heavy_hitters import top_k_table
+from retail_cohorts import RetailCohortEngine
+from source_cache import read_source
+from dataframe_engine import get_engine
 
 class RetailProcessor:
-    def __init__(self, csv_path='retail_sales_dataset.csv'):
+    def __init__(self, csv_path='retail_sales_dataset.csv', engine=None):
         self.csv_path = csv_path
+        self.engine = get_engine(engine)
         self.df = None
         self.kpis = {}
+        self.top_k = None
+        self.rfm_segments = None
+        self.cohorts = None
         
     def load_data(self):
         """Carga y limpia el dataset"""
         print("📥 Cargando datos de Retail Sales...")
-        self.df = pd.read_csv(self.csv_path)
+        self.df = read_source(self.csv_path)
         
         # Convertir fecha
         self.df['Date'] = pd.to_datetime(self.df['Date'])
@@ -113,6 +121,14 @@ class RetailProcessor:
         for cat, pct, cumsum in zip(category_revenue.index, category_revenue_pct, category_cumsum):
             print(f"   {cat}: {pct:.2f}% (Acumulado: {cumsum:.2f}%)")
         
+        # Por cliente (Space-Saving: memoria acotada aunque crezca el número de clientes)
+        self.top_k = top_k_table('retail', 'customer_revenue',
+                                 self.df['Customer ID'], self.df['Total Amount'], k=50)
+        
+        print("\nTop 10 clientes por revenue:")
+        for _, row in self.top_k.head(10).iterrows():
+            print(f"   {row['key']}: {row['share_pct']:.2f}% (Acumulado: {row['cumulative_share_pct']:.2f}%)")
+        
         return category_revenue
     
     def demographic_analysis(self):
@@ -141,6 +157,26 @@ class RetailProcessor:
         
         return gender_metrics, age_metrics
     
+    def cohort_analysis(self):
+        """Análisis RFM y retención por cohortes de adquisición"""
+        print("\n🔁 Análisis RFM y Cohortes:")
+        
+        engine = RetailCohortEngine(self.df)
+        rfm, self.rfm_segments, self.cohorts = engine.run()
+        
+        print("\nSegmentos RFM:")
+        print(self.rfm_segments[['segment', 'customers', 'customer_pct', 'revenue_pct']].to_string(index=False))
+        
+        # Retención promedio (ponderada por tamaño de cohorte) a 1, 3 y 6 meses
+        print("\nRetención promedio por antigüedad:")
+        for age in [1, 3, 6]:
+            cohort_age = self.cohorts[self.cohorts['months_since_first'] == age]
+            if len(cohort_age) > 0:
+                retention = cohort_age['active_customers'].sum() / cohort_age['cohort_size'].sum() * 100
+                print(f"   Mes {age}: {retention:.2f}%")
+        
+        return rfm
+    
     def export_for_supabase(self):
         """Prepara datos para Supabase"""
         print("\n💾 Preparando datos para Supabase...")
@@ -157,12 +193,14 @@ class RetailProcessor:
         print(f"   ✅ Transacciones exportadas: processed_retail_transactions.csv")
         
         # Tabla de KPIs agregados por mes
-        monthly_kpis = self.df.groupby(['YearMonth', 'Product Category']).agg({
-            'Total Amount': 'sum',
-            'Gross_Profit': 'sum',
-            'Transaction ID': 'count',
-            'Quantity': 'sum'
-        }).reset_index()
+        keys = ['YearMonth', 'Product Category']
+        source = self.engine.from_frame(self.df[keys + ['Total Amount', 'Gross_Profit', 'Transaction ID', 'Quantity']])
+        monthly_kpis = self.engine.aggregate(source, keys, [
+            ('revenue', 'sum', 'Total Amount'),
+            ('profit', 'sum', 'Gross_Profit'),
+            ('transactions', 'count', 'Transaction ID'),
+            ('units_sold', 'sum', 'Quantity')
+        ])
         
         monthly_kpis.columns = ['period', 'category', 'revenue', 'profit', 'transactions', 'units_sold']
         monthly_kpis['margin_pct'] = (monthly_kpis['profit'] / monthly_kpis['revenue'] * 100).round(2)
@@ -170,6 +208,20 @@ class RetailProcessor:
         monthly_kpis.to_csv('processed_retail_monthly_kpis.csv', index=False)
         print(f"   ✅ KPIs mensuales exportados: processed_retail_monthly_kpis.csv")
         
+        # Top-k de clientes (Pareto)
+        if self.top_k is not None:
+            self.top_k.to_csv('processed_retail_top_k.csv', index=False)
+            print(f"   ✅ Top-k de clientes exportado: processed_retail_top_k.csv")
+        
+        # Segmentos RFM y retención por cohortes
+        if self.rfm_segments is not None:
+            self.rfm_segments.to_csv('processed_retail_rfm_segments.csv', index=False)
+            print(f"   ✅ Segmentos RFM exportados: processed_retail_rfm_segments.csv")
+        
+        if self.cohorts is not None:
+            self.cohorts.to_csv('processed_retail_cohort_retention.csv', index=False)
+            print(f"   ✅ Retención por cohortes exportada: processed_retail_cohort_retention.csv")
+        
         return transactions_table, monthly_kpis
     
     def run_full_analysis(self):
@@ -180,6 +232,7 @@ class RetailProcessor:
         self.time_series_analysis()
         self.pareto_analysis()
         self.demographic_analysis()
+        self.cohort_analysis()
         self.export_for_supabase()
         
         print("\n" + "="*80)
@@ -187,5 +240,9 @@ class RetailProcessor:
         print("="*80)
 
 if __name__ == "__main__":
-    processor = RetailProcessor()
+    import sys
+    
+    # --engine duckdb: agregaciones de export con el motor lazy (ver dataframe_engine.py)
+    engine = sys.argv[sys.argv.index('--engine') + 1] if '--engine' in sys.argv else None
+    processor = RetailProcessor(engine=engine)
     processor.run_full_analysis()
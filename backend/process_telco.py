@@ -4,17 +4,22 @@ Calcula KPIs principales: Churn Rate, ARPU, Revenue at Risk, CLV
 """
 import pandas as pd
 import numpy as np
+from churn_scenarios import ChurnScenarioEngine
+from source_cache import read_source
+from dataframe_engine import get_engine
 
 class TelcoProcessor:
-    def __init__(self, csv_path='WA_Fn-UseC_-Telco-Customer-Churn.csv'):
+    def __init__(self, csv_path='WA_Fn-UseC_-Telco-Customer-Churn.csv', engine=None):
         self.csv_path = csv_path
+        self.engine = get_engine(engine)
         self.df = None
         self.kpis = {}
+        self.scenarios = None
         
     def load_data(self):
         """Carga y limpia el dataset"""
         print("📥 Cargando datos de Telco Customer Churn...")
-        self.df = pd.read_csv(self.csv_path)
+        self.df = read_source(self.csv_path)
         
         # Limpiar TotalCharges (tiene espacios en blanco)
         self.df['TotalCharges'] = pd.to_numeric(self.df['TotalCharges'], errors='coerce')
@@ -191,30 +196,38 @@ class TelcoProcessor:
         print(critical_segments)
         return critical_segments
     
-    def churn_impact_simulation(self):
-        """Simula impacto de reducción de churn"""
-        print("\n💡 Simulación de Impacto (Reducción de Churn):")
+    def churn_impact_simulation(self, segments=None):
+        """Simula escenarios de retención por segmento (Monte Carlo + bootstrap)"""
+        print("\n💡 Simulación de Impacto (Escenarios de Retención):")
         
         current_churn = self.kpis['churn_rate']
-        monthly_revenue = self.kpis['total_monthly_revenue']
         revenue_at_risk = self.kpis['revenue_at_risk']
         
-        scenarios = [1, 2, 5, 10]  # Reducción en puntos porcentuales
-        
         print(f"\nChurn actual: {current_churn:.2f}%")
         print(f"Revenue mensual at risk: ${revenue_at_risk:,.2f}")
-        print("\nEscenarios de reducción:")
-        
-        for reduction in scenarios:
-            new_churn = current_churn - reduction
-            saved_revenue = revenue_at_risk * (reduction / current_churn)
-            annual_impact = saved_revenue * 12
-            
-            print(f"   - Reducir churn a {new_churn:.2f}% (-{reduction}pp):")
-            print(f"     • Revenue recuperado/mes: ${saved_revenue:,.2f}")
-            print(f"     • Impacto anual: ${annual_impact:,.2f}")
-        
-        return None
+        
+        # Segmentos críticos de high_value_churn_segments (o todos si no hay críticos)
+        if segments is not None:
+            segments = list(segments.index)
+        
+        engine = ChurnScenarioEngine(self.df)
+        self.scenarios = engine.simulate(segments=segments)
+        
+        # Incentivo máximo que sigue siendo rentable al p05 para cada meta de reducción
+        print("\nIncentivo máximo rentable por segmento (p05 > 0):")
+        robust = self.scenarios[self.scenarios['net_monthly_impact_p05'] > 0]
+        for reduction in [5, 10, 25]:
+            target = robust[np.isclose(robust['churn_reduction_pct'], reduction)]
+            if len(target) == 0:
+                continue
+            best = target.loc[target.groupby(['arpu_segment', 'tenure_segment'])['incentive_pct'].idxmax()]
+            print(f"   - Retener {reduction}% de los churners:")
+            for _, row in best.iterrows():
+                print(f"     • {row['arpu_segment']} / {row['tenure_segment']}: hasta {row['incentive_pct']:.0f}% "
+                      f"(impacto neto/mes ${row['net_monthly_impact_mean']:,.2f}, "
+                      f"IC 90% ${row['net_monthly_impact_p05']:,.2f} - ${row['net_monthly_impact_p95']:,.2f})")
+        
+        return self.scenarios
     
     def export_for_supabase(self):
         """Prepara datos para Supabase"""
@@ -234,11 +247,15 @@ class TelcoProcessor:
         print(f"   ✅ Clientes exportados: processed_telco_customers.csv")
         
         # Tabla de KPIs agregados por segmento
-        segment_kpis = self.df.groupby(['Contract', 'Tenure_Segment', 'ARPU_Segment']).agg({
-            'Churn_Binary': ['sum', 'mean', 'count'],
-            'MonthlyCharges': 'mean',
-            'TotalCharges': 'mean'
-        }).reset_index()
+        keys = ['Contract', 'Tenure_Segment', 'ARPU_Segment']
+        source = self.engine.from_frame(self.df[keys + ['Churn_Binary', 'MonthlyCharges', 'TotalCharges']])
+        segment_kpis = self.engine.aggregate(source, keys, [
+            ('churned_count', 'sum', 'Churn_Binary'),
+            ('churn_rate', 'mean', 'Churn_Binary'),
+            ('total_customers', 'count', 'Churn_Binary'),
+            ('avg_monthly_charges', 'mean', 'MonthlyCharges'),
+            ('avg_total_charges', 'mean', 'TotalCharges')
+        ])
         
         segment_kpis.columns = ['contract', 'tenure_segment', 'arpu_segment', 
                                 'churned_count', 'churn_rate', 'total_customers', 
@@ -249,6 +266,11 @@ class TelcoProcessor:
         segment_kpis.to_csv('processed_telco_segment_kpis.csv', index=False)
         print(f"   ✅ KPIs por segmento exportados: processed_telco_segment_kpis.csv")
         
+        # Tabla de escenarios de retención
+        if self.scenarios is not None:
+            self.scenarios.to_csv('processed_telco_churn_scenarios.csv', index=False)
+            print(f"   ✅ Escenarios de retención exportados: processed_telco_churn_scenarios.csv")
+        
         return customers_table, segment_kpis
     
     def run_full_analysis(self):
@@ -259,8 +281,8 @@ class TelcoProcessor:
         self.churn_by_tenure()
         self.churn_by_services()
         self.churn_by_payment_method()
-        self.high_value_churn_segments()
-        self.churn_impact_simulation()
+        critical_segments = self.high_value_churn_segments()
+        self.churn_impact_simulation(critical_segments)
         self.export_for_supabase()
         
         print("\n" + "="*80)
@@ -268,5 +290,9 @@ class TelcoProcessor:
         print("="*80)
 
 if __name__ == "__main__":
-    processor = TelcoProcessor()
+    import sys
+    
+    # --engine duckdb: agregaciones de export con el motor lazy (ver dataframe_engine.py)
+    engine = sys.argv[sys.argv.index('--engine') + 1] if '--engine' in sys.argv else None
+    processor = TelcoProcessor(engine=engine)
     processor.run_full_analysis()
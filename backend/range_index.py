@@ -0,0 +1,241 @@
+"""
+Índice de sumas prefijas por día para KPIs de rangos de fechas arbitrarios
+Para cada medida aditiva (ingresos, utilidad, gasto, clics, leads, clientes nuevos,
+transacciones y fraude) se guarda la suma acumulada por día y dimensión (categoría,
+canal, categoría de comercio) sobre un calendario denso. El total de [inicio, fin] es
+acumulado[fin + 1] - acumulado[inicio]: tiempo constante sin volver a leer filas, y los
+ratios (margen, CAC, ROI, tasa de fraude) se derivan de esos totales.
+
+Se guarda en range_indexes/<índice>.npz para consultas desde Python y como bundle JSON
+junto a los snapshots (manifest.json -> 'ranges') para lib/snapshots.ts (queryRange).
+
+    python range_index.py build [índice ...]
+    python range_index.py query <índice> <inicio> <fin> [dimensión]
+"""
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dashboard_snapshots import SNAPSHOT_DIR, SNAPSHOT_SCHEMA_VERSION, write_bundle
+from source_cache import iter_source_chunks
+from time_series import load_daily
+
+
+RANGE_INDEX_DIR = Path('range_indexes')
+ALL = '__all__'
+
+
+def _fraud_daily(path, dimension='merchant_category', chunksize=1_000_000):
+    """
+    Totales diarios por `dimension` (categoría de comercio, tipo de tarjeta) desde el dataset
+    crudo completo, por chunks.
+    No se usa processed_fraud_transactions.csv: tiene todos los fraudes pero solo una muestra
+    de legítimas, y su fraud_rate no es el real
+    """
+    totals = []
+    for chunk in iter_source_chunks(path, chunksize, columns=['timestamp', dimension, 'amount', 'is_fraud']):
+        fraud = chunk['is_fraud'].replace({'True': 1, 'False': 0, 'true': 1, 'false': 0, True: 1, False: 0})
+        is_fraud = pd.to_numeric(fraud, errors='coerce').fillna(0)
+        amount = pd.to_numeric(chunk['amount'], errors='coerce').fillna(0)
+        frame = pd.DataFrame({'date': chunk['timestamp'].astype(str).str.slice(0, 10),
+                              dimension: chunk[dimension], 'transactions': 1,
+                              'amount': amount, 'is_fraud': is_fraud, 'fraud_amount': amount * is_fraud})
+        totals.append(frame.groupby(['date', dimension], sort=False).sum().reset_index())
+    return pd.concat(totals, ignore_index=True).groupby(['date', dimension], sort=False).sum().reset_index()
+
+
+# índice -> CSV, fecha, dimensión, medidas aditivas {columna: nombre} (None = conteo de filas),
+# lectura propia opcional (read: ruta -> DataFrame, p. ej. agregada por chunks), preparación
+# opcional del DataFrame y ratios {nombre: (numerador, denominador, factor)}
+RANGE_SPECS = {
+    'retail': {
+        'source': 'processed_retail_transactions.csv', 'date': 'Date', 'dimension': 'Product Category',
+        'measures': {'Total Amount': 'revenue', 'Gross_Profit': 'profit', 'Total_COGS': 'cost',
+                     'Quantity': 'units', None: 'transactions'},
+        'ratios': {'margin': ('profit', 'revenue', 100), 'avg_order_value': ('revenue', 'transactions', 1)},
+    },
+    'digital': {
+        'source': 'digital_performance_data.csv', 'date': 'Date', 'dimension': 'Channel',
+        'measures': {'Spend': 'spend', 'Revenue': 'revenue', 'Impressions': 'impressions', 'Clicks': 'clicks',
+                     'Leads': 'leads', 'New_Customers': 'new_customers',
+                     'Active_Customers_Start_of_Day': 'active_customers', None: 'rows'},
+        'ratios': {'cac': ('spend', 'new_customers', 1), 'roi_multiple': ('revenue', 'spend', 1),
+                   'ctr': ('clicks', 'impressions', 100), 'lead_rate': ('leads', 'clicks', 100),
+                   'avg_active_customers': ('active_customers', 'rows', 1)},
+    },
+    'fraud': {
+        'source': 'synthetic_fraud_data.csv', 'date': 'date', 'dimension': 'merchant_category',
+        'read': _fraud_daily,
+        'measures': {'transactions': 'transactions', 'amount': 'amount', 'is_fraud': 'fraud_count',
+                     'fraud_amount': 'fraud_amount'},
+        'ratios': {'fraud_rate': ('fraud_count', 'transactions', 100), 'avg_amount': ('amount', 'transactions', 1)},
+    },
+    # Mismas medidas por tipo de tarjeta (gráfico de fraudes por tarjeta del dashboard)
+    'fraud_card_type': {
+        'source': 'synthetic_fraud_data.csv', 'date': 'date', 'dimension': 'card_type',
+        'read': lambda path: _fraud_daily(path, 'card_type'),
+        'measures': {'transactions': 'transactions', 'amount': 'amount', 'is_fraud': 'fraud_count',
+                     'fraud_amount': 'fraud_amount'},
+        'ratios': {'fraud_rate': ('fraud_count', 'transactions', 100)},
+    },
+}
+
+
+class RangeIndex:
+    def __init__(self, start, dimensions, measures, cumulative, ratios=None):
+        self.start = np.datetime64(start, 'D')
+        self.dimensions = list(dimensions)
+        self.measures = list(measures)
+        # (dimensiones + total, días + 1, medidas); la fila 0 de cada dimensión es cero
+        self.cumulative = cumulative
+        self.ratios = ratios or {}
+        self._dimension_index = {name: i for i, name in enumerate(self.dimensions)}
+
+    @property
+    def days(self):
+        return self.cumulative.shape[1] - 1
+
+    @property
+    def end(self):
+        return self.start + np.timedelta64(self.days - 1, 'D')
+
+    @classmethod
+    def build(cls, df, spec):
+        """Suma acumulada por día (calendario denso: los días sin filas suman cero)"""
+        if spec.get('prepare'):
+            df = spec['prepare'](df)
+        daily = load_daily(df, spec)
+        measures = list(spec['measures'].values())
+
+        start = daily['date'].min()
+        days = (daily['date'].max() - start).days + 1
+        dimensions = sorted(daily['dimension'].unique()) if spec['dimension'] else []
+        day_index = (daily['date'] - start).dt.days.to_numpy()
+
+        values = np.zeros((len(dimensions) + 1, days, len(measures)))
+        if dimensions:
+            dim_index = pd.Categorical(daily['dimension'], categories=dimensions).codes
+            np.add.at(values, (dim_index, day_index), daily[measures].to_numpy(dtype=np.float64))
+            values[-1] = values[:-1].sum(axis=0)
+        else:
+            np.add.at(values[-1], day_index, daily[measures].to_numpy(dtype=np.float64))
+
+        cumulative = np.zeros((len(dimensions) + 1, days + 1, len(measures)))
+        np.cumsum(values, axis=1, out=cumulative[:, 1:])
+        return cls(start, dimensions + [ALL], measures, cumulative, spec.get('ratios'))
+
+    def _bounds(self, start, end):
+        """Posiciones [i, j) en el acumulado para [start, end] recortado al calendario"""
+        first = 0 if start is None else int((np.datetime64(start, 'D') - self.start).astype(np.int64))
+        last = self.days - 1 if end is None else int((np.datetime64(end, 'D') - self.start).astype(np.int64))
+        first, last = max(first, 0), min(last, self.days - 1)
+        return (first, last + 1) if first <= last else (0, 0)
+
+    def _with_ratios(self, totals):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name, (numerator, denominator, factor) in self.ratios.items():
+                totals[name] = np.divide(totals[numerator], totals[denominator]) * factor
+        return totals
+
+    def query(self, start=None, end=None, dimension=None):
+        """Totales y ratios de [start, end] (fechas inclusivas) para una dimensión o el total"""
+        i, j = self._bounds(start, end)
+        row = self.cumulative[self._dimension_index[dimension or ALL]]
+        totals = self._with_ratios(dict(zip(self.measures, row[j] - row[i])))
+        return {name: float(value) if np.isfinite(value) else None for name, value in totals.items()}
+
+    def query_dimensions(self, start=None, end=None):
+        """Totales y ratios de [start, end] para todas las dimensiones (una fila por dimensión)"""
+        i, j = self._bounds(start, end)
+        frame = pd.DataFrame(self.cumulative[:, j] - self.cumulative[:, i], index=self.dimensions,
+                             columns=self.measures)
+        return self._with_ratios(frame).replace([np.inf, -np.inf], np.nan)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, start=str(self.start), dimensions=np.array(self.dimensions, dtype=str),
+                 measures=np.array(self.measures, dtype=str), cumulative=self.cumulative,
+                 ratios=json.dumps(self.ratios))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(str(data['start']), data['dimensions'].tolist(), data['measures'].tolist(),
+                       data['cumulative'], {name: tuple(spec) for name, spec in json.loads(str(data['ratios'])).items()})
+
+    def to_bundle(self):
+        """Forma JSON para el dashboard: acumulados por dimensión y medida, en centésimas"""
+        return {
+            'start': str(self.start),
+            'days': self.days,
+            'dimensions': self.dimensions,
+            'measures': self.measures,
+            'ratios': {name: list(spec) for name, spec in self.ratios.items()},
+            'cumulative': [[np.round(self.cumulative[d, :, m], 2).tolist() for m in range(len(self.measures))]
+                           for d in range(len(self.dimensions))],
+        }
+
+
+def load_index(name, directory=RANGE_INDEX_DIR):
+    return RangeIndex.load(Path(directory) / f"{name}.npz")
+
+
+def build_indexes(data_dir='.', directory=RANGE_INDEX_DIR, output_dir=SNAPSHOT_DIR, names=None, loader=None):
+    """Construye los índices, los guarda en .npz y los publica como bundles (manifest 'ranges')"""
+    print("\n" + "="*80)
+    print("📐 CONSTRUYENDO ÍNDICES DE RANGOS (SUMAS PREFIJAS)")
+    print("="*80)
+
+    data_dir, output_dir = Path(data_dir), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {'dashboards': {}}
+    manifest.setdefault('ranges', {})
+
+    indexes = {}
+    for name in names or RANGE_SPECS:
+        spec = RANGE_SPECS[name]
+        path = data_dir / spec['source']
+        if not path.exists():
+            print(f"   ⚠️  {name}: falta {path.name}")
+            continue
+        if spec.get('read'):
+            df = spec['read'](path)
+        else:
+            df = loader(path) if loader else pd.read_csv(path, low_memory=False)
+        index = RangeIndex.build(df, spec)
+        index.save(Path(directory) / f"{name}.npz")
+
+        bundle_name = f"range-{name}"
+        entry = write_bundle(bundle_name, index.to_bundle(), {'min': str(index.start), 'max': str(index.end)},
+                             output_dir)
+        for stale in output_dir.glob(f"{bundle_name}.*.json*"):
+            if not stale.name.startswith(entry['file']):
+                stale.unlink()
+        manifest['ranges'][name] = entry
+        indexes[name] = index
+        print(f"   ✅ {name}: {index.days} días × {len(index.dimensions)} dimensiones × "
+              f"{len(index.measures)} medidas ({entry['gzip_bytes'] / 1024:.1f} KB gzip)")
+
+    manifest['schemaVersion'] = SNAPSHOT_SCHEMA_VERSION
+    manifest['generated_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False))
+    return indexes
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else 'build'
+
+    if command == 'query':
+        index = load_index(args[1])
+        dimension = args[4] if len(args) > 4 else None
+        for measure, value in index.query(args[2], args[3], dimension).items():
+            print(f"   {measure}: {'-' if value is None else f'{value:,.2f}'}")
+    else:
+        build_indexes(names=args[1:] or None)
@@ -0,0 +1,168 @@
+"""
+Motor RFM y retención por cohortes para transacciones de Retail
+Kernels NumPy (bincount / ufunc.at) sobre clientes y meses codificados como enteros
+"""
+import time
+import numpy as np
+import pandas as pd
+
+
+# Tamaño máximo (clientes x meses) para deduplicar pares activos con un bitmap (~256 MB)
+BITMAP_MAX_CELLS = 256 * 1024 * 1024
+
+# (R mínimo, F mínimo) -> segmento; se evalúa en orden y gana la primera regla que aplica
+RFM_SEGMENTS = [
+    ('Champions', 4, 4),
+    ('Loyal', 3, 4),
+    ('Potential Loyalist', 4, 2),
+    ('New Customers', 4, 1),
+    ('Need Attention', 3, 2),
+    ('About to Sleep', 3, 1),
+    ('At Risk', 1, 3),
+    ('Hibernating', 2, 1),
+    ('Lost', 1, 1),
+]
+
+
+class RetailCohortEngine:
+    def __init__(self, df, customer_col='Customer ID', date_col='Date', amount_col='Total Amount'):
+        self.customer_col = customer_col
+        self.date_col = date_col
+        self.amount_col = amount_col
+        self._encode(df)
+
+    def _encode(self, df):
+        """Codifica clientes y meses como enteros (una sola vez)"""
+        self.cust_codes, self.customers = pd.factorize(df[self.customer_col], sort=False)
+        self.n_customers = len(self.customers)
+
+        dates = pd.to_datetime(df[self.date_col])
+        self.day = (dates.values.astype('datetime64[D]').astype(np.int64))
+        month = dates.dt.year.to_numpy() * 12 + dates.dt.month.to_numpy() - 1
+        self.month_base = int(month.min())
+        self.month_idx = (month - self.month_base).astype(np.int64)
+        self.n_months = int(self.month_idx.max()) + 1
+
+        self.amount = df[self.amount_col].to_numpy(dtype=np.float64)
+
+    def _month_label(self, idx):
+        idx = np.asarray(idx) + self.month_base
+        return [f"{y:04d}-{m:02d}" for y, m in zip(idx // 12, idx % 12 + 1)]
+
+    @staticmethod
+    def _quintile_score(values, higher_is_better=True):
+        """Score 1-5 por quintiles de rank; los empates comparten el rank mínimo (como rank(method='min'))"""
+        values = np.asarray(values if higher_is_better else -np.asarray(values))
+        ranks = np.searchsorted(np.sort(values), values, side='left')
+        return 1 + ranks * 5 // max(len(values), 1)
+
+    def compute_rfm(self, reference_date=None):
+        """Recency / Frequency / Monetary por cliente"""
+        if reference_date is None:
+            ref_day = int(self.day.max()) + 1
+        else:
+            ref_day = int(np.datetime64(pd.Timestamp(reference_date).date(), 'D').astype(np.int64))
+
+        last_day = np.full(self.n_customers, np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(last_day, self.cust_codes, self.day)
+
+        recency = ref_day - last_day
+        frequency = np.bincount(self.cust_codes, minlength=self.n_customers)
+        monetary = np.bincount(self.cust_codes, weights=self.amount, minlength=self.n_customers)
+
+        r_score = self._quintile_score(recency, higher_is_better=False)
+        f_score = self._quintile_score(frequency)
+        m_score = self._quintile_score(monetary)
+
+        segment = np.full(self.n_customers, 'Lost', dtype=object)
+        assigned = np.zeros(self.n_customers, dtype=bool)
+        for name, r_min, f_min in RFM_SEGMENTS:
+            hit = ~assigned & (r_score >= r_min) & (f_score >= f_min)
+            segment[hit] = name
+            assigned |= hit
+
+        return pd.DataFrame({
+            'customer_id': self.customers,
+            'recency_days': recency,
+            'frequency': frequency,
+            'monetary': monetary.round(2),
+            'r_score': r_score,
+            'f_score': f_score,
+            'm_score': m_score,
+            'rfm_score': r_score * 100 + f_score * 10 + m_score,
+            'segment': segment
+        })
+
+    def rfm_segment_summary(self, rfm):
+        """Tabla compacta de segmentos RFM para el dashboard"""
+        summary = rfm.groupby('segment').agg(
+            customers=('customer_id', 'count'),
+            revenue=('monetary', 'sum'),
+            avg_recency_days=('recency_days', 'mean'),
+            avg_frequency=('frequency', 'mean'),
+            avg_monetary=('monetary', 'mean')
+        ).reset_index()
+
+        summary['customer_pct'] = (summary['customers'] / summary['customers'].sum() * 100).round(2)
+        summary['revenue_pct'] = (summary['revenue'] / summary['revenue'].sum() * 100).round(2)
+        summary[['revenue', 'avg_recency_days', 'avg_frequency', 'avg_monetary']] = \
+            summary[['revenue', 'avg_recency_days', 'avg_frequency', 'avg_monetary']].round(2)
+
+        return summary.sort_values('revenue', ascending=False).reset_index(drop=True)
+
+    def cohort_retention(self):
+        """Matriz de retención por cohorte de adquisición mensual (formato largo)"""
+        n_m = self.n_months
+
+        first_month = np.full(self.n_customers, n_m, dtype=np.int64)
+        np.minimum.at(first_month, self.cust_codes, self.month_idx)
+
+        # Pares (cliente, mes) activos únicos: bitmap si cabe en memoria, si no sort + diff
+        key = self.cust_codes.astype(np.int64) * n_m + self.month_idx
+        if self.n_customers * n_m <= BITMAP_MAX_CELLS:
+            seen = np.zeros(self.n_customers * n_m, dtype=bool)
+            seen[key] = True
+            active_key = np.flatnonzero(seen)
+        else:
+            key = np.sort(key)
+            active_key = key[np.concatenate([[True], key[1:] != key[:-1]])]
+        active_cust = active_key // n_m
+        active_month = active_key % n_m
+
+        cohort = first_month[active_cust]
+        cell = cohort * n_m + (active_month - cohort)
+        active = np.bincount(cell, minlength=n_m * n_m).reshape(n_m, n_m)
+
+        row_cohort = first_month[self.cust_codes]
+        row_cell = row_cohort * n_m + (self.month_idx - row_cohort)
+        revenue = np.bincount(row_cell, weights=self.amount, minlength=n_m * n_m).reshape(n_m, n_m)
+
+        cohort_size = active[:, 0]
+
+        # Solo celdas observables (cohorte + edad dentro del rango de datos)
+        cohort_idx, age = np.divmod(np.arange(n_m * n_m), n_m)
+        keep = (cohort_idx + age < n_m) & (cohort_size[cohort_idx] > 0)
+        cohort_idx, age = cohort_idx[keep], age[keep]
+
+        size = cohort_size[cohort_idx]
+        table = pd.DataFrame({
+            'cohort': self._month_label(cohort_idx),
+            'months_since_first': age,
+            'cohort_size': size,
+            'active_customers': active[cohort_idx, age],
+            'retention_pct': (active[cohort_idx, age] / size * 100).round(2),
+            'revenue': revenue[cohort_idx, age].round(2),
+            'revenue_per_customer': (revenue[cohort_idx, age] / size).round(2)
+        })
+        return table
+
+    def run(self):
+        """Ejecuta RFM + resumen por segmento + cohortes"""
+        start_time = time.perf_counter()
+        rfm = self.compute_rfm()
+        segments = self.rfm_segment_summary(rfm)
+        cohorts = self.cohort_retention()
+        elapsed = time.perf_counter() - start_time
+        print(f"   🧮 RFM + cohortes: {len(self.amount):,} transacciones, {self.n_customers:,} clientes, "
+              f"{self.n_months} meses en {elapsed:.3f}s")
+        return rfm, segments, cohorts
@@ -0,0 +1,168 @@
+"""
+Caché de CSV fuente en Arrow IPC (Feather v2 sin comprimir)
+La primera lectura parsea el CSV con pandas (mismos dtypes que antes) y guarda el resultado;
+las siguientes lo abren con memory mapping, sin volver a parsear texto. La clave incluye
+tamaño, mtime y un hash de los primeros/últimos bytes del archivo, por lo que cualquier
+cambio en la fuente invalida la caché.
+
+    python source_cache.py build [csv ...]   -> pre-construye la caché
+    python source_cache.py info              -> archivos en caché
+    python source_cache.py clear             -> borra la caché
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+
+CACHE_DIR = Path(os.getenv('SOURCE_CACHE_DIR', '.source_cache'))
+HASH_SAMPLE_BYTES = 1 << 20
+RAW_SOURCES = [
+    'retail_sales_dataset.csv',
+    'airlines_flights_data.csv',
+    'WA_Fn-UseC_-Telco-Customer-Churn.csv',
+    'synthetic_fraud_data.csv',
+]
+# Argumentos de read_csv que no cambian el resultado del parseo
+_IGNORED_KWARGS = {'low_memory', 'usecols', 'nrows', 'chunksize'}
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.feather
+        return pa
+    except ImportError:
+        return None
+
+
+def source_key(path, read_kwargs=None):
+    """Clave de la fuente: tamaño, mtime, hash de muestra y argumentos de parseo"""
+    path = Path(path)
+    stat = path.stat()
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        digest.update(f.read(HASH_SAMPLE_BYTES))
+        if stat.st_size > HASH_SAMPLE_BYTES:
+            f.seek(max(stat.st_size - HASH_SAMPLE_BYTES, HASH_SAMPLE_BYTES))
+            digest.update(f.read())
+    kwargs = {k: v for k, v in (read_kwargs or {}).items() if k not in _IGNORED_KWARGS}
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}:{json.dumps(kwargs, sort_keys=True, default=str)}".encode())
+    return digest.hexdigest()
+
+
+def cache_path(path, read_kwargs=None, cache_dir=None):
+    path = Path(path)
+    return Path(cache_dir or CACHE_DIR) / f"{path.stem}.{source_key(path, read_kwargs)}.arrow"
+
+
+def _open_cached(cached, columns=None):
+    pa = _pyarrow()
+    source = pa.memory_map(str(cached), 'r')
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select([col for col in table.column_names if col in set(columns)])
+    return table
+
+
+def _write_cache(df, cached):
+    pa = _pyarrow()
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError) as e:
+        # Columnas con tipos mezclados: se sigue sin caché
+        print(f"   ⚠️  {cached.name}: no se pudo convertir a Arrow ({e}); sin caché")
+        return
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    for stale in cached.parent.glob(f"{cached.name.rsplit('.', 2)[0]}.*.arrow"):
+        stale.unlink()
+    tmp_path = cached.with_name(cached.name + '.tmp')
+    pa.feather.write_feather(table, str(tmp_path), compression='uncompressed')
+    os.replace(tmp_path, cached)
+
+
+def read_source(path, columns=None, nrows=None, cache_dir=None, **read_csv_kwargs):
+    """
+    Equivalente a pd.read_csv(path, usecols=columns, nrows=nrows, **kwargs) usando la caché.
+    Sin caché y con nrows se lee directo del CSV (no se construye la caché con un parseo parcial)
+    """
+    if _pyarrow() is None:
+        return pd.read_csv(path, usecols=columns, nrows=nrows, **read_csv_kwargs)
+
+    start = time.perf_counter()
+    cached = cache_path(path, read_csv_kwargs, cache_dir)
+    if cached.exists():
+        table = _open_cached(cached, columns)
+        if nrows is not None:
+            table = table.slice(0, nrows)
+        df = table.to_pandas(split_blocks=True)
+        print(f"   ⚡ {Path(path).name}: {len(df):,} filas desde caché Arrow ({time.perf_counter() - start:.2f}s)")
+        return df
+
+    if nrows is not None:
+        return pd.read_csv(path, usecols=columns, nrows=nrows, **read_csv_kwargs)
+
+    df = pd.read_csv(path, **read_csv_kwargs)
+    _write_cache(df, cached)
+    print(f"   💾 {Path(path).name}: {len(df):,} filas parseadas y cacheadas ({time.perf_counter() - start:.2f}s)")
+    return df[columns] if columns is not None else df
+
+
+def arrow_source(path, columns=None, nrows=None, cache_dir=None, **read_csv_kwargs):
+    """
+    pyarrow.Table memory-mapped desde la caché (la construye si falta), con los mismos tipos
+    que read_source; None si no hay pyarrow o el CSV no se puede cachear
+    """
+    if _pyarrow() is None:
+        return None
+    cached = cache_path(path, read_csv_kwargs, cache_dir)
+    if not cached.exists():
+        read_source(path, cache_dir=cache_dir, **read_csv_kwargs)
+        if not cached.exists():
+            return None
+    table = _open_cached(cached, columns)
+    return table.slice(0, nrows) if nrows is not None else table
+
+
+def iter_source_chunks(path, chunksize, columns=None, cache_dir=None, **read_csv_kwargs):
+    """Itera DataFrames de a `chunksize` filas; desde la caché si existe, si no desde el CSV"""
+    if _pyarrow() is not None:
+        cached = cache_path(path, read_csv_kwargs, cache_dir)
+        if cached.exists():
+            pa = _pyarrow()
+            table = _open_cached(cached, columns)
+            for batch in table.to_batches(max_chunksize=chunksize):
+                yield pa.Table.from_batches([batch]).to_pandas()
+            return
+    yield from pd.read_csv(path, usecols=columns, chunksize=chunksize, **read_csv_kwargs)
+
+
+def cache_info(cache_dir=None):
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    return sorted((p.name, p.stat().st_size) for p in cache_dir.glob('*.arrow')) if cache_dir.exists() else []
+
+
+def clear_cache(cache_dir=None):
+    for name, _ in cache_info(cache_dir):
+        (Path(cache_dir or CACHE_DIR) / name).unlink()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+
+    if command == 'info':
+        for name, size in cache_info():
+            print(f"   {name}: {size / 1024 / 1024:.1f} MB")
+    elif command == 'clear':
+        clear_cache()
+        print(f"✅ Caché {CACHE_DIR} vacía")
+    else:
+        for csv_path in sys.argv[2:] or RAW_SOURCES:
+            if Path(csv_path).exists():
+                read_source(csv_path)
+            else:
+                print(f"   ⚠️  {csv_path} no encontrado")
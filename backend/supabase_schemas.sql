@@ -50,6 +50,36 @@ CREATE INDEX IF NOT EXISTS idx_retail_trans_customer ON retail_transactions(cust
 CREATE INDEX IF NOT EXISTS idx_retail_trans_category ON retail_transactions(product_category);
 CREATE INDEX IF NOT EXISTS idx_retail_monthly_period ON retail_monthly_kpis(period);
 
+-- Resumen de segmentos RFM (Recency / Frequency / Monetary)
+CREATE TABLE IF NOT EXISTS retail_rfm_segments (
+    id SERIAL PRIMARY KEY,
+    segment TEXT NOT NULL UNIQUE,
+    customers INTEGER NOT NULL,
+    revenue DECIMAL(14,2),
+    avg_recency_days DECIMAL(8,2),
+    avg_frequency DECIMAL(8,2),
+    avg_monetary DECIMAL(12,2),
+    customer_pct DECIMAL(5,2),
+    revenue_pct DECIMAL(5,2),
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Retención por cohorte de adquisición mensual (formato largo)
+CREATE TABLE IF NOT EXISTS retail_cohort_retention (
+    id SERIAL PRIMARY KEY,
+    cohort TEXT NOT NULL,
+    months_since_first INTEGER NOT NULL,
+    cohort_size INTEGER NOT NULL,
+    active_customers INTEGER NOT NULL,
+    retention_pct DECIMAL(5,2),
+    revenue DECIMAL(14,2),
+    revenue_per_customer DECIMAL(12,2),
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(cohort, months_since_first)
+);
+
+CREATE INDEX IF NOT EXISTS idx_retail_cohort ON retail_cohort_retention(cohort);
+
 -- ============================================================================
 -- 2. AIRLINES FLIGHTS TABLES
 -- ============================================================================
@@ -97,6 +127,73 @@ CREATE INDEX IF NOT EXISTS idx_airlines_source ON airlines_flights(source_city);
 CREATE INDEX IF NOT EXISTS idx_airlines_dest ON airlines_flights(destination_city);
 CREATE INDEX IF NOT EXISTS idx_airlines_route_kpis_route ON airlines_route_kpis(route);
 
+-- Cuantiles de precio por ruta, aerolínea, clase y ventana de reserva
+CREATE TABLE IF NOT EXISTS airlines_price_quantiles (
+    id SERIAL PRIMARY KEY,
+    route TEXT NOT NULL,
+    airline TEXT NOT NULL,
+    class TEXT NOT NULL,
+    booking_window TEXT NOT NULL,
+    measure TEXT NOT NULL, -- 'price', 'price_per_hour'
+    observations INTEGER NOT NULL,
+    mean DECIMAL(10,2),
+    min DECIMAL(10,2),
+    p10 DECIMAL(10,2),
+    p50 DECIMAL(10,2),
+    p90 DECIMAL(10,2),
+    max DECIMAL(10,2),
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(route, airline, class, booking_window, measure)
+);
+
+-- Histogramas de precio (bins fijos log-espaciados, comunes a todos los grupos)
+CREATE TABLE IF NOT EXISTS airlines_price_histograms (
+    id SERIAL PRIMARY KEY,
+    route TEXT NOT NULL,
+    airline TEXT NOT NULL,
+    class TEXT NOT NULL,
+    booking_window TEXT NOT NULL,
+    measure TEXT NOT NULL,
+    bin_index SMALLINT NOT NULL,
+    bin_start DECIMAL(10,2) NOT NULL,
+    bin_end DECIMAL(10,2) NOT NULL,
+    count INTEGER NOT NULL,
+    pct DECIMAL(5,2),
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(route, airline, class, booking_window, measure, bin_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_airlines_price_q_route ON airlines_price_quantiles(route, class);
+CREATE INDEX IF NOT EXISTS idx_airlines_price_h_route ON airlines_price_histograms(route, class, measure);
+
+-- Parámetros de curvas de tarifa: price ~ b0 + b1·ln(days_left) + b2·ln(days_left)²
+CREATE TABLE IF NOT EXISTS airlines_fare_curve_params (
+    id SERIAL PRIMARY KEY,
+    route TEXT NOT NULL,
+    class TEXT NOT NULL,
+    b0 DECIMAL(14,4),
+    b1 DECIMAL(14,4),
+    b2 DECIMAL(14,4),
+    observations INTEGER,
+    r2 DECIMAL(6,4),
+    rmse DECIMAL(12,2),
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(route, class)
+);
+
+-- Valores ajustados de las curvas sobre la grilla de days_left
+CREATE TABLE IF NOT EXISTS airlines_fare_curves (
+    id SERIAL PRIMARY KEY,
+    route TEXT NOT NULL,
+    class TEXT NOT NULL,
+    days_left INTEGER NOT NULL,
+    fitted_price DECIMAL(10,2),
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(route, class, days_left)
+);
+
+CREATE INDEX IF NOT EXISTS idx_airlines_fare_curves_route ON airlines_fare_curves(route, class);
+
 -- ============================================================================
 -- 3. TELCO CUSTOMER CHURN TABLES
 -- ============================================================================
@@ -155,6 +252,78 @@ CREATE INDEX IF NOT EXISTS idx_telco_tenure_seg ON telco_customers(tenure_segmen
 CREATE INDEX IF NOT EXISTS idx_telco_arpu_seg ON telco_customers(arpu_segment);
 CREATE INDEX IF NOT EXISTS idx_telco_seg_kpis_contract ON telco_segment_kpis(contract);
 
+-- Tabla de escenarios de retención (Monte Carlo + bootstrap por segmento)
+CREATE TABLE IF NOT EXISTS telco_churn_scenarios (
+    id SERIAL PRIMARY KEY,
+    scenario_id INTEGER NOT NULL,
+    arpu_segment TEXT NOT NULL,
+    tenure_segment TEXT NOT NULL,
+    churn_reduction_pct DECIMAL(5,2) NOT NULL,
+    incentive_pct DECIMAL(5,2) NOT NULL,
+    total_customers INTEGER,
+    churned_count INTEGER,
+    revenue_at_risk DECIMAL(12,2),
+    saved_revenue_mean DECIMAL(12,2),
+    net_monthly_impact_mean DECIMAL(12,2),
+    net_monthly_impact_p05 DECIMAL(12,2),
+    net_monthly_impact_p95 DECIMAL(12,2),
+    annual_impact_mean DECIMAL(14,2),
+    prob_positive DECIMAL(5,4),
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(scenario_id, arpu_segment, tenure_segment)
+);
+
+CREATE INDEX IF NOT EXISTS idx_telco_scenarios_segment ON telco_churn_scenarios(arpu_segment, tenure_segment);
+
+-- ============================================================================
+-- 3b. RANKINGS TOP-K (PARETO) - Retail, Airlines, Fraud
+-- ============================================================================
+
+-- Top-k por dominio y dimensión (Space-Saving, memoria acotada)
+CREATE TABLE IF NOT EXISTS top_k_rankings (
+    id SERIAL PRIMARY KEY,
+    domain TEXT NOT NULL,           -- 'retail', 'airlines', 'fraud'
+    dimension TEXT NOT NULL,        -- p. ej. 'customer_revenue', 'route_revenue', 'merchant_amount'
+    rank INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value DECIMAL(18,2) NOT NULL,
+    error_bound DECIMAL(18,2),
+    share_pct DECIMAL(6,2),
+    cumulative_share_pct DECIMAL(6,2),
+    guaranteed SMALLINT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(domain, dimension, rank)
+);
+
+CREATE INDEX IF NOT EXISTS idx_top_k_domain_dim ON top_k_rankings(domain, dimension);
+
+-- ============================================================================
+-- 3c. ALERTAS DE ANOMALÍAS EN KPIs DIARIOS - Fraud, Digital
+-- ============================================================================
+
+-- Puntos con |z robusto| >= 4 respecto del baseline incremental de la serie (kpi_anomalies.py)
+CREATE TABLE IF NOT EXISTS kpi_anomaly_alerts (
+    id SERIAL PRIMARY KEY,
+    series_id TEXT NOT NULL,        -- 'source:metric:dimension=value', p. ej. 'fraud:fraud_rate:country=USA'
+    source TEXT NOT NULL,           -- 'fraud', 'digital'
+    metric TEXT NOT NULL,           -- 'fraud_rate', 'avg_amount', 'transactions', 'cac', 'roas', ...
+    dimension TEXT NOT NULL,        -- 'all', 'country', 'merchant_category', 'channel'
+    dimension_value TEXT NOT NULL,
+    date DATE NOT NULL,
+    value DECIMAL(18,4),
+    expected DECIMAL(18,4),
+    robust_z DECIMAL(8,2),
+    ewma_z DECIMAL(8,2),
+    direction TEXT,                 -- 'up', 'down'
+    severity TEXT,                  -- 'warning', 'critical'
+    detected_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(series_id, date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_kpi_alerts_date ON kpi_anomaly_alerts(date);
+CREATE INDEX IF NOT EXISTS idx_kpi_alerts_source_metric ON kpi_anomaly_alerts(source, metric);
+
 -- ============================================================================
 -- 4. VIEWS PARA DASHBOARDS (OPCIONAL)
 -- ============================================================================
@@ -278,6 +447,195 @@ SELECT
 FROM digital_performance_data
 GROUP BY channel;
 
+-- ============================================================================
+-- 6b. KPIs DE DIGITAL PERFORMANCE CALCULADOS EN EL SERVIDOR
+-- ============================================================================
+-- Evita descargar digital_performance_data a pandas y volver a subir el resultado:
+-- la vista materializada agrega por canal y mes dentro de Postgres y la función
+-- la refresca y copia el resultado a digital_performance_kpis.
+-- Mismas fórmulas que compute_monthly_kpis() en upload_digital_performance.py
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_digital_performance_monthly_kpis AS
+WITH monthly AS (
+    SELECT
+        channel,
+        DATE_TRUNC('month', date)::DATE as period_start,
+        (DATE_TRUNC('month', date) + INTERVAL '1 month - 1 day')::DATE as period_end,
+        SUM(spend)::DECIMAL as total_spend,
+        SUM(impressions)::BIGINT as total_impressions,
+        SUM(clicks)::BIGINT as total_clicks,
+        SUM(leads)::BIGINT as total_leads,
+        SUM(new_customers)::BIGINT as total_new_customers,
+        SUM(revenue)::DECIMAL as total_revenue,
+        SUM(churned_customers)::BIGINT as total_churned_customers,
+        AVG(active_customers_start_of_day) as avg_active_customers
+    FROM digital_performance_data
+    GROUP BY channel, DATE_TRUNC('month', date)
+),
+rates AS (
+    SELECT
+        *,
+        total_spend / NULLIF(total_new_customers, 0) as cac,
+        total_revenue / NULLIF(avg_active_customers, 0) as arpu,
+        total_leads::DECIMAL / NULLIF(total_clicks, 0) as conv_clicks_leads,
+        total_new_customers::DECIMAL / NULLIF(total_leads, 0) as conv_leads_customers,
+        total_churned_customers::DECIMAL / NULLIF(avg_active_customers, 0) as churn_rate
+    FROM monthly
+),
+lifetime AS (
+    SELECT
+        *,
+        -- LTV = ARPU / Churn Rate
+        NULLIF(arpu, 0) / NULLIF(churn_rate, 0) as ltv
+    FROM rates
+)
+SELECT
+    channel,
+    period_start,
+    period_end,
+    'monthly'::TEXT as period_type,
+    ROUND(total_spend, 2) as total_spend,
+    total_impressions,
+    total_clicks,
+    total_leads,
+    total_new_customers,
+    ROUND(total_revenue, 2) as total_revenue,
+    total_churned_customers,
+    TRUNC(avg_active_customers)::INTEGER as avg_active_customers,
+    ROUND(NULLIF(cac, 0), 2) as cac,
+    ROUND(NULLIF(arpu, 0), 2) as arpu,
+    ROUND(NULLIF(conv_clicks_leads, 0), 4) as conversion_rate_clicks_to_leads,
+    ROUND(NULLIF(conv_leads_customers, 0), 4) as conversion_rate_leads_to_customers,
+    ROUND(NULLIF(churn_rate, 0), 4) as churn_rate,
+    ROUND(NULLIF(ltv, 0), 2) as ltv,
+    ROUND(NULLIF(ltv, 0) / NULLIF(cac, 0), 2) as ltv_cac_ratio
+FROM lifetime;
+
+-- Índice único requerido por REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_digital_kpis_channel_period
+    ON mv_digital_performance_monthly_kpis(channel, period_start);
+
+-- Función: refrescar la vista y publicar los KPIs (llamar después de cada carga)
+-- Desde Python: supabase.rpc('refresh_digital_performance_kpis').execute()
+-- Corre como su dueño (REFRESH requiere serlo), así que fija search_path y solo puede
+-- ejecutarla service_role: con la anon key el uploader usa el cálculo en pandas
+CREATE OR REPLACE FUNCTION refresh_digital_performance_kpis()
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_digital_performance_monthly_kpis;
+
+    INSERT INTO digital_performance_kpis (
+        channel, period_start, period_end, period_type,
+        total_spend, total_impressions, total_clicks, total_leads, total_new_customers,
+        total_revenue, total_churned_customers, avg_active_customers,
+        cac, arpu, conversion_rate_clicks_to_leads, conversion_rate_leads_to_customers,
+        churn_rate, ltv, ltv_cac_ratio
+    )
+    SELECT
+        channel, period_start, period_end, period_type,
+        total_spend, total_impressions, total_clicks, total_leads, total_new_customers,
+        total_revenue, total_churned_customers, avg_active_customers,
+        cac, arpu, conversion_rate_clicks_to_leads, conversion_rate_leads_to_customers,
+        churn_rate, ltv, ltv_cac_ratio
+    FROM mv_digital_performance_monthly_kpis
+    ON CONFLICT (channel, period_start, period_end, period_type) DO UPDATE SET
+        total_spend = EXCLUDED.total_spend,
+        total_impressions = EXCLUDED.total_impressions,
+        total_clicks = EXCLUDED.total_clicks,
+        total_leads = EXCLUDED.total_leads,
+        total_new_customers = EXCLUDED.total_new_customers,
+        total_revenue = EXCLUDED.total_revenue,
+        total_churned_customers = EXCLUDED.total_churned_customers,
+        avg_active_customers = EXCLUDED.avg_active_customers,
+        cac = EXCLUDED.cac,
+        arpu = EXCLUDED.arpu,
+        conversion_rate_clicks_to_leads = EXCLUDED.conversion_rate_clicks_to_leads,
+        conversion_rate_leads_to_customers = EXCLUDED.conversion_rate_leads_to_customers,
+        churn_rate = EXCLUDED.churn_rate,
+        ltv = EXCLUDED.ltv,
+        ltv_cac_ratio = EXCLUDED.ltv_cac_ratio;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION refresh_digital_performance_kpis() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_digital_performance_kpis() TO service_role;
+
+-- ============================================================================
+-- 7. RECONCILIACIÓN DE CARGAS (FINGERPRINTS POR PARTICIÓN)
+-- ============================================================================
+-- Huella por partición de cualquier tabla: filas, suma de hashes de la clave
+-- (60 bits de md5, independiente del orden) y suma de una columna numérica en centavos.
+-- upload_reconciliation.py calcula la misma huella localmente y solo re-sube las
+-- particiones que no coinciden.
+--
+-- p_partition_mode: 'column' (valor de la columna), 'month' (YYYY-MM de una fecha),
+--                   'bucket' (md5(clave) mod p_buckets) o NULL (una sola partición '*')
+--
+-- Seguridad: la función arma SQL dinámico con nombres recibidos por RPC, así que corre con
+-- los permisos de quien la llama (SECURITY INVOKER, respeta RLS), con search_path fijo y
+-- solo sobre las tablas de RECONCILE_SPECS (upload_reconciliation.py): al agregar una tabla
+-- allí, sumarla también a la lista de abajo.
+
+CREATE OR REPLACE FUNCTION table_fingerprints(
+    p_table TEXT,
+    p_key_columns TEXT[],
+    p_value_column TEXT,
+    p_partition_column TEXT DEFAULT NULL,
+    p_partition_mode TEXT DEFAULT NULL,
+    p_buckets INTEGER DEFAULT 16
+) RETURNS TABLE(partition_key TEXT, row_count BIGINT, key_hash TEXT, value_cents TEXT) AS $$
+DECLARE
+    key_expr TEXT;
+    partition_expr TEXT;
+BEGIN
+    IF p_table <> ALL (ARRAY[
+        'retail_transactions', 'retail_monthly_kpis', 'retail_rfm_segments', 'retail_cohort_retention',
+        'airlines_flights', 'airlines_route_kpis', 'airlines_price_quantiles', 'airlines_price_histograms',
+        'airlines_fare_curve_params', 'airlines_fare_curves',
+        'telco_customers', 'telco_segment_kpis', 'telco_churn_scenarios', 'top_k_rankings',
+        'fraud_transactions', 'fraud_daily_kpis', 'fraud_merchant_kpis', 'fraud_country_kpis',
+        'fraud_hourly_patterns', 'fraud_link_components', 'fraud_dim_transactions', 'fraud_dim_customers',
+        'fraud_dim_cards', 'fraud_dim_merchants', 'fraud_dim_devices',
+        'digital_performance_data', 'kpi_anomaly_alerts'
+    ]) THEN
+        RAISE EXCEPTION 'table_fingerprints: tabla no permitida: %', p_table;
+    END IF;
+    IF p_partition_mode IS NOT NULL AND p_partition_mode NOT IN ('column', 'month', 'bucket') THEN
+        RAISE EXCEPTION 'table_fingerprints: modo de partición inválido: %', p_partition_mode;
+    END IF;
+    IF p_buckets IS NULL OR p_buckets < 1 THEN
+        RAISE EXCEPTION 'table_fingerprints: p_buckets debe ser positivo';
+    END IF;
+
+    SELECT format('concat_ws(''|'', %s)', string_agg(format('%I::text', col), ', '))
+    INTO key_expr
+    FROM unnest(p_key_columns) AS col;
+
+    partition_expr := CASE p_partition_mode
+        WHEN 'column' THEN format('%I::text', p_partition_column)
+        WHEN 'month' THEN format('to_char(%I, ''YYYY-MM'')', p_partition_column)
+        WHEN 'bucket' THEN format('((''x'' || substr(md5(%s), 1, 8))::bit(32)::bigint %% %s)::text',
+                                  key_expr, p_buckets)
+        ELSE '''*'''
+    END;
+
+    RETURN QUERY EXECUTE format('
+        SELECT
+            %s AS partition_key,
+            COUNT(*)::BIGINT AS row_count,
+            SUM((''x'' || substr(md5(%s), 1, 15))::bit(60)::bigint)::TEXT AS key_hash,
+            COALESCE(SUM(ROUND(%I * 100)), 0)::TEXT AS value_cents
+        FROM %I
+        GROUP BY 1
+    ', partition_expr, key_expr, p_value_column, p_table);
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY INVOKER SET search_path = public;
+
 -- ============================================================================
 -- FIN DE SCHEMAS
 -- ============================================================================
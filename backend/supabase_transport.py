@@ -0,0 +1,277 @@
+"""
+Transporte HTTP compartido para las cargas a Supabase (PostgREST)
+Un solo cliente httpx por proceso con pool de conexiones keep-alive (HTTP/2 si está h2),
+cuerpos JSON comprimidos (gzip o zstd), columnas completamente nulas podadas por lote y
+métricas de bytes enviados y tiempo por lote. Todos los uploaders usan get_transport();
+las consultas, RPC y borrados siguen usando el cliente de supabase-py (get_supabase_client).
+
+Benchmark contra un servidor mock local:
+    python supabase_transport.py bench [csv] [tabla]
+"""
+import gzip
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+
+COMPRESSION = os.getenv('SUPABASE_REQUEST_COMPRESSION', 'gzip')
+COMPRESS_MIN_BYTES = 1024
+
+_clients = {}
+_transports = {}
+_lock = threading.Lock()
+
+
+def _credentials(url=None, key=None):
+    url = url or os.getenv('SUPABASE_URL')
+    key = key or os.getenv('SUPABASE_KEY')
+    if not url or not key:
+        raise ValueError("❌ ERROR: SUPABASE_URL y SUPABASE_KEY deben estar configurados en .env")
+    return url, key
+
+
+def get_supabase_client(url=None, key=None):
+    """Cliente de supabase-py compartido (uno por URL/key en el proceso)"""
+    from supabase import create_client
+
+    url, key = _credentials(url, key)
+    with _lock:
+        if (url, key) not in _clients:
+            _clients[(url, key)] = create_client(url, key)
+        return _clients[(url, key)]
+
+
+def get_transport(url=None, key=None, **kwargs):
+    """Transporte de upserts compartido (uno por URL/key en el proceso)"""
+    url, key = _credentials(url, key)
+    with _lock:
+        if (url, key) not in _transports:
+            _transports[(url, key)] = SupabaseTransport(url, key, **kwargs)
+        return _transports[(url, key)]
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def prune_null_columns(records):
+    """
+    Quita las columnas nulas en todo el lote (todas las filas conservan las mismas claves,
+    como exige PostgREST). upsert() envía la lista completa en ?columns=, así que las
+    columnas omitidas se escriben como NULL/DEFAULT igual que antes
+    """
+    if not records:
+        return records, []
+    columns = list(records[0])
+    null_columns = [col for col in columns if all(record.get(col) is None for record in records)]
+    if not null_columns:
+        return records, []
+    keep = [col for col in columns if col not in null_columns]
+    return [{col: record.get(col) for col in keep} for record in records], null_columns
+
+
+class TransportError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+
+
+class SupabaseTransport:
+    def __init__(self, url, key, compression=COMPRESSION, http2=True, max_connections=8,
+                 timeout=120.0, prune_nulls=True):
+        import httpx
+
+        if compression == 'zstd' and importlib.util.find_spec('zstandard') is None:
+            print("   ⚠️  zstandard no está instalado: se usa gzip")
+            compression = 'gzip'
+        self.compression = None if compression in (None, '', 'none') else compression
+        self.prune_nulls = prune_nulls
+        self.http2 = http2 and importlib.util.find_spec('h2') is not None
+
+        self.base_url = url.rstrip('/') + '/rest/v1'
+        self.client = httpx.Client(
+            http2=self.http2,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={
+                'apikey': key,
+                'Authorization': f'Bearer {key}',
+                'Content-Type': 'application/json',
+            },
+        )
+        self._compression_confirmed = False
+        self.stats = {'batches': 0, 'rows': 0, 'raw_bytes': 0, 'wire_bytes': 0, 'seconds': 0.0,
+                      'pruned_columns': 0}
+        self._zstd = None
+
+    def _compress(self, body):
+        if self.compression is None or len(body) < COMPRESS_MIN_BYTES:
+            return body, None
+        if self.compression == 'zstd':
+            if self._zstd is None:
+                import zstandard
+                self._zstd = zstandard.ZstdCompressor(level=3)
+            return self._zstd.compress(body), 'zstd'
+        return gzip.compress(body, compresslevel=3, mtime=0), 'gzip'
+
+    def _post(self, table, body, params, encoding):
+        headers = {'Prefer': 'resolution=merge-duplicates,return=minimal'}
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return self.client.post(f'{self.base_url}/{table}', params=params, content=body, headers=headers)
+
+    def prepare(self, table, records, on_conflict=None):
+        """
+        Serializa y comprime un lote (trabajo de CPU) sin enviarlo; send() hace la parte de red.
+        Separados para poder preparar el lote siguiente mientras se envía el actual
+        """
+        start = time.perf_counter()
+        columns = list(records[0]) if records else []
+        pruned = []
+        if self.prune_nulls:
+            records, pruned = prune_null_columns(records)
+
+        raw = json.dumps(records, separators=(',', ':'), default=_json_default, allow_nan=False).encode('utf-8')
+        body, encoding = self._compress(raw)
+        params = {'on_conflict': on_conflict} if on_conflict else {}
+        if pruned:
+            params['columns'] = ','.join(columns)
+        return {'table': table, 'raw': raw, 'body': body, 'encoding': encoding, 'params': params,
+                'rows': len(records), 'pruned': len(pruned), 'seconds': time.perf_counter() - start}
+
+    def send(self, batch):
+        """Envía un lote de prepare(); lanza TransportError si el servidor responde con error"""
+        start = time.perf_counter()
+        table, params = batch['table'], batch['params']
+        body, encoding = batch['body'], batch['encoding']
+        if encoding and self.compression is None:
+            # Preparado antes de desactivar la compresión
+            body, encoding = batch['raw'], None
+
+        response = self._post(table, body, params, encoding)
+        if encoding and response.status_code in (400, 415) and not self._compression_confirmed:
+            # El servidor (o el gateway) no acepta cuerpos comprimidos: se desactiva para la sesión
+            print(f"   ⚠️  El servidor rechazó Content-Encoding: {encoding}; se envía sin comprimir")
+            self.compression = None
+            body, encoding = batch['raw'], None
+            response = self._post(table, body, params, encoding)
+        if response.status_code >= 300:
+            raise TransportError(response.status_code, response.text[:500])
+        if encoding:
+            self._compression_confirmed = True
+
+        self.stats['batches'] += 1
+        self.stats['rows'] += batch['rows']
+        self.stats['raw_bytes'] += len(batch['raw'])
+        self.stats['wire_bytes'] += len(body)
+        self.stats['seconds'] += batch['seconds'] + time.perf_counter() - start
+        self.stats['pruned_columns'] += batch['pruned']
+        return response
+
+    def upsert(self, table, records, on_conflict=None):
+        """Upsert de un lote (lista de dicts); lanza TransportError si el servidor responde con error"""
+        return self.send(self.prepare(table, records, on_conflict))
+
+    def summary(self):
+        stats = self.stats
+        ratio = stats['wire_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 1.0
+        per_batch = stats['seconds'] / stats['batches'] * 1000 if stats['batches'] else 0.0
+        protocol = 'HTTP/2' if self.http2 else 'HTTP/1.1'
+        print(f"   📡 {protocol}, {self.compression or 'sin compresión'}: {stats['batches']} lotes, "
+              f"{stats['rows']:,} filas, {stats['raw_bytes'] / 1e6:.2f} MB JSON → "
+              f"{stats['wire_bytes'] / 1e6:.2f} MB enviados ({ratio:.1%}), {per_batch:.1f} ms/lote")
+        return stats
+
+    def close(self):
+        self.client.close()
+
+
+# ----------------------------------------------------------------------
+# Benchmark contra un servidor mock local (PostgREST simplificado)
+# ----------------------------------------------------------------------
+
+def _start_mock_server(delay=0.0):
+    """Servidor PostgREST mock; delay = segundos por POST (latencia de red + escritura en la base)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+
+    received = {'rows': 0, 'bytes': 0, 'connections': set()}
+
+    class MockPostgrest(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            encoding = self.headers.get('Content-Encoding')
+            if encoding == 'gzip':
+                body = gzip.decompress(body)
+            elif encoding == 'zstd':
+                import zstandard
+                body = zstandard.ZstdDecompressor().decompress(body)
+            records = json.loads(body)
+            received['bytes'] += int(self.headers['Content-Length'])
+            received['connections'].add(self.client_address)
+            if delay:
+                time.sleep(delay)
+            conflict = parse_qs(urlparse(self.path).query).get('on_conflict')
+            if conflict:
+                # Como PostgreSQL: un upsert no puede tocar dos veces la misma fila
+                columns = conflict[0].split(',')
+                keys = [tuple(record.get(column) for column in columns) for record in records]
+                if len(set(keys)) < len(keys):
+                    error = json.dumps({'code': '21000', 'message': 'ON CONFLICT DO UPDATE command cannot '
+                                        'affect row a second time'}).encode()
+                    self.send_response(500)
+                    self.send_header('Content-Length', str(len(error)))
+                    self.end_headers()
+                    self.wfile.write(error)
+                    return
+            received['rows'] += len(records)
+            self.send_response(201)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockPostgrest)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+
+def benchmark(csv_path='processed_fraud_transactions.csv', table='fraud_transactions', batch_size=5000,
+              max_rows=100_000):
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, nrows=max_rows, low_memory=False)
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    print(f"📊 Benchmark de transporte: {csv_path} ({len(records):,} filas, lotes de {batch_size:,})")
+
+    modes = ['none', 'gzip'] + (['zstd'] if importlib.util.find_spec('zstandard') else [])
+    for mode in modes:
+        server, received = _start_mock_server()
+        transport = SupabaseTransport(f'http://127.0.0.1:{server.server_port}', 'mock-key',
+                                      compression=mode, http2=False)
+        for i in range(0, len(records), batch_size):
+            transport.upsert(table, records[i:i + batch_size])
+        transport.summary()
+        print(f"      servidor: {received['rows']:,} filas, {len(received['connections'])} conexión(es) TCP")
+        transport.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        benchmark(*sys.argv[2:4])
+    else:
+        print("Uso: python supabase_transport.py bench [csv] [tabla]")
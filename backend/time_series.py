@@ -0,0 +1,196 @@
+"""
+Series temporales multi-resolución para los gráficos de los dashboards
+Para cada serie (ingresos diarios de retail, performance digital por canal, KPIs diarios
+de fraude) se precalculan agregados por día, semana y mes y versiones diarias reducidas
+con LTTB (Largest-Triangle-Three-Buckets) a un máximo de N puntos por medida. Se escriben
+junto a los snapshots (public/snapshots/, nombre con hash de contenido) y se registran en
+manifest.json bajo 'series'; dashboard-app/lib/snapshots.ts (loadSeries) elige la
+resolución cuyo número de puntos en el rango seleccionado cabe en el ancho del gráfico.
+
+    python time_series.py [serie ...]
+"""
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dashboard_snapshots import SNAPSHOT_DIR, SNAPSHOT_SCHEMA_VERSION, write_bundle
+
+
+LTTB_POINTS = [200, 500, 1000]
+# Inicio de cada período: semanas ISO (lunes) y meses calendario
+RESOLUTIONS = {'day': 'D', 'week': 'W-SUN', 'month': 'M'}
+
+# serie -> CSV, columna de fecha, dimensión opcional, medidas aditivas {columna: nombre}
+# y ratios derivados {nombre: (numerador, denominador, factor)}
+SERIES = {
+    'retail_revenue': {
+        'source': 'processed_retail_transactions.csv', 'date': 'Date', 'dimension': None,
+        'measures': {'Total Amount': 'revenue', 'Gross_Profit': 'profit', 'Total_COGS': 'cost',
+                     None: 'transactions'},
+        'ratios': {'margin': ('profit', 'revenue', 100)},
+    },
+    'digital_channels': {
+        'source': 'digital_performance_data.csv', 'date': 'Date', 'dimension': 'Channel',
+        'measures': {'Spend': 'spend', 'Revenue': 'revenue', 'Clicks': 'clicks', 'Leads': 'leads',
+                     'New_Customers': 'new_customers'},
+        'ratios': {'cac': ('spend', 'new_customers', 1), 'roi': ('revenue', 'spend', 100)},
+    },
+    'fraud_daily': {
+        'source': 'processed_fraud_daily_kpis.csv', 'date': 'date', 'dimension': None,
+        'measures': {'total_transactions': 'transactions', 'total_amount': 'amount',
+                     'fraud_count': 'fraud_count', 'fraud_amount': 'fraud_amount'},
+        'ratios': {'fraud_rate': ('fraud_count', 'transactions', 100)},
+    },
+}
+
+
+def lttb(x, y, threshold):
+    """Índices de los puntos elegidos por Largest-Triangle-Three-Buckets (incluye extremos)"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Buckets intermedios (el primero y el último punto se conservan siempre)
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Promedio del bucket siguiente como tercer vértice del triángulo
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def load_daily(df, spec):
+    """Serie diaria con las medidas aditivas (una fila por día y dimensión)"""
+    dates = pd.to_datetime(df[spec['date']]).dt.normalize()
+    frame = pd.DataFrame({'date': dates})
+    if spec['dimension']:
+        frame['dimension'] = df[spec['dimension']].fillna('Unknown').astype(str)
+    for column, name in spec['measures'].items():
+        frame[name] = 1 if column is None else pd.to_numeric(df[column], errors='coerce').fillna(0)
+    keys = ['date'] + (['dimension'] if spec['dimension'] else [])
+    return frame.groupby(keys, sort=True).sum().reset_index()
+
+
+def _add_ratios(frame, spec):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, (numerator, denominator, factor) in spec['ratios'].items():
+            ratio = frame[numerator] / frame[denominator] * factor
+            frame[name] = ratio.where(np.isfinite(ratio)).round(2)
+    return frame
+
+
+def resample(daily, spec, resolution):
+    """Agrega la serie diaria por período (fecha = inicio del período) y recalcula los ratios"""
+    frame = daily.copy()
+    if resolution != 'day':
+        frame['date'] = frame['date'].dt.to_period(RESOLUTIONS[resolution]).dt.start_time
+        keys = ['date'] + (['dimension'] if spec['dimension'] else [])
+        frame = frame.groupby(keys, sort=True).sum().reset_index()
+    return _add_ratios(frame, spec)
+
+
+def _records(frame, spec, columns):
+    out = frame.rename(columns={'dimension': spec['dimension'].lower()} if spec['dimension'] else {})
+    out['date'] = out['date'].dt.strftime('%Y-%m-%d')
+    out = out[['date'] + ([spec['dimension'].lower()] if spec['dimension'] else []) + columns]
+    return out.round(2).astype(object).where(out.notna(), None).to_dict('records')
+
+
+def downsample(day, spec, points):
+    """LTTB por medida y línea: {medida: {dimensión o 'total': [[fecha, valor], ...]}}"""
+    measures = list(spec['measures'].values()) + list(spec['ratios'])
+    groups = day.groupby('dimension', sort=False) if spec['dimension'] else [('total', day)]
+    result = {measure: {} for measure in measures}
+    for name, group in groups:
+        x = group['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        dates = group['date'].dt.strftime('%Y-%m-%d').to_numpy()
+        for measure in measures:
+            values = group[measure].round(2)
+            picked = lttb(x, values.fillna(0).to_numpy(), points)
+            result[measure][name] = [[dates[i], None if pd.isna(values.iat[i]) else float(values.iat[i])]
+                                     for i in picked]
+    return result
+
+
+def build_series(df, spec, lttb_points=LTTB_POINTS):
+    """{resolución: (data, puntos por dimensión)} para una serie"""
+    daily = load_daily(df, spec)
+    columns = list(spec['measures'].values()) + list(spec['ratios'])
+    built = {}
+    for resolution in RESOLUTIONS:
+        frame = resample(daily, spec, resolution)
+        points = int(frame.groupby('dimension').size().max()) if spec['dimension'] else len(frame)
+        built[resolution] = (_records(frame, spec, columns), points)
+        if resolution == 'day':
+            day = frame
+
+    days = built['day'][1]
+    for points in lttb_points:
+        if points < days:
+            built[f'lttb{points}'] = (downsample(day, spec, points), points)
+    return built, {'min': daily['date'].min().strftime('%Y-%m-%d'), 'max': daily['date'].max().strftime('%Y-%m-%d')}
+
+
+def export_series(data_dir='.', output_dir=SNAPSHOT_DIR, series=None, loader=None):
+    """Escribe los bundles de cada serie/resolución y los registra en manifest.json ('series')"""
+    print("\n" + "="*80)
+    print("📈 GENERANDO SERIES MULTI-RESOLUCIÓN")
+    print("="*80)
+
+    data_dir, output_dir = Path(data_dir), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {'dashboards': {}}
+    manifest.setdefault('series', {})
+    generated_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    for name in series or SERIES:
+        spec = SERIES[name]
+        path = data_dir / spec['source']
+        if not path.exists():
+            print(f"   ⚠️  {name}: falta {path.name}, se conservan las series anteriores")
+            continue
+
+        df = loader(path) if loader else pd.read_csv(path, low_memory=False)
+        built, date_limit = build_series(df, spec)
+        entries = {}
+        for resolution, (data, points) in built.items():
+            bundle_name = f"series-{name}-{resolution}"
+            entry = write_bundle(bundle_name, data, date_limit, output_dir)
+            entry['points'] = points
+            entries[resolution] = entry
+            for stale in output_dir.glob(f"{bundle_name}.*.json*"):
+                if not stale.name.startswith(entry['file']):
+                    stale.unlink()
+        manifest['series'][name] = {'dateLimit': date_limit, 'resolutions': entries}
+
+        sizes = ', '.join(f"{res} {entry['points']} pts/{entry['gzip_bytes'] / 1024:.1f} KB"
+                          for res, entry in entries.items())
+        print(f"   ✅ {name}: {sizes}")
+
+    manifest['schemaVersion'] = SNAPSHOT_SCHEMA_VERSION
+    manifest['generated_at'] = generated_at
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False))
+    print(f"   📄 Manifest: {manifest_path}")
+    return manifest
+
+
+if __name__ == "__main__":
+    export_series(series=sys.argv[1:] or None)
@@ -0,0 +1,158 @@
+"""
+Deduplicación por hash antes del upsert
+PostgREST rechaza el lote completo si trae dos veces la misma clave de on_conflict
+("ON CONFLICT DO UPDATE command cannot affect row a second time"). Antes de subir, cada
+tabla se deduplica por el hash de 64 bits de su clave con semántica last-wins (gana la
+última aparición, como si los upserts se aplicaran en orden). Si una clave repite con filas
+distintas se avisa cuántas: suele indicar que la clave no es la única real de la tabla.
+
+UploadDeduplicator además guarda, por tabla, el set ordenado de hashes de clave con el
+hash de fila de la última versión enviada (.upload_dedup/<tabla>.npz). Sirve entre chunks
+y entre corridas: informa claves repetidas respecto de lo ya enviado y, con
+skip_unchanged=True, omite filas idénticas a las que ya se subieron.
+
+    python upload_dedup.py info     -> tablas con hashes guardados
+    python upload_dedup.py clear    -> borra los sets (la próxima carga sube todo)
+"""
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+DEDUP_DIR = Path(os.getenv('UPLOAD_DEDUP_DIR', '.upload_dedup'))
+# Clave fija de hash_pandas_object: los hashes deben ser los mismos en todas las corridas
+HASH_KEY = 'portfolio-dedup1'
+# Omitir filas idénticas a las de la carga anterior (UPLOAD_SKIP_UNCHANGED=1)
+SKIP_UNCHANGED = os.getenv('UPLOAD_SKIP_UNCHANGED', '0') == '1'
+
+
+def row_hashes(df, columns=None):
+    """Hash de 64 bits por fila (de las columnas dadas o de la fila completa)"""
+    frame = df if columns is None else df[list(columns)]
+    return pd.util.hash_pandas_object(frame, index=False, hash_key=HASH_KEY).to_numpy()
+
+
+def _repeated_keys(df, key_columns, label=None):
+    """(hashes de clave, máscara last-wins, claves repetidas con filas distintas)"""
+    keys = row_hashes(df, key_columns)
+    keep = ~pd.Series(keys).duplicated(keep='last').to_numpy()
+    conflicting = 0
+    if not keep.all():
+        versions = pd.DataFrame({'key': keys, 'row': row_hashes(df)}).drop_duplicates()
+        conflicting = int(versions['key'].duplicated().sum())
+        if conflicting:
+            print(f"   ⚠️  {label or 'Tabla'}: {conflicting:,} claves de {list(key_columns)} aparecen con filas "
+                  f"distintas; gana la última (¿falta una columna en la clave única?)")
+    return keys, keep, conflicting
+
+
+def drop_duplicate_keys(df, key_columns, label=None):
+    """Deja la última aparición de cada clave; devuelve (df, filas descartadas)"""
+    _, keep, _ = _repeated_keys(df, key_columns, label)
+    dropped = int(len(df) - keep.sum())
+    return (df[keep] if dropped else df), dropped
+
+
+class UploadDeduplicator:
+    def __init__(self, table, key_columns, directory=DEDUP_DIR, persist=True):
+        self.table = table
+        self.key_columns = list(key_columns)
+        self.path = Path(directory) / f"{table}.npz" if persist else None
+        if self.path is not None and self.path.exists():
+            with np.load(self.path, allow_pickle=False) as data:
+                self.sorted_keys = data['sorted_keys']
+                self.sent_rows = data['sent_rows']
+        else:
+            self.sorted_keys = np.array([], dtype=np.uint64)
+            self.sent_rows = np.array([], dtype=np.uint64)
+        self._pending = []
+        self.stats = {'rows': 0, 'duplicates': 0, 'conflicting': 0, 'seen_before': 0, 'unchanged': 0, 'skipped': 0}
+
+    def _find(self, keys):
+        """Posición de cada clave en el set y si ya existe"""
+        positions = np.searchsorted(self.sorted_keys, keys)
+        if not len(self.sorted_keys):
+            return positions, np.zeros(len(keys), dtype=bool)
+        found = self.sorted_keys[np.minimum(positions, len(self.sorted_keys) - 1)] == keys
+        return positions, found
+
+    def _merge_pending(self):
+        """Fusiona en el set ordenado las claves nuevas acumuladas por mark_sent"""
+        if not self._pending:
+            return
+        new_keys = np.concatenate([keys for keys, _ in self._pending])
+        new_rows = np.concatenate([rows for _, rows in self._pending])
+        self._pending = []
+        # Una clave enviada en dos lotes distintos: vale la última versión
+        last = ~pd.Series(new_keys).duplicated(keep='last').to_numpy()
+        merged_keys = np.concatenate([self.sorted_keys, new_keys[last]])
+        order = np.argsort(merged_keys, kind='mergesort')
+        self.sorted_keys = merged_keys[order]
+        self.sent_rows = np.concatenate([self.sent_rows, new_rows[last]])[order]
+
+    def filter(self, df, skip_unchanged=False):
+        """Quita claves repetidas (last-wins) y, opcionalmente, filas ya enviadas sin cambios"""
+        self._merge_pending()
+        keys, keep, conflicting = _repeated_keys(df, self.key_columns, self.table)
+        self.stats['rows'] += len(df)
+        self.stats['duplicates'] += int(len(df) - keep.sum())
+        self.stats['conflicting'] += conflicting
+
+        df, keys = df[keep], keys[keep]
+        rows = row_hashes(df)
+        positions, found = self._find(keys)
+        unchanged = found.copy()
+        unchanged[found] = self.sent_rows[positions[found]] == rows[found]
+        self.stats['seen_before'] += int(found.sum())
+        self.stats['unchanged'] += int(unchanged.sum())
+
+        if skip_unchanged and unchanged.any():
+            self.stats['skipped'] += int(unchanged.sum())
+            df = df[~unchanged]
+        return df
+
+    def mark_sent(self, df):
+        """Registra las filas subidas con éxito (clave -> hash de fila)"""
+        keys = row_hashes(df, self.key_columns)
+        rows = row_hashes(df)
+        positions, found = self._find(keys)
+        self.sent_rows[positions[found]] = rows[found]
+        if not found.all():
+            self._pending.append((keys[~found], rows[~found]))
+
+    def save(self):
+        self._merge_pending()
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.stem + '.tmp.npz')
+        np.savez(tmp_path, sorted_keys=self.sorted_keys, sent_rows=self.sent_rows)
+        os.replace(tmp_path, self.path)
+
+    def report(self):
+        stats = self.stats
+        if stats['duplicates']:
+            print(f"   🧹 {stats['duplicates']:,} filas con clave repetida descartadas (gana la última; "
+                  f"{stats['conflicting']:,} claves con filas distintas)")
+        if stats['skipped']:
+            print(f"   ⏭️  {stats['skipped']:,} filas sin cambios respecto de la carga anterior omitidas")
+        elif stats['seen_before']:
+            print(f"   ♻️  {stats['seen_before']:,} claves ya enviadas antes ({stats['unchanged']:,} sin cambios)")
+        return stats
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'info'
+    files = sorted(DEDUP_DIR.glob('*.npz')) if DEDUP_DIR.exists() else []
+
+    if command == 'clear':
+        for path in files:
+            path.unlink()
+        print(f"✅ {len(files)} sets de hashes borrados de {DEDUP_DIR}")
+    else:
+        for path in files:
+            with np.load(path, allow_pickle=False) as data:
+                print(f"   {path.stem}: {len(data['sorted_keys']):,} claves ({path.stat().st_size / 1024:.0f} KB)")
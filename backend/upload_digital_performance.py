@@ -3,15 +3,126 @@
 Script específico para subir datos de Digital Performance a Supabase
 Incluye cálculo automático de KPIs de marketing digital
 """
+import numpy as np
 import pandas as pd
 import os
 import sys
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 
+from supabase_transport import get_supabase_client, get_transport
+
 # Cargar variables de entorno
 load_dotenv()
 
+# Objetos SQL de la sección 6b de supabase_schemas.sql
+KPI_REFRESH_FUNCTION = 'refresh_digital_performance_kpis'
+KPI_MATERIALIZED_VIEW = 'mv_digital_performance_monthly_kpis'
+
+KPI_VALUE_COLUMNS = [
+    'total_spend', 'total_impressions', 'total_clicks', 'total_leads', 'total_new_customers',
+    'total_revenue', 'total_churned_customers', 'avg_active_customers', 'cac', 'arpu',
+    'conversion_rate_clicks_to_leads', 'conversion_rate_leads_to_customers', 'churn_rate',
+    'ltv', 'ltv_cac_ratio'
+]
+# Filas por página al leer de PostgREST (su tope por defecto es 1000 filas por respuesta)
+READ_PAGE_SIZE = 1000
+
+
+def compute_monthly_kpis(df):
+    """
+    KPIs mensuales por canal en pandas (respaldo de refresh_digital_performance_kpis).
+    Mismas fórmulas que mv_digital_performance_monthly_kpis.
+    """
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    for col in ['spend', 'revenue']:
+        df[col] = df[col].astype(float)
+    
+    monthly_kpis = []
+    
+    for channel in df['channel'].unique():
+        channel_data = df[df['channel'] == channel].copy()
+        
+        # Agrupar por mes
+        channel_data['year_month'] = channel_data['date'].dt.to_period('M')
+        
+        for period, group in channel_data.groupby('year_month'):
+            period_start = period.start_time.strftime('%Y-%m-%d')
+            period_end = period.end_time.strftime('%Y-%m-%d')
+            
+            # Calcular métricas agregadas
+            total_spend = float(group['spend'].sum())
+            total_impressions = int(group['impressions'].sum())
+            total_clicks = int(group['clicks'].sum())
+            total_leads = int(group['leads'].sum())
+            total_new_customers = int(group['new_customers'].sum())
+            total_revenue = float(group['revenue'].sum())
+            total_churned = int(group['churned_customers'].sum())
+            avg_active_customers = float(group['active_customers_start_of_day'].mean())
+            
+            # Calcular KPIs según las fórmulas que mencionaste
+            cac = total_spend / total_new_customers if total_new_customers > 0 else None
+            arpu = total_revenue / avg_active_customers if avg_active_customers > 0 else None
+            conv_clicks_leads = total_leads / total_clicks if total_clicks > 0 else None
+            conv_leads_customers = total_new_customers / total_leads if total_leads > 0 else None
+            churn_rate = total_churned / avg_active_customers if avg_active_customers > 0 else None
+            
+            # LTV = ARPU / Churn Rate (como mencionaste)
+            ltv = arpu / churn_rate if arpu and churn_rate and churn_rate > 0 else None
+            
+            # LTV/CAC Ratio (KPI de salud del negocio)
+            ltv_cac_ratio = ltv / cac if ltv and cac and cac > 0 else None
+            
+            monthly_kpis.append({
+                'channel': channel,
+                'period_start': period_start,
+                'period_end': period_end,
+                'period_type': 'monthly',
+                'total_spend': total_spend,
+                'total_impressions': total_impressions,
+                'total_clicks': total_clicks,
+                'total_leads': total_leads,
+                'total_new_customers': total_new_customers,
+                'total_revenue': total_revenue,
+                'total_churned_customers': total_churned,
+                'avg_active_customers': int(avg_active_customers),
+                'cac': round(cac, 2) if cac else None,
+                'arpu': round(arpu, 2) if arpu else None,
+                'conversion_rate_clicks_to_leads': round(conv_clicks_leads, 4) if conv_clicks_leads else None,
+                'conversion_rate_leads_to_customers': round(conv_leads_customers, 4) if conv_leads_customers else None,
+                'churn_rate': round(churn_rate, 4) if churn_rate else None,
+                'ltv': round(ltv, 2) if ltv else None,
+                'ltv_cac_ratio': round(ltv_cac_ratio, 2) if ltv_cac_ratio else None
+            })
+    
+    return monthly_kpis
+
+
+def compare_kpis(local, server, atol=0.011):
+    """
+    Compara KPIs mensuales (pandas vs Postgres) por canal y period_start.
+    Devuelve (períodos en un solo lado, {columna: diferencias}, períodos comparados)
+    """
+    keys = ['channel', 'period_start']
+    local, server = local.copy(), server.copy()
+    for df in (local, server):
+        df['period_start'] = df['period_start'].astype(str)
+    merged = local.merge(server, on=keys, how='outer', suffixes=('_pandas', '_sql'), indicator=True)
+    
+    missing = merged[merged['_merge'] != 'both']
+    both = merged[merged['_merge'] == 'both']
+    mismatches = {}
+    for col in KPI_VALUE_COLUMNS:
+        a = pd.to_numeric(both[f'{col}_pandas'].astype(object), errors='coerce').astype(float)
+        b = pd.to_numeric(both[f'{col}_sql'].astype(object), errors='coerce').astype(float)
+        # Tolerancia por redondeo (Python redondea a par, Postgres hacia afuera)
+        diff = ~(np.isclose(a, b, rtol=1e-6, atol=atol) | (a.isna() & b.isna()))
+        if diff.any():
+            mismatches[col] = int(diff.sum())
+    return missing, mismatches, len(both)
+
+
 class DigitalPerformanceUploader:
     def __init__(self):
         self.url = os.getenv('SUPABASE_URL')
@@ -20,9 +131,23 @@ class DigitalPerformanceUploader:
         if not self.url or not self.key:
             raise ValueError("❌ ERROR: SUPABASE_URL y SUPABASE_KEY deben estar configurados en .env")
         
-        self.supabase: Client = create_client(self.url, self.key)
+        # Cliente y transporte compartidos (pool keep-alive, cuerpos comprimidos)
+        self.supabase: Client = get_supabase_client(self.url, self.key)
+        self.transport = get_transport(self.url, self.key)
         print("✅ Conectado a Supabase")
     
+    def fetch_all(self, table, order, page_size=READ_PAGE_SIZE):
+        """Lee la tabla completa por páginas con .range() (un select('*') se corta en el tope de PostgREST)"""
+        rows = []
+        while True:
+            query = self.supabase.table(table).select('*')
+            for column in order:
+                query = query.order(column)
+            page = query.range(len(rows), len(rows) + page_size - 1).execute().data
+            rows.extend(page)
+            if len(page) < page_size:
+                return pd.DataFrame(rows)
+    
     def upload_digital_data(self, csv_file_path: str):
         """Sube datos de performance digital desde CSV"""
         print("\n" + "="*80)
@@ -84,7 +209,7 @@ class DigitalPerformanceUploader:
             for i in range(0, len(records), batch_size):
                 batch = records[i:i + batch_size]
                 try:
-                    response = self.supabase.table('digital_performance_data').upsert(batch).execute()
+                    self.transport.upsert('digital_performance_data', batch)
                     total_uploaded += len(batch)
                     print(f"   ✅ Lote {i//batch_size + 1}: {len(batch)} registros subidos ({total_uploaded:,}/{len(records):,})")
                 except Exception as e:
@@ -111,83 +236,38 @@ class DigitalPerformanceUploader:
             return False
     
     def calculate_and_upload_kpis(self):
-        """Calcula y sube KPIs agregados de Digital Performance"""
+        """Calcula KPIs en Postgres (vista materializada); si no está instalada, usa pandas"""
         print("\n" + "="*80)
         print("📈 CALCULANDO Y SUBIENDO KPIs DE DIGITAL PERFORMANCE")
         print("="*80)
         
+        try:
+            print("   🗄️  Refrescando KPIs en el servidor (refresh_digital_performance_kpis)...")
+            response = self.supabase.rpc(KPI_REFRESH_FUNCTION).execute()
+            print(f"   ✅ KPIs calculados en Postgres: {response.data} registros en digital_performance_kpis")
+            return True
+        except Exception as e:
+            print(f"   ⚠️  Cálculo en servidor no disponible ({str(e)})")
+            print("   💡 Ejecuta la sección 6b de supabase_schemas.sql para instalarlo "
+                  "(solo service_role puede ejecutarlo)")
+            print("   ↩️  Usando cálculo en pandas como respaldo")
+            return self.calculate_and_upload_kpis_pandas()
+    
+    def calculate_and_upload_kpis_pandas(self):
+        """Calcula y sube KPIs agregados de Digital Performance (descarga los datos crudos)"""
         try:
             # Leer datos desde Supabase
             print("   📥 Descargando datos desde Supabase...")
-            response = self.supabase.table('digital_performance_data').select('*').execute()
+            df = self.fetch_all('digital_performance_data', ['id'])
             
-            if not response.data:
+            if df.empty:
                 print("❌ No hay datos en digital_performance_data para calcular KPIs")
                 return False
             
-            df = pd.DataFrame(response.data)
-            df['date'] = pd.to_datetime(df['date'])
             print(f"   📦 Registros procesados: {len(df):,}")
             
-            # Calcular KPIs mensuales por canal
-            monthly_kpis = []
-            
             print("   🧮 Calculando KPIs por canal y mes...")
-            
-            for channel in df['channel'].unique():
-                channel_data = df[df['channel'] == channel].copy()
-                
-                # Agrupar por mes
-                channel_data['year_month'] = channel_data['date'].dt.to_period('M')
-                
-                for period, group in channel_data.groupby('year_month'):
-                    period_start = period.start_time.strftime('%Y-%m-%d')
-                    period_end = period.end_time.strftime('%Y-%m-%d')
-                    
-                    # Calcular métricas agregadas
-                    total_spend = float(group['spend'].sum())
-                    total_impressions = int(group['impressions'].sum())
-                    total_clicks = int(group['clicks'].sum())
-                    total_leads = int(group['leads'].sum())
-                    total_new_customers = int(group['new_customers'].sum())
-                    total_revenue = float(group['revenue'].sum())
-                    total_churned = int(group['churned_customers'].sum())
-                    avg_active_customers = float(group['active_customers_start_of_day'].mean())
-                    
-                    # Calcular KPIs según las fórmulas que mencionaste
-                    cac = total_spend / total_new_customers if total_new_customers > 0 else None
-                    arpu = total_revenue / avg_active_customers if avg_active_customers > 0 else None
-                    conv_clicks_leads = total_leads / total_clicks if total_clicks > 0 else None
-                    conv_leads_customers = total_new_customers / total_leads if total_leads > 0 else None
-                    churn_rate = total_churned / avg_active_customers if avg_active_customers > 0 else None
-                    
-                    # LTV = ARPU / Churn Rate (como mencionaste)
-                    ltv = arpu / churn_rate if arpu and churn_rate and churn_rate > 0 else None
-                    
-                    # LTV/CAC Ratio (KPI de salud del negocio)
-                    ltv_cac_ratio = ltv / cac if ltv and cac and cac > 0 else None
-                    
-                    monthly_kpis.append({
-                        'channel': channel,
-                        'period_start': period_start,
-                        'period_end': period_end,
-                        'period_type': 'monthly',
-                        'total_spend': total_spend,
-                        'total_impressions': total_impressions,
-                        'total_clicks': total_clicks,
-                        'total_leads': total_leads,
-                        'total_new_customers': total_new_customers,
-                        'total_revenue': total_revenue,
-                        'total_churned_customers': total_churned,
-                        'avg_active_customers': int(avg_active_customers),
-                        'cac': round(cac, 2) if cac else None,
-                        'arpu': round(arpu, 2) if arpu else None,
-                        'conversion_rate_clicks_to_leads': round(conv_clicks_leads, 4) if conv_clicks_leads else None,
-                        'conversion_rate_leads_to_customers': round(conv_leads_customers, 4) if conv_leads_customers else None,
-                        'churn_rate': round(churn_rate, 4) if churn_rate else None,
-                        'ltv': round(ltv, 2) if ltv else None,
-                        'ltv_cac_ratio': round(ltv_cac_ratio, 2) if ltv_cac_ratio else None
-                    })
+            monthly_kpis = compute_monthly_kpis(df)
             
             if monthly_kpis:
                 print(f"   📊 KPIs calculados: {len(monthly_kpis)} registros")
@@ -199,7 +279,8 @@ class DigitalPerformanceUploader:
                 
                 # Subir KPIs
                 try:
-                    response = self.supabase.table('digital_performance_kpis').upsert(monthly_kpis).execute()
+                    self.transport.upsert('digital_performance_kpis', monthly_kpis,
+                                          on_conflict='channel,period_start,period_end,period_type')
                     print(f"   ✅ KPIs subidos exitosamente")
                     return True
                 except Exception as e:
@@ -215,6 +296,31 @@ class DigitalPerformanceUploader:
             traceback.print_exc()
             return False
     
+    def check_kpi_parity(self, atol=0.011):
+        """Compara los KPIs calculados en Postgres con el cálculo en pandas sobre los mismos datos"""
+        print("\n" + "="*80)
+        print("⚖️  PARIDAD DE KPIs: POSTGRES vs PANDAS")
+        print("="*80)
+        
+        try:
+            raw = self.fetch_all('digital_performance_data', ['id'])
+            server = self.fetch_all(KPI_MATERIALIZED_VIEW, ['channel', 'period_start'])
+        except Exception as e:
+            print(f"   ❌ No se pudieron leer los datos: {str(e)}")
+            return False
+        print(f"   📥 {len(raw):,} filas crudas, {len(server):,} períodos en la vista")
+        
+        local = pd.DataFrame(compute_monthly_kpis(raw))
+        missing, mismatches, compared = compare_kpis(local, server, atol)
+        if len(missing):
+            print(f"   ❌ {len(missing)} períodos presentes solo en un lado")
+        for col, count in mismatches.items():
+            print(f"   ❌ {col}: {count} diferencias")
+        
+        ok = len(missing) == 0 and not mismatches
+        print(f"   {'✅' if ok else '❌'} {compared} períodos comparados")
+        return ok
+    
     def verify_upload(self):
         """Verifica que los datos se hayan subido correctamente"""
         print("\n" + "="*80)
@@ -295,6 +401,10 @@ def main():
         # 3. Verificar carga
         uploader.verify_upload()
         
+        # 4. (Opcional) Comparar KPIs de Postgres contra pandas
+        if '--check-parity' in sys.argv:
+            uploader.check_kpi_parity()
+        
         print("\n" + "="*80)
         print("✅ PROCESO COMPLETADO")
         print("="*80)
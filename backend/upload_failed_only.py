@@ -8,7 +8,10 @@ Script para cargar SOLO las tablas que fallaron
 import os
 import pandas as pd
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import Client
+
+from supabase_transport import get_supabase_client, get_transport
+from upload_dedup import drop_duplicate_keys
 
 load_dotenv()
 
@@ -20,7 +23,9 @@ class FailedTablesUploader:
         if not self.url or not self.key:
             raise ValueError("❌ ERROR: SUPABASE_URL y SUPABASE_KEY deben estar configurados en .env")
         
-        self.supabase: Client = create_client(self.url, self.key)
+        # Cliente y transporte compartidos (pool keep-alive, cuerpos comprimidos)
+        self.supabase: Client = get_supabase_client(self.url, self.key)
+        self.transport = get_transport(self.url, self.key)
         print("✅ Conectado a Supabase")
     
     def upload_data(self, df: pd.DataFrame, table_name: str, batch_size: int = 5000) -> bool:
@@ -71,6 +76,13 @@ class FailedTablesUploader:
                     })
                     df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
         
+        # Claves repetidas en un lote hacen fallar el upsert completo: gana la última
+        key_column = {'telco_customers': 'customer_id', 'fraud_transactions': 'transaction_id'}.get(table_name)
+        if key_column in df.columns:
+            df, dropped = drop_duplicate_keys(df, [key_column], table_name)
+            if dropped:
+                print(f"   🧹 {dropped:,} filas con {key_column} repetido descartadas (gana la última)")
+        
         total_rows = len(df)
         errors = []
         
@@ -89,7 +101,7 @@ class FailedTablesUploader:
             batch_num = i // batch_size + 1
             
             try:
-                response = self.supabase.table(table_name).upsert(batch).execute()
+                self.transport.upsert(table_name, batch)
                 print(f"   ✅ Lote {batch_num}: {len(batch)} registros subidos ({min(i + batch_size, total_rows):,}/{total_rows:,})")
             except Exception as e:
                 error_msg = str(e)
@@ -0,0 +1,277 @@
+"""
+Reconciliación de cargas a Supabase por huellas (fingerprints) particionadas
+Para cada tabla y partición (fecha, mes, columna o bucket de la clave) se compara:
+filas, suma de hashes md5 de la clave (independiente del orden) y suma en centavos de
+una columna numérica. La huella local se calcula sobre los CSV procesados y la remota
+con la función SQL table_fingerprints (supabase_schemas.sql, sección 7), en paralelo
+por tabla; solo las particiones distintas se vuelven a subir.
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analytics_store import COLUMN_MAPPINGS, TABLE_SOURCES
+from upload_dedup import drop_duplicate_keys
+
+
+# tabla -> clave, columna numérica, partición (columna, modo) y columnas de on_conflict
+# (cada tabla debe figurar también en la lista permitida de table_fingerprints, supabase_schemas.sql)
+RECONCILE_SPECS = {
+    'retail_transactions': {'key': ['transaction_id'], 'value': 'total_amount',
+                            'partition': ('date', 'month'), 'conflict': 'transaction_id'},
+    'retail_monthly_kpis': {'key': ['period', 'category'], 'value': 'revenue',
+                            'partition': ('period', 'column'), 'conflict': 'period,category'},
+    'retail_rfm_segments': {'key': ['segment'], 'value': 'revenue',
+                            'partition': None, 'conflict': 'segment'},
+    'retail_cohort_retention': {'key': ['cohort', 'months_since_first'], 'value': 'revenue',
+                                'partition': ('cohort', 'column'), 'conflict': 'cohort,months_since_first'},
+    'airlines_flights': {'key': ['airline', 'flight', 'class', 'days_left', 'departure_time', 'stops'],
+                         'value': 'price', 'partition': ('route', 'column'), 'conflict': None},
+    'airlines_route_kpis': {'key': ['route', 'airline'], 'value': 'total_revenue',
+                            'partition': None, 'conflict': 'route,airline'},
+    'airlines_price_quantiles': {'key': ['route', 'airline', 'class', 'booking_window', 'measure'], 'value': 'mean',
+                                 'partition': ('route', 'column'),
+                                 'conflict': 'route,airline,class,booking_window,measure'},
+    'airlines_price_histograms': {'key': ['route', 'airline', 'class', 'booking_window', 'measure', 'bin_index'],
+                                  'value': 'count', 'partition': ('route', 'column'),
+                                  'conflict': 'route,airline,class,booking_window,measure,bin_index'},
+    'airlines_fare_curve_params': {'key': ['route', 'class'], 'value': 'rmse',
+                                   'partition': None, 'conflict': 'route,class'},
+    'airlines_fare_curves': {'key': ['route', 'class', 'days_left'], 'value': 'fitted_price',
+                             'partition': ('route', 'column'), 'conflict': 'route,class,days_left'},
+    'telco_customers': {'key': ['customer_id'], 'value': 'monthly_charges',
+                        'partition': ('bucket', 16), 'conflict': 'customer_id'},
+    'telco_segment_kpis': {'key': ['contract', 'tenure_segment', 'arpu_segment'], 'value': 'revenue_at_risk',
+                           'partition': None, 'conflict': 'contract,tenure_segment,arpu_segment'},
+    'telco_churn_scenarios': {'key': ['scenario_id', 'arpu_segment', 'tenure_segment'],
+                              'value': 'net_monthly_impact_mean', 'partition': ('arpu_segment', 'column'),
+                              'conflict': 'scenario_id,arpu_segment,tenure_segment'},
+    'top_k_rankings': {'key': ['domain', 'dimension', 'rank'], 'value': 'value',
+                       'partition': ('domain', 'column'), 'conflict': 'domain,dimension,rank'},
+    'fraud_transactions': {'key': ['transaction_id'], 'value': 'amount',
+                           'partition': ('date', 'column'), 'conflict': 'transaction_id'},
+    'fraud_daily_kpis': {'key': ['date'], 'value': 'total_amount', 'partition': None, 'conflict': 'date'},
+    'fraud_merchant_kpis': {'key': ['merchant', 'merchant_category', 'merchant_type'], 'value': 'total_amount',
+                            'partition': None, 'conflict': 'merchant,merchant_category,merchant_type'},
+    'fraud_country_kpis': {'key': ['country'], 'value': 'total_amount', 'partition': None, 'conflict': 'country'},
+    'fraud_hourly_patterns': {'key': ['hour'], 'value': 'total_amount', 'partition': None, 'conflict': 'hour'},
+    'fraud_link_components': {'key': ['component_id'], 'value': 'total_amount', 'partition': None,
+                              'conflict': 'component_id'},
+    'fraud_dim_transactions': {'key': ['id'], 'value': 'id', 'partition': ('bucket', 16), 'conflict': 'id'},
+    'fraud_dim_customers': {'key': ['id'], 'value': 'id', 'partition': None, 'conflict': 'id'},
+    'fraud_dim_cards': {'key': ['id'], 'value': 'id', 'partition': None, 'conflict': 'id'},
+    'fraud_dim_merchants': {'key': ['id'], 'value': 'id', 'partition': None, 'conflict': 'id'},
+    'fraud_dim_devices': {'key': ['id'], 'value': 'id', 'partition': None, 'conflict': 'id'},
+    'digital_performance_data': {'key': ['date', 'channel'], 'value': 'spend',
+                                 'partition': ('date', 'month'), 'conflict': None},
+    'kpi_anomaly_alerts': {'key': ['series_id', 'date'], 'value': 'value',
+                           'partition': ('date', 'month'), 'conflict': 'series_id,date'},
+}
+
+HASH_BITS = 60
+HALF_BITS = HASH_BITS // 2
+
+
+def _key_strings(df, key_columns):
+    """Equivalente a concat_ws('|', col::text, ...) de Postgres (omite nulos)"""
+    parts = []
+    for col in key_columns:
+        values = df[col]
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+            values = values.astype('Int64')
+        parts.append(values.astype(object).where(values.notna(), None).map(
+            lambda v: None if v is None else str(v)))
+    return ['|'.join(p for p in row if p is not None) for row in zip(*parts)]
+
+
+def _md5_prefix(strings, hex_digits):
+    return np.array([int(hashlib.md5(s.encode('utf-8')).hexdigest()[:hex_digits], 16) for s in strings],
+                    dtype=np.uint64)
+
+
+def _to_cents(values):
+    """ROUND(x * 100) de Postgres (mitades hacia afuera)"""
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+    cents = np.sign(values) * np.floor(np.abs(values) * 100 + 0.5 + 1e-9)
+    return np.nan_to_num(cents).astype(np.int64)
+
+
+def partition_keys(df, spec, keys=None):
+    partition = spec['partition']
+    if partition is None:
+        return np.full(len(df), '*', dtype=object)
+    column, mode = partition
+    if column == 'bucket':
+        buckets = _md5_prefix(keys, 8) % np.uint64(mode)
+        return buckets.astype(str).astype(object)
+    values = df[column].astype(str)
+    if mode == 'month':
+        return values.str[:7].to_numpy(dtype=object)
+    return values.to_numpy(dtype=object)
+
+
+def local_fingerprints(df, spec):
+    """Huella por partición calculada sobre el DataFrame local"""
+    keys = _key_strings(df, spec['key'])
+    hashes = _md5_prefix(keys, HASH_BITS // 4)
+
+    frame = pd.DataFrame({
+        'partition_key': partition_keys(df, spec, keys),
+        # La suma de 60 bits no cabe en int64: se acumula en dos mitades de 30 bits
+        'hash_hi': (hashes >> np.uint64(HALF_BITS)).astype(np.int64),
+        'hash_lo': (hashes & np.uint64((1 << HALF_BITS) - 1)).astype(np.int64),
+        'value_cents': _to_cents(df[spec['value']]),
+    })
+    grouped = frame.groupby('partition_key').agg(
+        row_count=('hash_hi', 'size'), hash_hi=('hash_hi', 'sum'),
+        hash_lo=('hash_lo', 'sum'), value_cents=('value_cents', 'sum'))
+
+    # Enteros de Python (object) para comparar sin pérdida de precisión contra el NUMERIC del servidor
+    grouped['key_hash'] = pd.Series([(int(hi) << HALF_BITS) + int(lo)
+                                     for hi, lo in zip(grouped['hash_hi'], grouped['hash_lo'])],
+                                    index=grouped.index, dtype=object)
+    grouped['value_cents'] = grouped['value_cents'].astype(object).map(int)
+    return grouped[['row_count', 'key_hash', 'value_cents']].astype(object)
+
+
+def server_fingerprints(supabase, table, spec):
+    """Huella por partición calculada en Postgres (RPC table_fingerprints)"""
+    column, mode = spec['partition'] or (None, None)
+    params = {'p_table': table, 'p_key_columns': spec['key'], 'p_value_column': spec['value']}
+    if column == 'bucket':
+        params.update({'p_partition_mode': 'bucket', 'p_buckets': mode})
+    elif column is not None:
+        params.update({'p_partition_column': column, 'p_partition_mode': mode})
+
+    rows = supabase.rpc('table_fingerprints', params).execute().data or []
+    frame = pd.DataFrame(rows, columns=['partition_key', 'row_count', 'key_hash', 'value_cents'])
+    for col in ['row_count', 'key_hash', 'value_cents']:
+        frame[col] = frame[col].map(lambda v: int(v) if v is not None else 0).astype(object)
+    return frame.set_index('partition_key')
+
+
+def compare_fingerprints(local, server):
+    """Devuelve las particiones que no coinciden con el motivo"""
+    merged = local.join(server, how='outer', lsuffix='_local', rsuffix='_server')
+    mismatches = []
+    for partition, row in merged.iterrows():
+        if pd.isna(row['row_count_server']):
+            reason = 'missing_server'
+        elif pd.isna(row['row_count_local']):
+            reason = 'extra_server'
+        elif row['row_count_local'] != row['row_count_server']:
+            reason = 'row_count'
+        elif row['key_hash_local'] != row['key_hash_server']:
+            reason = 'key_hash'
+        elif row['value_cents_local'] != row['value_cents_server']:
+            reason = 'value'
+        else:
+            continue
+        mismatches.append({
+            'partition': partition,
+            'reason': reason,
+            'local_rows': 0 if pd.isna(row['row_count_local']) else int(row['row_count_local']),
+            'server_rows': 0 if pd.isna(row['row_count_server']) else int(row['row_count_server']),
+        })
+    return mismatches
+
+
+class UploadReconciler:
+    def __init__(self, uploader, data_dir='.', sources=None, workers=4):
+        self.uploader = uploader
+        self.supabase = uploader.supabase
+        self.data_dir = Path(data_dir)
+        self.sources = {**TABLE_SOURCES, **(sources or {})}
+        self.workers = workers
+
+    def load_local(self, table):
+        paths = [self.data_dir / name for name in self.sources[table] if (self.data_dir / name).exists()]
+        if not paths:
+            return None
+        df = pd.concat([pd.read_csv(path, low_memory=False) for path in paths], ignore_index=True)
+        if table in COLUMN_MAPPINGS:
+            df = df.rename(columns=COLUMN_MAPPINGS[table])
+        # Mismas filas que llegan al servidor: upload_data descarta claves repetidas (last-wins)
+        conflict = RECONCILE_SPECS[table]['conflict']
+        if conflict:
+            df, _ = drop_duplicate_keys(df, conflict.split(','))
+        return df
+
+    def reconcile_table(self, table):
+        spec = RECONCILE_SPECS[table]
+        result = {'table': table, 'partitions': 0, 'mismatches': [], 'error': None}
+        try:
+            df = self.load_local(table)
+            if df is None:
+                result['error'] = 'sin archivos locales'
+                return result
+            local = local_fingerprints(df, spec)
+            server = server_fingerprints(self.supabase, table, spec)
+            result['partitions'] = len(local.index.union(server.index))
+            result['rows'] = int(local['row_count'].sum())
+            result['mismatches'] = compare_fingerprints(local, server)
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+
+    def reconcile(self, tables=None):
+        """Compara todas las tablas en paralelo; devuelve {tabla: resultado}"""
+        print("\n" + "="*80)
+        print("🔍 RECONCILIANDO CARGAS (FINGERPRINTS POR PARTICIÓN)")
+        print("="*80)
+
+        tables = [table for table in (tables or RECONCILE_SPECS) if table in self.sources]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = {result['table']: result for result in executor.map(self.reconcile_table, tables)}
+
+        for table in tables:
+            result = results[table]
+            if result['error']:
+                print(f"   ❌ {table}: Error - {result['error']}")
+            elif result['mismatches']:
+                reasons = pd.Series([m['reason'] for m in result['mismatches']]).value_counts().to_dict()
+                print(f"   ⚠️  {table}: {len(result['mismatches'])}/{result['partitions']} particiones distintas {reasons}")
+            else:
+                print(f"   ✅ {table}: {result['rows']:,} registros, {result['partitions']} particiones OK")
+        return results
+
+    def repair(self, results):
+        """Re-sube solo las particiones que no coinciden"""
+        repaired = []
+        for table, result in results.items():
+            if result['error'] or not result['mismatches']:
+                continue
+            spec = RECONCILE_SPECS[table]
+            df = self.load_local(table)
+            keys = _key_strings(df, spec['key'])
+            partitions = partition_keys(df, spec, keys)
+            # Las particiones que solo existen en el servidor se informan pero no se borran
+            bad = {m['partition'] for m in result['mismatches'] if m['reason'] != 'extra_server'}
+            if not bad:
+                continue
+
+            print(f"\n🔧 Reparando {table}: {len(bad)} particiones")
+            column, mode = spec['partition'] or (None, None)
+            if column is not None and column != 'bucket':
+                # Partición por columna real: se reemplaza completa (elimina también filas sobrantes)
+                for partition in sorted(bad):
+                    query = self.supabase.table(table).delete()
+                    if mode == 'month':
+                        start = pd.Period(partition, freq='M')
+                        query = query.gte(column, start.start_time.strftime('%Y-%m-%d')) \
+                            .lte(column, start.end_time.strftime('%Y-%m-%d'))
+                    else:
+                        query = query.eq(column, partition)
+                    query.execute()
+            elif spec['conflict'] is None:
+                print(f"   ⚠️  {table}: sin clave única ni partición por columna, se omite")
+                continue
+
+            subset = df[np.isin(partitions, list(bad))]
+            if len(subset):
+                self.uploader.upload_data(subset, table, on_conflict=spec['conflict'], skip_unchanged=False)
+            repaired.append(table)
+        return repaired
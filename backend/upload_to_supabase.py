@@ -4,10 +4,21 @@ Asegúrate de haber ejecutado supabase_schemas.sql primero
 """
 import pandas as pd
 import os
-from supabase import create_client, Client
+from supabase import Client
 from dotenv import load_dotenv
 import json
 
+from analytics_store import DEFAULT_DB_PATH, TABLE_SOURCES, AnalyticsStore
+from dashboard_snapshots import export_snapshots
+from time_series import export_series
+from range_index import build_indexes
+from partitioned_store import is_partitioned, read_partitions
+from id_maps import FRAUD_DIMENSIONS
+from supabase_transport import get_supabase_client, get_transport
+from upload_dedup import SKIP_UNCHANGED, UploadDeduplicator
+from pipelined_upload import conflict_columns, frame_to_records, prepare_upload_frame, run_fraud_pipeline
+from upload_reconciliation import UploadReconciler
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -19,99 +30,32 @@ class SupabaseUploader:
         if not self.url or not self.key:
             raise ValueError("❌ ERROR: SUPABASE_URL y SUPABASE_KEY deben estar configurados en .env")
         
-        self.supabase: Client = create_client(self.url, self.key)
+        # Cliente y transporte compartidos (pool keep-alive, cuerpos comprimidos)
+        self.supabase: Client = get_supabase_client(self.url, self.key)
+        self.transport = get_transport(self.url, self.key)
         print("✅ Conectado a Supabase")
     
-    def upload_data(self, df: pd.DataFrame, table_name: str, batch_size: int = 5000) -> bool:
+    def upload_data(self, df: pd.DataFrame, table_name: str, batch_size: int = 5000, on_conflict: str = None,
+                    skip_unchanged: bool = SKIP_UNCHANGED) -> bool:
         """Upload data to Supabase table in batches"""
         print(f"\n📤 Subiendo datos a tabla: {table_name}")
         print(f"   Total de registros: {len(df):,}")
         
-        # Mapeo de nombres de columnas (CSV → SQL)
-        column_mappings = {
-            'retail_transactions': {
-                'Transaction ID': 'transaction_id',
-                'Date': 'date',
-                'Customer ID': 'customer_id',
-                'Gender': 'gender',
-                'Age': 'age',
-                'Product Category': 'product_category',
-                'Quantity': 'quantity',
-                'Price per Unit': 'price_per_unit',
-                'Total Amount': 'total_amount',
-                'Total_COGS': 'total_cogs',
-                'Gross_Profit': 'gross_profit',
-                'Gross_Margin_Pct': 'gross_margin_pct',
-                'Year': 'year',
-                'Month': 'month',
-                'Quarter': 'quarter',
-                'YearMonth': 'year_month'
-            },
-            'telco_customers': {
-                'customerID': 'customer_id',
-                'SeniorCitizen': 'senior_citizen',
-                'Tenure_Segment': 'tenure_segment',
-                'PhoneService': 'phone_service',
-                'MultipleLines': 'multiple_lines',
-                'InternetService': 'internet_service',
-                'OnlineSecurity': 'online_security',
-                'OnlineBackup': 'online_backup',
-                'DeviceProtection': 'device_protection',
-                'TechSupport': 'tech_support',
-                'StreamingTV': 'streaming_tv',
-                'StreamingMovies': 'streaming_movies',
-                'Contract': 'contract',
-                'PaperlessBilling': 'paperless_billing',
-                'PaymentMethod': 'payment_method',
-                'MonthlyCharges': 'monthly_charges',
-                'TotalCharges': 'total_charges',
-                'Churn': 'churn',
-                'Churn_Binary': 'churn_binary',
-                'ARPU_Segment': 'arpu_segment',
-                'Estimated_CLV': 'estimated_clv',
-                'Total_Services': 'total_services'
-            },
-            'digital_performance_data': {
-                'Date': 'date',
-                'Channel': 'channel',
-                'Spend': 'spend',
-                'Impressions': 'impressions',
-                'Clicks': 'clicks',
-                'Leads': 'leads',
-                'New_Customers': 'new_customers',
-                'Revenue': 'revenue',
-                'Churned_Customers': 'churned_customers',
-                'Active_Customers_Start_of_Day': 'active_customers_start_of_day'
-            }
-        }
-        
-        # Aplicar mapeo de columnas si existe
-        if table_name in column_mappings:
-            df = df.rename(columns=column_mappings[table_name])
-        
-        # Convertir booleanos a int para fraud_transactions
-        if table_name == 'fraud_transactions':
-            bool_columns = ['card_present', 'distance_from_home', 'high_risk_merchant', 'is_fraud', 'is_weekend']
-            for col in bool_columns:
-                if col in df.columns:
-                    # Manejar strings, Python bools, y números
-                    df[col] = df[col].replace({
-                        'true': 1, 'false': 0, 'True': 1, 'False': 0,
-                        True: 1, False: 0, '1': 1, '0': 0
-                    })
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-        
-        total_rows = len(df)
-        errors = []
+        # Mapeo de columnas y booleanos de fraud_transactions como 0/1
+        df = prepare_upload_frame(df, table_name)
         
-        # Convertir DataFrame a lista de diccionarios
-        records = df.to_dict('records')
+        # Deduplicar por la clave única: una clave repetida haría fallar el lote completo.
+        # El upsert usa esa misma clave (sin on_conflict PostgREST usaría la clave primaria SERIAL)
+        key_columns = conflict_columns(df, table_name, on_conflict)
+        dedup = None
+        if key_columns:
+            on_conflict = ','.join(key_columns)
+            dedup = UploadDeduplicator(table_name, key_columns)
+            df = dedup.filter(df, skip_unchanged=skip_unchanged)
+            dedup.report()
         
-        # Limpiar valores NaN (Supabase no acepta NaN)
-        for record in records:
-            for key, value in record.items():
-                if pd.isna(value):
-                    record[key] = None
+        # Lista de diccionarios con NaN como None (Supabase no acepta NaN)
+        records = frame_to_records(df)
         
         # Subir en lotes
         total_uploaded = 0
@@ -120,14 +64,19 @@ class SupabaseUploader:
         for i in range(0, len(records), batch_size):
             batch = records[i:i + batch_size]
             try:
-                response = self.supabase.table(table_name).upsert(batch).execute()
+                self.transport.upsert(table_name, batch, on_conflict=on_conflict)
                 total_uploaded += len(batch)
+                if dedup is not None:
+                    dedup.mark_sent(df.iloc[i:i + batch_size])
                 print(f"   ✅ Lote {i//batch_size + 1}: {len(batch)} registros subidos ({total_uploaded:,}/{len(records):,})")
             except Exception as e:
                 error_msg = f"Error en lote {i//batch_size + 1}: {str(e)}"
                 errors.append(error_msg)
                 print(f"   ❌ {error_msg}")
         
+        if dedup is not None:
+            dedup.save()
+        
         if errors:
             print(f"\n⚠️  Se encontraron {len(errors)} errores durante la carga")
             for error in errors[:5]:  # Mostrar solo los primeros 5 errores
@@ -156,6 +105,27 @@ class SupabaseUploader:
             self.upload_data(df_kpis, 'retail_monthly_kpis')
         except FileNotFoundError:
             print("❌ Archivo processed_retail_monthly_kpis.csv no encontrado")
+        
+        # Segmentos RFM
+        try:
+            df_rfm = pd.read_csv('processed_retail_rfm_segments.csv')
+            self.upload_data(df_rfm, 'retail_rfm_segments')
+        except FileNotFoundError:
+            print("❌ Archivo processed_retail_rfm_segments.csv no encontrado")
+        
+        # Retención por cohortes
+        try:
+            df_cohorts = pd.read_csv('processed_retail_cohort_retention.csv')
+            self.upload_data(df_cohorts, 'retail_cohort_retention')
+        except FileNotFoundError:
+            print("❌ Archivo processed_retail_cohort_retention.csv no encontrado")
+        
+        # Rankings top-k (Pareto)
+        try:
+            df_top_k = pd.read_csv('processed_retail_top_k.csv')
+            self.upload_data(df_top_k, 'top_k_rankings')
+        except FileNotFoundError:
+            print("❌ Archivo processed_retail_top_k.csv no encontrado")
     
     def upload_airlines_data(self):
         """Sube datos de Airlines a Supabase"""
@@ -176,6 +146,39 @@ class SupabaseUploader:
             self.upload_data(df_route_kpis, 'airlines_route_kpis')
         except FileNotFoundError:
             print("❌ Archivo processed_airlines_route_kpis.csv no encontrado")
+        
+        # Distribuciones de precio (cuantiles + histogramas)
+        try:
+            df_quantiles = pd.read_csv('processed_airlines_price_quantiles.csv')
+            self.upload_data(df_quantiles, 'airlines_price_quantiles')
+        except FileNotFoundError:
+            print("❌ Archivo processed_airlines_price_quantiles.csv no encontrado")
+        
+        try:
+            df_histograms = pd.read_csv('processed_airlines_price_histograms.csv')
+            self.upload_data(df_histograms, 'airlines_price_histograms')
+        except FileNotFoundError:
+            print("❌ Archivo processed_airlines_price_histograms.csv no encontrado")
+        
+        # Curvas de tarifa
+        try:
+            df_fare_params = pd.read_csv('processed_airlines_fare_curve_params.csv')
+            self.upload_data(df_fare_params, 'airlines_fare_curve_params')
+        except FileNotFoundError:
+            print("❌ Archivo processed_airlines_fare_curve_params.csv no encontrado")
+        
+        try:
+            df_fare_curves = pd.read_csv('processed_airlines_fare_curves.csv')
+            self.upload_data(df_fare_curves, 'airlines_fare_curves')
+        except FileNotFoundError:
+            print("❌ Archivo processed_airlines_fare_curves.csv no encontrado")
+        
+        # Rankings top-k (Pareto)
+        try:
+            df_top_k = pd.read_csv('processed_airlines_top_k.csv')
+            self.upload_data(df_top_k, 'top_k_rankings')
+        except FileNotFoundError:
+            print("❌ Archivo processed_airlines_top_k.csv no encontrado")
     
     def upload_telco_data(self):
         """Sube datos de Telco a Supabase"""
@@ -196,22 +199,43 @@ class SupabaseUploader:
             self.upload_data(df_seg_kpis, 'telco_segment_kpis')
         except FileNotFoundError:
             print("❌ Archivo processed_telco_segment_kpis.csv no encontrado")
+        
+        # Escenarios de retención
+        try:
+            df_scenarios = pd.read_csv('processed_telco_churn_scenarios.csv')
+            self.upload_data(df_scenarios, 'telco_churn_scenarios')
+        except FileNotFoundError:
+            print("❌ Archivo processed_telco_churn_scenarios.csv no encontrado")
     
-    def upload_fraud_data(self):
-        """Sube datos de Fraude (compactados) a Supabase"""
+    def upload_fraud_data(self, date_from=None, date_to=None):
+        """
+        Sube datos de Fraude (compactados) a Supabase. Con date_from/date_to solo se leen
+        las particiones de esos días (dataset particionado de compact_fraud_data.py)
+        """
         print("\n" + "="*80)
         print("🔒 SUBIENDO DATOS DE FRAUDE (COMPACTADOS)")
         print("="*80)
         
         # Transacciones compactadas
         try:
-            df_trans = pd.read_csv('processed_fraud_transactions.csv')
+            if (date_from or date_to) and is_partitioned('processed_fraud_transactions'):
+                df_trans = read_partitions('processed_fraud_transactions', filters={'date': (date_from, date_to)})
+            else:
+                df_trans = pd.read_csv('processed_fraud_transactions.csv')
             print(f"   📦 Transacciones a cargar: {len(df_trans):,}")
             self.upload_data(df_trans, 'fraud_transactions', batch_size=10000)
         except FileNotFoundError:
             print("❌ Archivo processed_fraud_transactions.csv no encontrado")
             print("   Ejecuta primero: python compact_fraud_data.py")
         
+        # Dimensiones de identificadores (id entero -> valor original)
+        for _, table in FRAUD_DIMENSIONS.values():
+            try:
+                df_dim = pd.read_csv(f'processed_{table}.csv')
+                self.upload_data(df_dim, table, batch_size=10000, on_conflict='id')
+            except FileNotFoundError:
+                print(f"❌ Archivo processed_{table}.csv no encontrado")
+        
         # KPIs diarios
         try:
             df_daily = pd.read_csv('processed_fraud_daily_kpis.csv')
@@ -239,6 +263,44 @@ class SupabaseUploader:
             self.upload_data(df_hourly, 'fraud_hourly_patterns')
         except FileNotFoundError:
             print("❌ Archivo processed_fraud_hourly_patterns.csv no encontrado")
+        
+        # Componentes del grafo cliente–tarjeta–dispositivo
+        try:
+            df_components = pd.read_csv('processed_fraud_link_components.csv')
+            # Los component_id se re-numeran en cada corrida: se reemplaza la tabla completa para
+            # no dejar componentes de la corrida anterior (y sin omitir filas "sin cambios")
+            self.supabase.table('fraud_link_components').delete().gte('component_id', 1).execute()
+            self.upload_data(df_components, 'fraud_link_components', skip_unchanged=False)
+        except FileNotFoundError:
+            print("❌ Archivo processed_fraud_link_components.csv no encontrado")
+            print("   Ejecuta primero: python link_graph.py build")
+        
+        # Rankings top-k (Pareto)
+        try:
+            df_top_k = pd.read_csv('processed_fraud_top_k.csv')
+            self.upload_data(df_top_k, 'top_k_rankings')
+        except FileNotFoundError:
+            print("❌ Archivo processed_fraud_top_k.csv no encontrado")
+    
+    def upload_anomaly_alerts(self):
+        """Sube las alertas de anomalías de KPIs diarios (kpi_anomalies.py)"""
+        try:
+            df_alerts = pd.read_csv('processed_kpi_anomaly_alerts.csv')
+            self.upload_data(df_alerts, 'kpi_anomaly_alerts')
+        except FileNotFoundError:
+            print("❌ Archivo processed_kpi_anomaly_alerts.csv no encontrado")
+            print("   Ejecuta primero: python kpi_anomalies.py run")
+    
+    def process_and_upload_fraud(self, write_transactions=True, engine=None, sample=None):
+        """
+        Compacta el dataset de fraude y lo sube en paralelo al procesamiento (pipelined_upload.py):
+        cada tabla se sube apenas está lista, sin esperar a que termine la compactación
+        """
+        print("\n" + "="*80)
+        print("🔒 COMPACTANDO Y SUBIENDO DATOS DE FRAUDE (SOLAPADO)")
+        print("="*80)
+        return run_fraud_pipeline(self.transport, write_transactions=write_transactions, engine=engine,
+                                  sample=sample)
     
     def upload_digital_performance_data(self):
         """Sube datos de Digital Performance a Supabase"""
@@ -337,35 +399,37 @@ class SupabaseUploader:
             import traceback
             traceback.print_exc()
     
-    def verify_upload(self):
-        """Verifica que los datos se hayan subido correctamente"""
+    def sync_from_store(self, db_path=DEFAULT_DB_PATH, tables=None, batch_size=5000):
+        """Sube a Supabase las tablas del almacén local (analytics_store.py) como paso separado"""
         print("\n" + "="*80)
-        print("🔍 VERIFICANDO CARGA DE DATOS")
+        print(f"🔄 SINCRONIZANDO {db_path} → SUPABASE")
         print("="*80)
         
-        tables = [
-            'retail_transactions',
-            'retail_monthly_kpis',
-            'airlines_flights',
-            'airlines_route_kpis',
-            'telco_customers',
-            'telco_segment_kpis',
-            'fraud_transactions',
-            'fraud_daily_kpis',
-            'fraud_merchant_kpis',
-            'fraud_country_kpis',
-            'fraud_hourly_patterns',
-            'digital_performance_data',
-            'digital_performance_kpis'
-        ]
-        
-        for table in tables:
-            try:
-                response = self.supabase.table(table).select("*", count='exact').limit(1).execute()
-                count = response.count if hasattr(response, 'count') else 'N/A'
-                print(f"   ✅ {table}: {count} registros")
-            except Exception as e:
-                print(f"   ❌ {table}: Error - {str(e)}")
+        with AnalyticsStore(db_path, read_only=True) as store:
+            available = set(store.tables())
+            for table in tables or TABLE_SOURCES:
+                if table not in available:
+                    print(f"   ⚠️  {table}: no está en el almacén local")
+                    continue
+                # Las columnas ya tienen nombres SQL; fechas como texto ISO para la API
+                df = store.query(f'SELECT * FROM "{table}"')
+                for col in df.select_dtypes(include=['datetime', 'datetimetz']).columns:
+                    df[col] = df[col].dt.strftime('%Y-%m-%d')
+                self.upload_data(df, table, batch_size=batch_size)
+    
+    def verify_upload(self, tables=None, sources=None, repair=False):
+        """
+        Verifica la carga comparando huellas por partición (filas, hash de claves y suma
+        de valores) entre los CSV locales y Supabase; con repair=True re-sube solo las
+        particiones que no coinciden
+        """
+        reconciler = UploadReconciler(self, sources=sources)
+        results = reconciler.reconcile(tables)
+        
+        if repair and any(result['mismatches'] for result in results.values()):
+            reconciler.repair(results)
+            results = reconciler.reconcile([table for table in results if results[table]['mismatches']])
+        return results
     
     def run_full_upload(self, include_fraud=False):
         """Ejecuta la carga completa de todos los datasets"""
@@ -382,7 +446,19 @@ class SupabaseUploader:
         if include_fraud:
             self.upload_fraud_data()
         
-        self.verify_upload()
+        # Solo se reconcilian las tablas de los dominios subidos en esta ejecución
+        domains = ('retail', 'airlines', 'telco') + (('fraud',) if include_fraud else ())
+        tables = [table for table in TABLE_SOURCES if table.startswith(domains)]
+        sources = {'top_k_rankings': [f'processed_{domain}_top_k.csv' for domain in domains
+                                      if f'processed_{domain}_top_k.csv' in TABLE_SOURCES['top_k_rankings']]}
+        self.verify_upload(tables + ['top_k_rankings'], sources=sources, repair=True)
+        
+        # Snapshots estáticos para las páginas del dashboard (un fetch por página)
+        export_snapshots()
+        export_series()
+        build_indexes()
+        
+        self.transport.summary()
         
         print("\n" + "="*80)
         print("✅ CARGA COMPLETA FINALIZADA")
@@ -2,6 +2,7 @@
 
 import { useState, useEffect } from 'react'
 import { supabase } from '@/lib/supabase'
+import { loadSnapshot } from '@/lib/snapshots'
 import StatCard from '@/components/StatCard'
 import { Plane, Clock, AlertCircle, TrendingUp } from 'lucide-react'
 import { BarChart, LineChart, PieChart } from '@/components/Charts'
@@ -17,6 +18,13 @@ export default function AirlinesDashboard() {
   async function loadData() {
     setLoading(true)
     try {
+      // Snapshot pre-renderizado por el pipeline: un solo fetch estático
+      const snapshot = await loadSnapshot('airlines')
+      if (snapshot) {
+        setData(snapshot.data)
+        return
+      }
+
       // Load sample of flights for analysis (pricing data)
       const { data: flights, error: flightError, count } = await supabase
         .from('airlines_flights')
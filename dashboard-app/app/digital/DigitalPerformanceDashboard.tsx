@@ -2,11 +2,132 @@
 
 import { useState, useEffect } from 'react'
 import { supabase } from '@/lib/supabase'
+import {
+  CALENDAR_RESOLUTIONS, loadRangeIndex, loadSeries, loadSnapshot, queryRange, queryRangeByMonth, seriesTotals,
+} from '@/lib/snapshots'
 import StatCard from '@/components/StatCard'
 import DateFilter from '@/components/DateFilter'
 import { TrendingUp, DollarSign, Users, Target } from 'lucide-react'
 import { BarChart, LineChart, PieChart } from '@/components/Charts'
 
+// Puntos máximos de los gráficos de tendencia (≈ ancho de la tarjeta en px / 4)
+const TREND_MAX_POINTS = 120
+
+// Tendencia del rango desde la serie pre-calculada (backend/time_series.py), sumando los canales;
+// null si no hay bundle y hay que calcularla desde las filas
+async function loadTrend(start: string, end: string) {
+  const bundle = await loadSeries('digital_channels', TREND_MAX_POINTS, start, end, CALENDAR_RESOLUTIONS)
+  if (!bundle) return null
+  return seriesTotals(bundle, ['revenue', 'spend', 'new_customers'], start, end).map(row => ({
+    period: bundle.resolution === 'month' ? row.date.substring(0, 7) : row.date,
+    revenue: row.revenue,
+    spend: row.spend,
+    newCustomers: row.new_customers,
+  }))
+}
+
+// Totales del rango desde el índice de sumas prefijas (backend/range_index.py), sin leer filas;
+// null si el índice no está publicado
+async function loadRangeSummary(start: string, end: string) {
+  const index = await loadRangeIndex('digital')
+  if (!index) return null
+  const totals = queryRange(index, start, end)
+  if (!totals.rows) return { empty: true }
+
+  const channelStats: Record<string, any> = {}
+  index.dimensions.filter(channel => channel !== '__all__').forEach(channel => {
+    const stats = queryRange(index, start, end, channel)
+    if (!stats.rows) return
+    channelStats[channel] = {
+      spend: stats.spend ?? 0,
+      revenue: stats.revenue ?? 0,
+      newCustomers: stats.new_customers ?? 0,
+      clicks: stats.clicks ?? 0,
+      leads: stats.leads ?? 0,
+      impressions: stats.impressions ?? 0,
+    }
+  })
+
+  // Respaldo de la tendencia si no hay serie publicada: un total por mes calendario del rango
+  const monthly: Record<string, any> = {}
+  queryRangeByMonth(index, start, end).forEach(({ month, totals: stats }) => {
+    if (stats.rows) {
+      monthly[month] = { revenue: stats.revenue ?? 0, spend: stats.spend ?? 0, newCustomers: stats.new_customers ?? 0 }
+    }
+  })
+
+  return {
+    empty: false,
+    totalSpend: totals.spend ?? 0,
+    totalRevenue: totals.revenue ?? 0,
+    totalNewCustomers: totals.new_customers ?? 0,
+    avgActiveCustomers: totals.avg_active_customers ?? 0,
+    channelStats,
+    monthly,
+  }
+}
+
+async function loadRowSummary(dateRange: { start: string; end: string }) {
+  let query = supabase.from('digital_performance_data').select('*')
+
+  if (dateRange.start && dateRange.end) {
+    query = query.gte('date', dateRange.start).lte('date', dateRange.end)
+  }
+
+  const { data: performance, error } = await query
+
+  if (error) {
+    return null
+  }
+
+  if (!performance || performance.length === 0) {
+    return { empty: true }
+  }
+
+  // Channel breakdown
+  const channelStats = performance.reduce((acc: any, p) => {
+    const channel = p.channel || 'Unknown'
+    if (!acc[channel]) {
+      acc[channel] = { 
+        spend: 0, 
+        revenue: 0, 
+        newCustomers: 0,
+        clicks: 0,
+        leads: 0,
+        impressions: 0
+      }
+    }
+    acc[channel].spend += parseFloat(p.spend) || 0
+    acc[channel].revenue += parseFloat(p.revenue) || 0
+    acc[channel].newCustomers += p.new_customers || 0
+    acc[channel].clicks += p.clicks || 0
+    acc[channel].leads += p.leads || 0
+    acc[channel].impressions += p.impressions || 0
+    return acc
+  }, {})
+
+  const monthly = performance.reduce((acc: any, p) => {
+    const month = p.date.substring(0, 7) // YYYY-MM
+    if (!acc[month]) {
+      acc[month] = { revenue: 0, spend: 0, newCustomers: 0 }
+    }
+    acc[month].revenue += parseFloat(p.revenue) || 0
+    acc[month].spend += parseFloat(p.spend) || 0
+    acc[month].newCustomers += p.new_customers || 0
+    return acc
+  }, {})
+
+  return {
+    empty: false,
+    totalSpend: performance.reduce((sum, p) => sum + (parseFloat(p.spend) || 0), 0),
+    totalRevenue: performance.reduce((sum, p) => sum + (parseFloat(p.revenue) || 0), 0),
+    totalNewCustomers: performance.reduce((sum, p) => sum + (p.new_customers || 0), 0),
+    avgActiveCustomers: performance.reduce((sum, p) => sum + (p.active_customers_start_of_day || 0), 0) / performance.length,
+    channelStats,
+    monthly,
+  }
+}
+
 export default function DigitalPerformanceDashboard() {
   const [loading, setLoading] = useState(true)
   const [data, setData] = useState<any>(null)
@@ -23,6 +144,12 @@ export default function DigitalPerformanceDashboard() {
 
   async function loadDateLimits() {
     try {
+      const snapshot = await loadSnapshot('digital')
+      if (snapshot?.dateLimit) {
+        setDateLimit(snapshot.dateLimit)
+        return
+      }
+
       const { data: dates } = await supabase
         .from('digital_performance_data')
         .select('date')
@@ -51,59 +178,30 @@ export default function DigitalPerformanceDashboard() {
     setLoading(true)
     
     try {
-      // Build query with date filter
-      let query = supabase.from('digital_performance_data').select('*')
-      
-      if (dateRange.start && dateRange.end) {
-        query = query.gte('date', dateRange.start).lte('date', dateRange.end)
+      // Sin filtro de fechas: un solo fetch estático del snapshot pre-renderizado
+      if (!dateRange.start || !dateRange.end) {
+        const snapshot = await loadSnapshot('digital')
+        if (snapshot) {
+          setData(snapshot.data)
+          return
+        }
       }
 
-      const { data: performance, error } = await query
+      // Con filtro de fechas: totales del índice de sumas prefijas; sin índice, filas de Supabase
+      const summary: any = (dateRange.start && dateRange.end && await loadRangeSummary(dateRange.start, dateRange.end))
+        || await loadRowSummary(dateRange)
 
-      if (error) {
-        return
-      }
-
-      if (!performance || performance.length === 0) {
-        setLoading(false)
+      if (!summary || summary.empty) {
         return
       }
 
       // Calculate aggregate metrics
-      const totalSpend = performance.reduce((sum, p) => sum + (parseFloat(p.spend) || 0), 0)
-      const totalRevenue = performance.reduce((sum, p) => sum + (parseFloat(p.revenue) || 0), 0)
-      const totalNewCustomers = performance.reduce((sum, p) => sum + (p.new_customers || 0), 0)
-      const totalClicks = performance.reduce((sum, p) => sum + (p.clicks || 0), 0)
-      const totalLeads = performance.reduce((sum, p) => sum + (p.leads || 0), 0)
-      const totalImpressions = performance.reduce((sum, p) => sum + (p.impressions || 0), 0)
-      const avgActiveCustomers = performance.reduce((sum, p) => sum + (p.active_customers_start_of_day || 0), 0) / performance.length
+      const { totalSpend, totalRevenue, totalNewCustomers, avgActiveCustomers, channelStats } = summary
 
       const roi = ((totalRevenue - totalSpend) / totalSpend) * 100
       const cac = totalSpend / totalNewCustomers
       const arpu = totalRevenue / avgActiveCustomers
 
-      // Channel breakdown
-      const channelStats = performance.reduce((acc: any, p) => {
-        const channel = p.channel || 'Unknown'
-        if (!acc[channel]) {
-          acc[channel] = { 
-            spend: 0, 
-            revenue: 0, 
-            newCustomers: 0,
-            clicks: 0,
-            leads: 0,
-            impressions: 0
-          }
-        }
-        acc[channel].spend += parseFloat(p.spend) || 0
-        acc[channel].revenue += parseFloat(p.revenue) || 0
-        acc[channel].newCustomers += p.new_customers || 0
-        acc[channel].clicks += p.clicks || 0
-        acc[channel].leads += p.leads || 0
-        acc[channel].impressions += p.impressions || 0
-        return acc
-      }, {})
-
       // Spend by Channel (Pie)
       const spendByChannelData = Object.entries(channelStats).map(([channel, stats]: [string, any]) => ({
         name: channel,
@@ -147,29 +245,21 @@ export default function DigitalPerformanceDashboard() {
         })
         .sort((a, b) => b['LTV/CAC'] - a['LTV/CAC'])
 
-      // Monthly trends
-      const monthlyData = performance.reduce((acc: any, p) => {
-        const month = p.date.substring(0, 7) // YYYY-MM
-        if (!acc[month]) {
-          acc[month] = { revenue: 0, spend: 0, newCustomers: 0 }
-        }
-        acc[month].revenue += parseFloat(p.revenue) || 0
-        acc[month].spend += parseFloat(p.spend) || 0
-        acc[month].newCustomers += p.new_customers || 0
-        return acc
-      }, {})
-
-      const monthlyTrendData = Object.entries(monthlyData)
-        .map(([month, stats]: [string, any]) => ({
-          month,
+      // Monthly trends (con filtro: serie pre-calculada a la resolución que entra en el gráfico)
+      const trend = (dateRange.start && dateRange.end && await loadTrend(dateRange.start, dateRange.end)) ||
+        Object.entries(summary.monthly).map(([period, stats]: [string, any]) => ({ period, ...stats }))
+
+      const monthlyTrendData = trend
+        .map(stats => ({
+          month: stats.period,
           Revenue: parseFloat(stats.revenue.toFixed(2)),
           Spend: parseFloat(stats.spend.toFixed(2)),
         }))
         .sort((a, b) => a.month.localeCompare(b.month))
 
-      const newCustomersTrendData = Object.entries(monthlyData)
-        .map(([month, stats]: [string, any]) => ({
-          month,
+      const newCustomersTrendData = trend
+        .map(stats => ({
+          month: stats.period,
           'New Customers': stats.newCustomers,
         }))
         .sort((a, b) => a.month.localeCompare(b.month))
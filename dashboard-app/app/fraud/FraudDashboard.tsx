@@ -2,11 +2,55 @@
 
 import { useState, useEffect } from 'react'
 import { supabase } from '@/lib/supabase'
+import { loadRangeIndex, loadSnapshot, queryRange, RangeIndexData } from '@/lib/snapshots'
 import StatCard from '@/components/StatCard'
 import DateFilter from '@/components/DateFilter'
 import { Shield, AlertTriangle, DollarSign, Activity } from 'lucide-react'
 import { BarChart, LineChart, PieChart } from '@/components/Charts'
 
+// Cards y breakdowns del rango desde los índices de sumas prefijas (backend/range_index.py, dataset
+// completo), sin leer transacciones; null si los índices no están publicados
+async function loadRangeSummary(start: string, end: string) {
+  const [categories, cardTypes] = await Promise.all([loadRangeIndex('fraud'), loadRangeIndex('fraud_card_type')])
+  if (!categories || !cardTypes) return null
+
+  const totals = queryRange(categories, start, end)
+  const totalTransactions = totals.transactions ?? 0
+  const fraudulentTxns = totals.fraud_count ?? 0
+  const totalAmount = totals.amount ?? 0
+  const fraudAmount = totals.fraud_amount ?? 0
+
+  const dimensions = (index: RangeIndexData) => index.dimensions
+    .filter(name => name !== '__all__')
+    .map(name => ({ name, stats: queryRange(index, start, end, name) }))
+    .filter(({ stats }) => stats.transactions)
+
+  const categoryChartData = dimensions(categories)
+    .map(({ name, stats }) => ({
+      name,
+      'Fraud Rate': (stats.fraud_rate ?? 0).toFixed(1),
+      transactions: stats.transactions ?? 0,
+    }))
+    .sort((a, b) => parseFloat(b['Fraud Rate']) - parseFloat(a['Fraud Rate']))
+    .slice(0, 8)
+
+  const cardTypeChartData = dimensions(cardTypes)
+    .filter(({ stats }) => stats.fraud_count)
+    .map(({ name, stats }) => ({ name, value: stats.fraud_count ?? 0 }))
+
+  return {
+    totalTransactions,
+    fraudulentTxns,
+    legitimateTxns: totalTransactions - fraudulentTxns,
+    fraudRate: (totalTransactions > 0 ? (fraudulentTxns / totalTransactions) * 100 : 0).toFixed(2),
+    fraudAmount,
+    legitimateAmount: totalAmount - fraudAmount,
+    totalAmount,
+    categoryChartData,
+    cardTypeChartData,
+  }
+}
+
 export default function FraudDashboard() {
   const [loading, setLoading] = useState(true)
   const [data, setData] = useState<any>(null)
@@ -23,6 +67,12 @@ export default function FraudDashboard() {
 
   async function loadDateLimits() {
     try {
+      const snapshot = await loadSnapshot('fraud')
+      if (snapshot?.dateLimit) {
+        setDateLimit(snapshot.dateLimit)
+        return
+      }
+
       const { data: transactions } = await supabase
         .from('fraud_transactions')
         .select('date')
@@ -49,6 +99,20 @@ export default function FraudDashboard() {
   async function loadData() {
     setLoading(true)
     try {
+      // Sin filtro de fechas: un solo fetch estático del snapshot pre-renderizado
+      if (!dateRange.start || !dateRange.end) {
+        const snapshot = await loadSnapshot('fraud')
+        if (snapshot) {
+          setData(snapshot.data)
+          return
+        }
+      }
+
+      // Con filtro de fechas: índices de rangos; comerciantes, países y horas no dependen del rango
+      const rangeSummary = dateRange.start && dateRange.end
+        ? await loadRangeSummary(dateRange.start, dateRange.end)
+        : null
+
       let transactionsQuery = supabase
         .from('fraud_transactions')
         .select('*')
@@ -60,7 +124,7 @@ export default function FraudDashboard() {
           .lte('date', dateRange.end)
       }
 
-      const { data: transactions } = await transactionsQuery
+      const { data: transactions } = rangeSummary ? { data: [] as any[] } : await transactionsQuery
 
       const { data: merchantKPIs } = await supabase
         .from('fraud_merchant_kpis')
@@ -135,6 +199,11 @@ export default function FraudDashboard() {
         value: value as number,
       }))
 
+      if (rangeSummary) {
+        setData({ ...rangeSummary, topRiskyMerchants, countryRiskData, hourlyData })
+        return
+      }
+
       setData({
         totalTransactions,
         fraudulentTxns,
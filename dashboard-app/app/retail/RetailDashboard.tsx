@@ -2,11 +2,154 @@
 
 import { useState, useEffect } from 'react'
 import { supabase } from '@/lib/supabase'
+import {
+  CALENDAR_RESOLUTIONS, loadRangeIndex, loadSeries, loadSnapshot, queryRange, queryRangeByMonth, seriesTotals,
+} from '@/lib/snapshots'
 import StatCard from '@/components/StatCard'
 import DateFilter from '@/components/DateFilter'
 import { DollarSign, TrendingUp, Users, Package } from 'lucide-react'
 import { LineChart, BarChart, PieChart } from '@/components/Charts'
 
+// Puntos máximos de los gráficos de tendencia (≈ ancho de la tarjeta en px / 4)
+const TREND_MAX_POINTS = 120
+
+// Tendencia del rango desde la serie pre-calculada (backend/time_series.py); null si no hay
+// bundle y hay que calcularla desde las transacciones
+async function loadTrend(start: string, end: string) {
+  const bundle = await loadSeries('retail_revenue', TREND_MAX_POINTS, start, end, CALENDAR_RESOLUTIONS)
+  if (!bundle) return null
+  return seriesTotals(bundle, ['revenue', 'cost', 'profit', 'transactions'], start, end).map(row => ({
+    month: bundle.resolution === 'month' ? row.date.substring(0, 7) : row.date,
+    revenue: row.revenue,
+    transactions: row.transactions,
+    totalCost: row.cost,
+    totalProfit: row.profit,
+  }))
+}
+
+// Todas las transacciones del rango (paginado de a 1000 filas); columns acota el payload
+async function fetchTransactions(dateRange: { start: string; end: string }, columns: string) {
+  let allTransactions: any[] = []
+  let page = 0
+  const pageSize = 1000
+  let hasMore = true
+
+  while (hasMore) {
+    let query = supabase
+      .from('retail_transactions')
+      .select(columns)
+      .range(page * pageSize, (page + 1) * pageSize - 1)
+
+    if (dateRange.start && dateRange.end) {
+      query = query
+        .gte('date', dateRange.start)
+        .lte('date', dateRange.end)
+    }
+
+    const { data, error } = await query
+    
+    if (error) {
+      break
+    }
+
+    if (data && data.length > 0) {
+      allTransactions = [...allTransactions, ...data]
+      
+      if (data.length < pageSize) {
+        hasMore = false
+      } else {
+        page++
+      }
+    } else {
+      hasMore = false
+    }
+  }
+
+  return allTransactions
+}
+
+function summarizeTransactions(transactions: any[]) {
+  // Category breakdown
+  const categoryData = transactions?.reduce((acc: any, t) => {
+    const cat = t.product_category
+    if (!acc[cat]) acc[cat] = 0
+    acc[cat] += t.total_amount
+    return acc
+  }, {})
+
+  // Calculate monthly trend FROM transactions using REAL cost data
+  const monthlyData = transactions?.reduce((acc: any, t) => {
+    const month = t.date?.substring(0, 7) || 'Unknown' // Extract YYYY-MM
+    if (!acc[month]) {
+      acc[month] = {
+        month,
+        revenue: 0,
+        transactions: 0,
+        totalCost: 0,
+        totalProfit: 0,
+        count: 0
+      }
+    }
+    acc[month].revenue += t.total_amount || 0
+    acc[month].transactions += 1
+    acc[month].totalCost += t.total_cogs || 0  // Use REAL cost from DB
+    acc[month].totalProfit += t.gross_profit || 0  // Use REAL profit from DB
+    acc[month].count += 1
+    return acc
+  }, {})
+
+  return {
+    totalRevenue: transactions?.reduce((sum, t) => sum + (t.total_amount || 0), 0) || 0,
+    totalTransactions: transactions?.length || 0,
+    uniqueCustomers: new Set(transactions?.map(t => t.customer_id)).size,
+    totalProducts: transactions?.reduce((sum, t) => sum + (t.quantity || 0), 0) || 0,
+    totalCost: transactions?.reduce((sum, t) => sum + (t.total_cogs || 0), 0) || 0,
+    totalProfit: transactions?.reduce((sum, t) => sum + (t.gross_profit || 0), 0) || 0,
+    categoryData,
+    monthlyData,
+  }
+}
+
+// Totales del rango desde el índice de sumas prefijas (backend/range_index.py); clientes únicos no
+// es aditivo y se cuenta leyendo solo customer_id. null si el índice no está publicado
+async function loadRangeSummary(start: string, end: string) {
+  const index = await loadRangeIndex('retail')
+  if (!index) return null
+  const totals = queryRange(index, start, end)
+
+  const categoryData: Record<string, number> = {}
+  index.dimensions.filter(name => name !== '__all__').forEach(name => {
+    const stats = queryRange(index, start, end, name)
+    if (stats.transactions) categoryData[name] = stats.revenue ?? 0
+  })
+
+  // Respaldo de la tendencia si no hay serie publicada
+  const monthlyData: Record<string, any> = {}
+  queryRangeByMonth(index, start, end).forEach(({ month, totals: stats }) => {
+    if (!stats.transactions) return
+    monthlyData[month] = {
+      month,
+      revenue: stats.revenue ?? 0,
+      transactions: stats.transactions ?? 0,
+      totalCost: stats.cost ?? 0,
+      totalProfit: stats.profit ?? 0,
+    }
+  })
+
+  const customers = await fetchTransactions({ start, end }, 'customer_id')
+
+  return {
+    totalRevenue: totals.revenue ?? 0,
+    totalTransactions: totals.transactions ?? 0,
+    uniqueCustomers: new Set(customers.map(t => t.customer_id)).size,
+    totalProducts: totals.units ?? 0,
+    totalCost: totals.cost ?? 0,
+    totalProfit: totals.profit ?? 0,
+    categoryData,
+    monthlyData,
+  }
+}
+
 export default function RetailDashboard() {
   const [loading, setLoading] = useState(true)
   const [data, setData] = useState<any>(null)
@@ -23,6 +166,12 @@ export default function RetailDashboard() {
 
   async function loadDateLimits() {
     try {
+      const snapshot = await loadSnapshot('retail')
+      if (snapshot?.dateLimit) {
+        setDateLimit(snapshot.dateLimit)
+        return
+      }
+
       const { data: transactions } = await supabase
         .from('retail_transactions')
         .select('date')
@@ -50,90 +199,32 @@ export default function RetailDashboard() {
   async function loadData() {
     setLoading(true)
     try {
-      // Load ALL transactions with pagination if needed
-      let allTransactions: any[] = []
-      let page = 0
-      const pageSize = 1000
-      let hasMore = true
-
-      while (hasMore) {
-        let query = supabase
-          .from('retail_transactions')
-          .select('*', { count: 'exact' })
-          .range(page * pageSize, (page + 1) * pageSize - 1)
-
-        if (dateRange.start && dateRange.end) {
-          query = query
-            .gte('date', dateRange.start)
-            .lte('date', dateRange.end)
-        }
-
-        const { data, error, count } = await query
-        
-        if (error) {
-          break
-        }
-
-        if (data && data.length > 0) {
-          allTransactions = [...allTransactions, ...data]
-          
-          if (data.length < pageSize) {
-            hasMore = false
-          } else {
-            page++
-          }
-        } else {
-          hasMore = false
+      // Sin filtro de fechas: un solo fetch estático del snapshot pre-renderizado
+      if (!dateRange.start || !dateRange.end) {
+        const snapshot = await loadSnapshot('retail')
+        if (snapshot) {
+          setData(snapshot.data)
+          return
         }
       }
 
-      const transactions = allTransactions
+      // Con filtro de fechas: totales del índice de sumas prefijas; sin índice, todas las filas
+      const summary = (dateRange.start && dateRange.end && await loadRangeSummary(dateRange.start, dateRange.end))
+        || summarizeTransactions(await fetchTransactions(dateRange, '*'))
 
-      // Calculate summary stats DIRECTLY from transactions
-      const totalRevenue = transactions?.reduce((sum, t) => sum + (t.total_amount || 0), 0) || 0
-      const totalTransactions = transactions?.length || 0
+      const { totalRevenue, totalTransactions, uniqueCustomers, totalProducts, totalCost, totalProfit } = summary
       const avgOrderValue = totalTransactions > 0 ? totalRevenue / totalTransactions : 0
-      const uniqueCustomers = new Set(transactions?.map(t => t.customer_id)).size
-      const totalProducts = transactions?.reduce((sum, t) => sum + (t.quantity || 0), 0) || 0
-      
-      // Calculate aggregate stats
-      const totalCost = transactions?.reduce((sum, t) => sum + (t.total_cogs || 0), 0) || 0
-      const totalProfit = transactions?.reduce((sum, t) => sum + (t.gross_profit || 0), 0) || 0
       const overallMargin = totalRevenue > 0 ? ((totalRevenue - totalCost) / totalRevenue) * 100 : 0
-      
-      // Category breakdown
-      const categoryData = transactions?.reduce((acc: any, t) => {
-        const cat = t.product_category
-        if (!acc[cat]) acc[cat] = 0
-        acc[cat] += t.total_amount
-        return acc
-      }, {})
-
-      const categoryChartData = Object.entries(categoryData || {}).map(([name, value]) => ({
+
+      const categoryChartData = Object.entries(summary.categoryData || {}).map(([name, value]) => ({
         name,
         value: Math.round(value as number),
       }))
 
       // Calculate monthly trend FROM transactions using REAL cost data
-      const monthlyData = transactions?.reduce((acc: any, t) => {
-        const month = t.date?.substring(0, 7) || 'Unknown' // Extract YYYY-MM
-        if (!acc[month]) {
-          acc[month] = {
-            month,
-            revenue: 0,
-            transactions: 0,
-            totalCost: 0,
-            totalProfit: 0,
-            count: 0
-          }
-        }
-        acc[month].revenue += t.total_amount || 0
-        acc[month].transactions += 1
-        acc[month].totalCost += t.total_cogs || 0  // Use REAL cost from DB
-        acc[month].totalProfit += t.gross_profit || 0  // Use REAL profit from DB
-        acc[month].count += 1
-        return acc
-      }, {})
+      // (con filtro: serie pre-calculada a la resolución que entra en el gráfico)
+      const trend = dateRange.start && dateRange.end ? await loadTrend(dateRange.start, dateRange.end) : null
+      const monthlyData = trend || summary.monthlyData
 
       const monthlyTrend = Object.values(monthlyData || {})
         .map((m: any) => ({
@@ -166,7 +257,7 @@ export default function RetailDashboard() {
         overallMargin,
         categoryChartData,
         monthlyTrend,
-        transactions: transactions?.length || 0,
+        transactions: totalTransactions,
         revenueTrend: {
           value: `${Math.abs(revenueTrend).toFixed(1)}%`,
           isPositive: revenueTrend >= 0
@@ -2,6 +2,7 @@
 
 import { useState, useEffect } from 'react'
 import { supabase } from '@/lib/supabase'
+import { loadSnapshot } from '@/lib/snapshots'
 import StatCard from '@/components/StatCard'
 import DateFilter from '@/components/DateFilter'
 import { Users, TrendingDown, DollarSign, Phone } from 'lucide-react'
@@ -40,6 +41,13 @@ export default function TelcoDashboard() {
   async function loadData() {
     setLoading(true)
     try {
+      // Snapshot pre-renderizado por el pipeline: un solo fetch estático
+      const snapshot = await loadSnapshot('telco')
+      if (snapshot) {
+        setData(snapshot.data)
+        return
+      }
+
       const { data: customers } = await supabase
         .from('telco_customers')
         .select('*')
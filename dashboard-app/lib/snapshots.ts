@@ -0,0 +1,206 @@
+// Snapshots pre-renderizados por backend/dashboard_snapshots.py en public/snapshots/
+// manifest.json apunta al bundle actual de cada dashboard (nombre con hash de contenido,
+// cacheable como inmutable); si no existe, las páginas consultan Supabase como antes.
+
+export interface DashboardSnapshot<T = any> {
+  dashboard: string
+  schemaVersion: number
+  data: T
+  dateLimit?: { min: string; max: string }
+}
+
+const SNAPSHOT_SCHEMA_VERSION = 1
+const SNAPSHOT_BASE = '/snapshots'
+
+let manifestPromise: Promise<any | null> | null = null
+const snapshotPromises: Record<string, Promise<DashboardSnapshot | null>> = {}
+
+function loadManifest() {
+  if (!manifestPromise) {
+    manifestPromise = fetch(`${SNAPSHOT_BASE}/manifest.json`, { cache: 'no-cache' })
+      .then(res => (res.ok ? res.json() : null))
+      .catch(() => null)
+  }
+  return manifestPromise
+}
+
+export function loadSnapshot<T = any>(dashboard: string): Promise<DashboardSnapshot<T> | null> {
+  if (!snapshotPromises[dashboard]) {
+    snapshotPromises[dashboard] = loadManifest()
+      .then(manifest => {
+        const entry = manifest?.dashboards?.[dashboard]
+        if (!entry || manifest.schemaVersion !== SNAPSHOT_SCHEMA_VERSION) return null
+        return fetch(`${SNAPSHOT_BASE}/${entry.file}`).then(res => (res.ok ? res.json() : null))
+      })
+      .catch(() => null)
+  }
+  return snapshotPromises[dashboard] as Promise<DashboardSnapshot<T> | null>
+}
+
+// Series multi-resolución (backend/time_series.py): manifest.series[nombre].resolutions
+// tiene day/week/month y lttb<N> (diaria reducida a N puntos por línea). loadSeries elige la
+// más fina cuyo número de puntos dentro del rango cabe en maxPoints (≈ ancho del gráfico en px / 4);
+// resolutions restringe las candidatas (p. ej. solo day/week/month para sumar entre dimensiones).
+// seriesTotals recorta el bundle al rango y suma las medidas por período.
+
+export type SeriesResolution = 'day' | 'week' | 'month' | `lttb${number}`
+
+export interface SeriesBundle<T = any> extends DashboardSnapshot<T> {
+  resolution: SeriesResolution
+}
+
+const DAY_MS = 24 * 60 * 60 * 1000
+const PERIOD_DAYS: Record<string, number> = { day: 1, week: 7, month: 30.44 }
+const seriesPromises: Record<string, Promise<DashboardSnapshot | null>> = {}
+
+function daysBetween(start: string, end: string) {
+  return Math.max(1, Math.round((Date.parse(end) - Date.parse(start)) / DAY_MS) + 1)
+}
+
+export function pickSeriesResolution(
+  entry: { dateLimit: { min: string; max: string }; resolutions: Record<string, { points: number }> },
+  maxPoints: number,
+  start?: string,
+  end?: string,
+  resolutions?: SeriesResolution[],
+): SeriesResolution | null {
+  const totalDays = daysBetween(entry.dateLimit.min, entry.dateLimit.max)
+  const rangeDays = start && end ? Math.min(daysBetween(start, end), totalDays) : totalDays
+
+  // Puntos estimados dentro del rango, de la resolución más fina a la más gruesa
+  const available = Object.entries(entry.resolutions)
+    .filter(([resolution]) => !resolutions || resolutions.includes(resolution as SeriesResolution))
+  const candidates = available.map(([resolution, { points }]) => {
+    const estimate = resolution.startsWith('lttb')
+      ? points * (rangeDays / totalDays)
+      : rangeDays / PERIOD_DAYS[resolution]
+    return { resolution: resolution as SeriesResolution, estimate, points }
+  }).sort((a, b) => b.points - a.points)
+
+  const fitting = candidates.find(candidate => candidate.estimate <= maxPoints)
+  return fitting?.resolution ?? candidates[candidates.length - 1]?.resolution ?? null
+}
+
+export function loadSeries<T = any>(
+  name: string,
+  maxPoints: number,
+  start?: string,
+  end?: string,
+  resolutions?: SeriesResolution[],
+): Promise<SeriesBundle<T> | null> {
+  return loadManifest()
+    .then(manifest => {
+      const entry = manifest?.series?.[name]
+      if (!entry || manifest.schemaVersion !== SNAPSHOT_SCHEMA_VERSION) return null
+      const resolution = pickSeriesResolution(entry, maxPoints, start, end, resolutions)
+      if (!resolution) return null
+      const file = entry.resolutions[resolution].file
+      if (!seriesPromises[file]) {
+        seriesPromises[file] = fetch(`${SNAPSHOT_BASE}/${file}`).then(res => (res.ok ? res.json() : null))
+      }
+      return seriesPromises[file].then(bundle => (bundle ? { ...bundle, resolution } : null))
+    })
+    .catch(() => null) as Promise<SeriesBundle<T> | null>
+}
+
+// Resoluciones por período (registros {date, [dimensión], medidas...}); las lttb<N> son por línea
+export const CALENDAR_RESOLUTIONS: SeriesResolution[] = ['day', 'week', 'month']
+
+function periodStart(date: string, resolution: SeriesResolution) {
+  if (resolution === 'month') return `${date.substring(0, 7)}-01`
+  if (resolution === 'week') {
+    const day = new Date(`${date}T00:00:00Z`)
+    day.setUTCDate(day.getUTCDate() - ((day.getUTCDay() + 6) % 7))
+    return day.toISOString().substring(0, 10)
+  }
+  return date
+}
+
+export function seriesTotals(
+  bundle: SeriesBundle<Record<string, any>[]>,
+  measures: string[],
+  start?: string,
+  end?: string,
+): Record<string, any>[] {
+  // Los períodos de los extremos se incluyen completos (semana/mes que contiene start y end)
+  const first = start ? periodStart(start, bundle.resolution) : ''
+  const totals: Record<string, Record<string, any>> = {}
+  bundle.data.forEach(row => {
+    if (row.date < first || (end && row.date > end)) return
+    if (!totals[row.date]) {
+      totals[row.date] = { date: row.date }
+      measures.forEach(measure => { totals[row.date][measure] = 0 })
+    }
+    measures.forEach(measure => { totals[row.date][measure] += row[measure] || 0 })
+  })
+  return Object.values(totals).sort((a, b) => a.date.localeCompare(b.date))
+}
+
+// Índices de sumas prefijas (backend/range_index.py): totales de cualquier [inicio, fin] en tiempo
+// constante, sin consultar Supabase. cumulative[dimensión][medida][día] con un cero inicial.
+
+export interface RangeIndexData {
+  start: string
+  days: number
+  dimensions: string[]
+  measures: string[]
+  ratios: Record<string, [string, string, number]>
+  cumulative: number[][][]
+}
+
+const rangePromises: Record<string, Promise<RangeIndexData | null>> = {}
+
+export function loadRangeIndex(name: string): Promise<RangeIndexData | null> {
+  if (!rangePromises[name]) {
+    rangePromises[name] = loadManifest()
+      .then(manifest => {
+        const entry = manifest?.ranges?.[name]
+        if (!entry || manifest.schemaVersion !== SNAPSHOT_SCHEMA_VERSION) return null
+        return fetch(`${SNAPSHOT_BASE}/${entry.file}`).then(res => (res.ok ? res.json() : null))
+      })
+      .then(bundle => bundle?.data ?? null)
+      .catch(() => null)
+  }
+  return rangePromises[name]
+}
+
+export function queryRange(
+  index: RangeIndexData,
+  start?: string,
+  end?: string,
+  dimension: string = '__all__',
+): Record<string, number | null> {
+  const origin = Date.parse(index.start)
+  const first = Math.max(start ? Math.round((Date.parse(start) - origin) / DAY_MS) : 0, 0)
+  const last = Math.min(end ? Math.round((Date.parse(end) - origin) / DAY_MS) : index.days - 1, index.days - 1)
+  const [i, j] = first <= last ? [first, last + 1] : [0, 0]
+
+  const rows = index.cumulative[index.dimensions.indexOf(dimension)] ?? []
+  const totals: Record<string, number | null> = {}
+  index.measures.forEach((measure, m) => {
+    totals[measure] = rows[m] ? rows[m][j] - rows[m][i] : 0
+  })
+  Object.entries(index.ratios).forEach(([name, [numerator, denominator, factor]]) => {
+    const den = totals[denominator]
+    totals[name] = den ? ((totals[numerator] ?? 0) / den) * factor : null
+  })
+  return totals
+}
+
+// Totales por mes calendario dentro de [start, end] (los meses de los extremos, recortados al rango)
+export function queryRangeByMonth(
+  index: RangeIndexData,
+  start: string,
+  end: string,
+  dimension: string = '__all__',
+): { month: string; totals: Record<string, number | null> }[] {
+  const months: { month: string; totals: Record<string, number | null> }[] = []
+  for (let month = start.substring(0, 7); month <= end.substring(0, 7);) {
+    const [year, m] = month.split('-').map(Number)
+    const last = new Date(Date.UTC(year, m, 0)).toISOString().substring(0, 10)
+    const first = `${month}-01`
+    months.push({ month, totals: queryRange(index, first > start ? first : start, last < end ? last : end, dimension) })
+    month = new Date(Date.UTC(year, m, 1)).toISOString().substring(0, 7)
+  }
+  return months
+}